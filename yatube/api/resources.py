@@ -0,0 +1,101 @@
+"""Ресурсы JSON API.
+
+Ресурс описывает, какие поля можно запросить через ?fields= и из
+каких путей .values() они берутся. Ответы собираются прямо из
+строк .values(), без создания экземпляров моделей.
+"""
+from django.core.files.storage import default_storage
+
+
+class InvalidFields(Exception):
+    pass
+
+
+def media_url(name):
+    return default_storage.url(name) if name else None
+
+
+class Resource:
+    def __init__(self, fields, ordering, scopes=(), converters=None):
+        # Имя поля в ответе -> путь для .values().
+        self.fields = fields
+        self.ordering = ordering
+        # Области core.cache, от которых зависят данные ресурса;
+        # без них ETag считается по телу ответа.
+        self.scopes = scopes
+        self.converters = converters or {}
+
+    def parse_fields(self, param):
+        """Поля из ?fields=a,b; без параметра — все поля."""
+        if not param:
+            return list(self.fields)
+        names = [name.strip() for name in param.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown or not names:
+            raise InvalidFields(', '.join(unknown))
+        return names
+
+    def values(self, queryset, names):
+        # Поля сортировки нужны курсорам, даже если их не просили.
+        lookups = {self.fields[name] for name in names}
+        lookups.update(field.lstrip('-') for field in self.ordering)
+        return queryset.values(*lookups)
+
+    def serialize(self, row, names):
+        data = {}
+        for name in names:
+            value = row[self.fields[name]]
+            if name in self.converters:
+                value = self.converters[name](value)
+            data[name] = value
+        return data
+
+
+POSTS = Resource(
+    fields={
+        'id': 'id',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'image': 'image',
+        'comments_count': 'comments_count',
+    },
+    ordering=('-pub_date', '-pk'),
+    scopes=('index', 'groups'),
+    converters={'image': media_url},
+)
+
+GROUPS = Resource(
+    fields={
+        'id': 'id',
+        'title': 'title',
+        'slug': 'slug',
+        'description': 'description',
+    },
+    ordering=('title', 'pk'),
+    scopes=('groups',),
+)
+
+COMMENTS = Resource(
+    fields={
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    },
+    ordering=('created', 'pk'),
+    # Комментарии сбрасывают поколение лент своего поста, а значит
+    # и главной страницы.
+    scopes=('index',),
+)
+
+FOLLOWS = Resource(
+    fields={
+        'id': 'id',
+        'user': 'user__username',
+        'following': 'author__username',
+    },
+    ordering=('-pk',),
+)
@@ -0,0 +1,113 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+POSTS_URL = reverse('api:post_list')
+GROUPS_URL = reverse('api:group_list')
+FOLLOW_URL = reverse('api:follow_list')
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cache.clear()
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание'
+        )
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Тестовый пост')
+        self.client = Client()
+
+    def test_post_list(self):
+        response = self.client.get(POSTS_URL)
+        self.assertEqual(response.json()['results'], [{
+            'id': self.post.pk,
+            'text': 'Тестовый пост',
+            'pub_date': response.json()['results'][0]['pub_date'],
+            'author': 'author',
+            'group': 'test_slug',
+            'image': None,
+            'comments_count': 0,
+        }])
+
+    def test_sparse_fields(self):
+        response = self.client.get(POSTS_URL, {'fields': 'id,author'})
+        self.assertEqual(
+            response.json()['results'],
+            [{'id': self.post.pk, 'author': 'author'}])
+        response = self.client.get(POSTS_URL, {'fields': 'password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_pagination(self):
+        for number in range(4):
+            Post.objects.create(author=self.author, text='Пост %d' % number)
+        ids = []
+        url = POSTS_URL + '?limit=2&fields=id'
+        while url:
+            data = self.client.get(url).json()
+            ids.extend(row['id'] for row in data['results'])
+            url = data['next']
+        self.assertEqual(
+            ids, list(Post.objects.order_by('-pub_date', '-pk')
+                      .values_list('id', flat=True)))
+
+    def test_etag_revalidation_skips_database(self):
+        etag = self.client.get(POSTS_URL)['ETag']
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(POSTS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(context), 0)
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий')
+        response = self.client.get(POSTS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['comments_count'], 1)
+
+    def test_detail_and_comments(self):
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий')
+        response = self.client.get(
+            reverse('api:post_detail', kwargs={'post_id': self.post.pk}),
+            {'fields': 'text'})
+        self.assertEqual(response.json(), {'text': 'Тестовый пост'})
+        response = self.client.get(
+            reverse('api:comment_list', kwargs={'post_id': self.post.pk}),
+            {'fields': 'author,text'})
+        self.assertEqual(
+            response.json()['results'],
+            [{'author': 'author', 'text': 'Комментарий'}])
+        response = self.client.get(
+            reverse('api:post_detail', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_groups(self):
+        response = self.client.get(GROUPS_URL, {'fields': 'slug'})
+        self.assertEqual(response.json()['results'], [{'slug': 'test_slug'}])
+        response = self.client.get(
+            reverse('api:group_detail', kwargs={'slug': 'test_slug'}))
+        self.assertEqual(response.json()['title'], 'Тестовая группа')
+
+    def test_follows_need_login(self):
+        self.assertEqual(self.client.get(FOLLOW_URL).status_code, 401)
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        self.client.force_login(reader)
+        response = self.client.get(FOLLOW_URL)
+        self.assertEqual(
+            response.json()['results'][0]['following'], 'author')
+        response = self.client.get(
+            FOLLOW_URL, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
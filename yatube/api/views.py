@@ -0,0 +1,149 @@
+import json
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_GET
+
+from core.cache import get_generations
+from core.conditional import make_etag
+from core.paginators import CursorPaginator
+from posts.models import Comment, Follow, Group, Post
+from .resources import COMMENTS, FOLLOWS, GROUPS, POSTS, InvalidFields
+
+
+def json_response(data, status=HTTPStatus.OK):
+    return HttpResponse(
+        json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False,
+                   separators=(',', ':')),
+        content_type='application/json',
+        status=status
+    )
+
+
+def error(detail, status):
+    return json_response({'detail': detail}, status=status)
+
+
+def conditional(request, resource, render):
+    """Ответ с ETag; на совпавший If-None-Match — 304.
+
+    Если у ресурса есть области кэша, ETag строится из их поколений
+    и адреса запроса, и повторный запрос не обращается к базе.
+    Иначе ответ собирается, и ETag считается по его телу.
+    """
+    etag = None
+    if resource.scopes:
+        etag = make_etag(
+            get_generations(resource.scopes), request.get_full_path())
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            return response
+    response = render()
+    if response.status_code != HTTPStatus.OK:
+        return response
+    if etag is None:
+        etag = make_etag(response.content.decode())
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+    response['ETag'] = etag
+    return response
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        size = settings.API_PAGE_SIZE
+    return max(1, min(size, settings.API_MAX_PAGE_SIZE))
+
+
+def page_url(request, **params):
+    query = request.GET.copy()
+    for key in ('after', 'before'):
+        query.pop(key, None)
+    query.update(params)
+    return request.build_absolute_uri('?' + query.urlencode())
+
+
+def list_response(request, resource, queryset):
+    def render():
+        try:
+            names = resource.parse_fields(request.GET.get('fields'))
+        except InvalidFields as exc:
+            return error('Неизвестные поля: %s' % exc,
+                         HTTPStatus.BAD_REQUEST)
+        paginator = CursorPaginator(
+            resource.values(queryset, names), page_size(request),
+            ordering=resource.ordering)
+        page = paginator.get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before')
+        )
+        return json_response({
+            'results': [resource.serialize(row, names) for row in page],
+            'next': page_url(request, after=page.next_cursor)
+            if page.has_next() else None,
+            'previous': page_url(request, before=page.previous_cursor)
+            if page.has_previous() else None,
+        })
+    return conditional(request, resource, render)
+
+
+def detail_response(request, resource, queryset):
+    def render():
+        try:
+            names = resource.parse_fields(request.GET.get('fields'))
+        except InvalidFields as exc:
+            return error('Неизвестные поля: %s' % exc,
+                         HTTPStatus.BAD_REQUEST)
+        row = resource.values(queryset, names).first()
+        if row is None:
+            return error('Не найдено.', HTTPStatus.NOT_FOUND)
+        return json_response(resource.serialize(row, names))
+    return conditional(request, resource, render)
+
+
+@require_GET
+def post_list(request):
+    queryset = Post.objects.all()
+    if request.GET.get('group'):
+        queryset = queryset.filter(group__slug=request.GET['group'])
+    if request.GET.get('author'):
+        queryset = queryset.filter(
+            author__username=request.GET['author'])
+    return list_response(request, POSTS, queryset)
+
+
+@require_GET
+def post_detail(request, post_id):
+    return detail_response(
+        request, POSTS, Post.objects.filter(pk=post_id))
+
+
+@require_GET
+def comment_list(request, post_id):
+    return list_response(
+        request, COMMENTS, Comment.objects.filter(post=post_id))
+
+
+@require_GET
+def group_list(request):
+    return list_response(request, GROUPS, Group.objects.all())
+
+
+@require_GET
+def group_detail(request, slug):
+    return detail_response(
+        request, GROUPS, Group.objects.filter(slug=slug))
+
+
+@require_GET
+def follow_list(request):
+    if not request.user.is_authenticated:
+        return error('Нужна авторизация.', HTTPStatus.UNAUTHORIZED)
+    return list_response(
+        request, FOLLOWS, Follow.objects.filter(user=request.user))
@@ -0,0 +1,95 @@
+"""Поколения кэша и счётчики попаданий.
+
+Каждая область данных (например, 'index' или 'group:3') имеет
+номер поколения в кэше. Он входит в ключ фрагментов, поэтому
+bump() мгновенно делает устаревшими все фрагменты области,
+и их можно хранить сколько угодно долго. Рядом с поколением
+хранится время его смены: по нему core.conditional отдаёт
+Last-Modified, который видит и правку, и удаление строк.
+
+Попадания и промахи фрагментов копятся в памяти процесса вместе с
+метриками (core.metrics) и попадают в общую таблицу при их сбросе.
+"""
+import time
+
+from django.core.cache import cache
+
+from . import metrics
+
+GENERATION_KEY = 'generation:%s'
+MODIFIED_KEY = 'modified:%s'
+# Исход: (счётчик по адресу запроса, счётчик по имени фрагмента).
+OUTCOME_METRICS = {
+    'hit': ('yatube_cache_hits_total', 'yatube_fragment_hits_total'),
+    'miss': ('yatube_cache_misses_total', 'yatube_fragment_misses_total'),
+}
+
+
+def _initial_generation():
+    # Если ключ поколения вытеснят из кэша, новое поколение не
+    # совпадёт ни с одним из прежних.
+    return time.time_ns()
+
+
+def get_generation(scope):
+    key = GENERATION_KEY % scope
+    generation = cache.get(key)
+    if generation is None:
+        # Данные могли меняться и раньше, но страниц старше нового
+        # поколения в кэше нет.
+        cache.add(MODIFIED_KEY % scope, time.time(), None)
+        cache.add(key, _initial_generation(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def get_generations(scopes):
+    return ':'.join(str(get_generation(scope)) for scope in scopes)
+
+
+def get_modified(scopes):
+    """Время последней смены поколения областей или None."""
+    keys = [MODIFIED_KEY % scope for scope in scopes]
+    times = cache.get_many(keys)
+    if not keys or len(times) < len(keys):
+        return None
+    return max(times.values())
+
+
+def bump(*scopes):
+    # Время пишется раньше поколения: страница нового поколения не
+    # получит Last-Modified старше своих данных.
+    cache.set_many(
+        {MODIFIED_KEY % scope: time.time() for scope in scopes}, None)
+    for scope in scopes:
+        key = GENERATION_KEY % scope
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_generation(), None)
+
+
+def count(fragment_name, outcome, number=1):
+    # Только сложения в памяти процесса: запись в общий кэш на каждое
+    # попадание выстроила бы все процессы в очередь за блокировкой.
+    if not number:
+        return
+    per_view, per_fragment = OUTCOME_METRICS[outcome]
+    metrics.add(per_view, number)
+    metrics.add_to(fragment_name, per_fragment, number)
+
+
+def stats(fragment_name):
+    """Попадания, промахи и доля попаданий для фрагмента."""
+    # Своё накопленное процесс сбрасывает, чтобы его тоже учесть.
+    metrics.flush()
+    hits = int(metrics.totals(
+        OUTCOME_METRICS['hit'][1]).get(fragment_name, 0))
+    misses = int(metrics.totals(
+        OUTCOME_METRICS['miss'][1]).get(fragment_name, 0))
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+    }
@@ -0,0 +1,275 @@
+"""Кэш в файле SQLite, общий для всех процессов на сервере.
+
+В отличие от LocMemCache, записи видят все рабочие процессы
+gunicorn, поэтому сброс поколения в одном процессе виден
+остальным, а прогретый кэш не пропадает при добавлении воркеров.
+incr и add выполняются в транзакции BEGIN IMMEDIATE и поэтому
+атомарны между процессами.
+
+Настройки OPTIONS:
+    MAX_ENTRIES — сколько записей хранить (по умолчанию 300);
+    MAX_SIZE — сколько байт значений хранить (по умолчанию без
+    ограничения);
+    CULL_FREQUENCY — при переполнении удаляется 1/CULL_FREQUENCY
+    давно не читанных записей;
+    CULL_INTERVAL — проверять переполнение раз в столько записей.
+
+Число записей и их общий размер триггеры держат в таблице
+cache_totals, так что проверка переполнения не читает сами значения.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL,'
+    ' size INTEGER NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    'CREATE TABLE IF NOT EXISTS cache_totals ('
+    ' id INTEGER PRIMARY KEY CHECK (id = 0),'
+    ' entries INTEGER NOT NULL,'
+    ' size INTEGER NOT NULL)',
+    # Файл кэша от прежней версии считается один раз.
+    'INSERT OR IGNORE INTO cache_totals (id, entries, size) '
+    'SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM cache',
+    'CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache '
+    'BEGIN UPDATE cache_totals SET entries = entries + 1,'
+    ' size = size + new.size; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache '
+    'BEGIN UPDATE cache_totals SET entries = entries - 1,'
+    ' size = size - old.size; END',
+    'CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache '
+    'BEGIN UPDATE cache_totals SET size = size - old.size + new.size; END',
+)
+# Время последнего чтения обновляется не чаще, чем раз в столько
+# секунд: иначе каждое чтение превращалось бы в запись.
+ACCESS_RESOLUTION = 1.0
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = options.get('MAX_SIZE')
+        self._cull_interval = int(options.get('CULL_INTERVAL', 64))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    @property
+    def _db(self):
+        # Соединение своё у каждого потока и у каждого процесса:
+        # после fork унаследованное соединение использовать нельзя.
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            with _Immediate(db):
+                for statement in SCHEMA:
+                    db.execute(statement)
+            local.db = db
+            local.pid = os.getpid()
+        return local.db
+
+    def _transaction(self):
+        return _Immediate(self._db)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _decode(self, row, now):
+        value, expires, accessed = row
+        if expires is not None and expires <= now:
+            return None
+        return pickle.loads(value)
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        row = self._db.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?',
+            (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= now):
+            return default
+        if now - row[2] > ACCESS_RESOLUTION:
+            with self._transaction() as db:
+                db.execute(
+                    'UPDATE cache SET accessed = ? WHERE key = ?',
+                    (now, key))
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        key_map = {self._key(key, version): key for key in keys}
+        if not key_map:
+            return {}
+        now = time.time()
+        placeholders = ','.join('?' * len(key_map))
+        rows = self._db.execute(
+            'SELECT key, value, expires FROM cache '
+            'WHERE key IN (%s)' % placeholders, list(key_map)).fetchall()
+        return {
+            key_map[key]: pickle.loads(value)
+            for key, value, expires in rows
+            if expires is None or expires > now
+        }
+
+    def _write(self, db, key, value, timeout):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        # Не INSERT OR REPLACE: удаление при замене не вызывает
+        # триггер, и счётчики cache_totals разошлись бы.
+        db.execute(
+            'INSERT INTO cache '
+            '(key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+            'expires = excluded.expires, accessed = excluded.accessed, '
+            'size = excluded.size',
+            (key, data, self.get_backend_timeout(timeout), time.time(),
+             len(data)))
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._transaction() as db:
+            self._write(db, key, value, timeout)
+        self._maybe_cull()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._transaction() as db:
+            for key, value in data.items():
+                self._write(db, self._key(key, version), value, timeout)
+        self._maybe_cull()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._transaction() as db:
+            db.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, time.time()))
+            exists = db.execute(
+                'SELECT 1 FROM cache WHERE key = ?', (key,)).fetchone()
+            if exists:
+                return False
+            self._write(db, key, value, timeout)
+        self._maybe_cull()
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._transaction() as db:
+            row = db.execute(
+                'SELECT value, expires, accessed FROM cache '
+                'WHERE key = ?', (key,)).fetchone()
+            value = None if row is None else self._decode(row, time.time())
+            if value is None:
+                raise ValueError("Key '%s' not found" % key)
+            value += delta
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            db.execute(
+                'UPDATE cache SET value = ?, size = ? WHERE key = ?',
+                (data, len(data), key))
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._transaction() as db:
+            cursor = db.execute(
+                'UPDATE cache SET expires = ? '
+                'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), key, time.time()))
+        return cursor.rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._db.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time())).fetchone() is not None
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        with self._transaction() as db:
+            db.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def delete_many(self, keys, version=None):
+        with self._transaction() as db:
+            db.executemany(
+                'DELETE FROM cache WHERE key = ?',
+                [(self._key(key, version),) for key in keys])
+
+    def clear(self):
+        with self._transaction() as db:
+            db.execute('DELETE FROM cache')
+
+    def _maybe_cull(self):
+        with self._lock:
+            self._writes += 1
+            due = not self._writes % self._cull_interval
+        if due:
+            self.cull()
+
+    def _totals(self, db):
+        return db.execute(
+            'SELECT entries, size FROM cache_totals').fetchone()
+
+    def cull(self):
+        """Удаляет истёкшие записи, а при переполнении — давно не
+        читанные, пока кэш не уложится в MAX_ENTRIES и MAX_SIZE."""
+        with self._transaction() as db:
+            db.execute(
+                'DELETE FROM cache WHERE expires <= ?', (time.time(),))
+            count, size = self._totals(db)
+            over_size = self._max_size is not None and size > self._max_size
+            if count <= self._max_entries and not over_size:
+                return
+            if self._cull_frequency == 0:
+                db.execute('DELETE FROM cache')
+                return
+            db.execute(
+                'DELETE FROM cache WHERE key IN ('
+                ' SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (max(count - self._max_entries,
+                     count // self._cull_frequency),))
+            while over_size and count:
+                # Добиваем по размеру, срезая самые старые записи.
+                db.execute(
+                    'DELETE FROM cache WHERE key IN ('
+                    ' SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                    (max(1, count // self._cull_frequency),))
+                count, size = self._totals(db)
+                over_size = size > self._max_size
+
+    def close(self, **kwargs):
+        # Соединение переиспользуется между запросами.
+        pass
+
+
+class _Immediate:
+    """BEGIN IMMEDIATE ... COMMIT: сразу берёт блокировку записи,
+    поэтому чтение и запись внутри видят согласованные данные."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.db.execute('COMMIT' if exc_type is None else 'ROLLBACK')
@@ -0,0 +1,69 @@
+"""Условные GET-запросы: ETag и Last-Modified до рендеринга.
+
+Validator строит валидаторы страницы по поколениям её областей
+кэша (core.cache), без запросов к базе: любая запись, которая видна
+на странице, меняет поколение одной из областей. В ETag к
+поколениям добавляются пользователь, адрес страницы и то, что
+страница выводит помимо областей. Last-Modified — время последней
+смены поколения; если оно неизвестно, заголовка нет, и страница
+проверяется только по ETag.
+
+Если клиент прислал совпавший If-None-Match или If-Modified-Since не
+старше Last-Modified, представление отвечает 304, не выбирая
+страницу и не рендеря шаблон. Браузеры присылают оба заголовка, и
+тогда If-Modified-Since не проверяется.
+"""
+import hashlib
+from http import HTTPStatus
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .cache import get_generations, get_modified
+
+
+def make_etag(*parts):
+    digest = hashlib.md5('|'.join(parts).encode()).hexdigest()
+    return '"%s"' % digest
+
+
+class Validator:
+    def __init__(self, request, scopes, extra=(), modified=None):
+        """scopes — области кэша страницы; extra — прочее, что видно
+        на странице и не входит в области (заголовок, подписка);
+        modified — дата, не раньше которой изменилась страница."""
+        self.request = request
+        self.scopes = scopes
+        self.generations = get_generations(scopes)
+        changed = get_modified(scopes)
+        self.last_modified = None
+        if changed is not None:
+            if modified is not None:
+                changed = max(changed, modified.timestamp())
+            self.last_modified = int(changed)
+        self.etag = make_etag(
+            request.get_full_path(),
+            str(request.user.pk),
+            self.generations,
+            str(modified),
+            *[str(part) for part in extra]
+        )
+
+    def not_modified(self):
+        """Ответ 304, если у клиента актуальная копия, иначе None."""
+        return get_conditional_response(
+            self.request, etag=self.etag, last_modified=self.last_modified)
+
+    def apply(self, response):
+        """Добавляет валидаторы к полному ответу."""
+        if response.status_code != HTTPStatus.OK:
+            return response
+        response['ETag'] = self.etag
+        if self.last_modified is not None:
+            response['Last-Modified'] = http_date(self.last_modified)
+        # Без no-cache браузер может показывать ленту из своего кэша
+        # по эвристике Last-Modified, не спрашивая сервер.
+        patch_cache_control(response, no_cache=True)
+        # По поколениям core.page_cache проверяет сохранённую страницу.
+        response.validator = self
+        return response
@@ -0,0 +1,130 @@
+"""Кэш поиска объектов по уникальному полю в памяти процесса.
+
+Ленты групп и профили начинаются с поиска группы по slug и автора по
+username. LookupCache запоминает найденные строки в памяти процесса:
+не больше LOOKUP_CACHE_SIZE последних (LRU) и не дольше
+LOOKUP_CACHE_TIMEOUT секунд. Хранятся значения полей, а не сами
+объекты: каждый поиск получает новый экземпляр модели, и правка его
+в одном запросе не видна другим. Если задан fields, хранятся только
+первичный ключ и эти поля, а остальные загружаются при обращении,
+как после only(): так в памяти не лежат, например, хеши паролей.
+
+Сохранение и удаление строки (сигналы, см. posts.signals) вызывают
+invalidate(): она очищает кэш процесса и меняет поколение области
+кэша core.cache с именем кэша. Поколение хранится в общем кэше,
+поэтому другие процессы сервера при следующем поиске видят новое
+поколение и тоже очищают свой кэш.
+
+Попадания и промахи копятся в метриках (core.metrics) с именем кэша
+вместо имени адреса; их показывает команда cache_stats.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.http import Http404
+
+from . import metrics
+from .cache import bump, get_generation
+
+SCOPE = 'lookup:%s'
+OUTCOME_METRICS = {
+    'hit': 'yatube_lookup_hits_total',
+    'miss': 'yatube_lookup_misses_total',
+}
+
+
+class LookupCache:
+    def __init__(self, name, model, field, size=None, timeout=None,
+                 fields=None):
+        self.name = name
+        self.model = model
+        self.field = field
+        self.size = size or settings.LOOKUP_CACHE_SIZE
+        self.timeout = timeout or settings.LOOKUP_CACHE_TIMEOUT
+        if fields is None:
+            self.attnames = [
+                field.attname for field in model._meta.concrete_fields]
+        else:
+            pk = model._meta.pk.attname
+            self.attnames = [pk] + [
+                model._meta.get_field(name).attname
+                for name in fields if name != pk]
+        self.lock = threading.Lock()
+        # Значение поля -> (значения полей строки, когда устареет).
+        self.entries = OrderedDict()
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+
+    def _count(self, outcome):
+        if outcome == 'hit':
+            self.hits += 1
+        else:
+            self.misses += 1
+        metrics.add_to(self.name, OUTCOME_METRICS[outcome])
+
+    def _cached(self, value, generation):
+        with self.lock:
+            if generation != self.generation:
+                self.entries.clear()
+                self.generation = generation
+                return None
+            entry = self.entries.get(value)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                del self.entries[value]
+                return None
+            self.entries.move_to_end(value)
+            return entry[0]
+
+    def _remember(self, value, values, generation):
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.entries[value] = (values, time.monotonic() + self.timeout)
+            self.entries.move_to_end(value)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def get(self, value):
+        """Объект с field=value или None, если его нет."""
+        generation = get_generation(SCOPE % self.name)
+        values = self._cached(value, generation)
+        if values is not None:
+            self._count('hit')
+            return self.model.from_db(
+                DEFAULT_DB_ALIAS, self.attnames, values)
+        self._count('miss')
+        values = self.model._default_manager.filter(
+            **{self.field: value}).values_list(*self.attnames).first()
+        if values is None:
+            return None
+        self._remember(value, values, generation)
+        return self.model.from_db(DEFAULT_DB_ALIAS, self.attnames, values)
+
+    def get_or_404(self, value):
+        instance = self.get(value)
+        if instance is None:
+            raise Http404('Нет %s с %s=%s' % (
+                self.model._meta.verbose_name, self.field, value))
+        return instance
+
+    def invalidate(self):
+        """Очищает кэш этого процесса и всех остальных."""
+        bump(SCOPE % self.name)
+        with self.lock:
+            self.entries.clear()
+            self.generation = None
+
+    def stats(self):
+        """Попадания, промахи и доля попаданий в этом процессе."""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,83 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'filebased': 'django.core.cache.backends.filebased.FileBasedCache',
+    'sqlite': 'core.cache_backends.SQLiteCache',
+}
+# Фрагмент ленты примерно такого размера кладёт {% versioned_cache %}.
+VALUE = 'x' * 20000
+
+
+def create_cache(name, directory):
+    location = os.path.join(directory, name)
+    if name == 'sqlite':
+        location += '.sqlite3'
+    return import_string(BACKENDS[name])(
+        location, {'OPTIONS': {'MAX_ENTRIES': 100000}})
+
+
+def run_worker(name, directory, operations, keys):
+    cache = create_cache(name, directory)
+    for number in range(operations):
+        key = 'key%d' % (number % keys)
+        if number % 10 == 0:
+            cache.set(key, VALUE)
+        else:
+            cache.get(key)
+            cache.incr('hits')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность LocMemCache, FileBasedCache '
+        'и SQLiteCache: 90% чтений, 10% записей и incr на каждое '
+        'чтение, как у кэша фрагментов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operations', type=int, default=20000)
+        parser.add_argument('--keys', type=int, default=500)
+        parser.add_argument(
+            '--processes', type=int, default=4,
+            help='Сколько процессов одновременно работают с кэшем.')
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        try:
+            for name in BACKENDS:
+                self.bench(name, directory, options)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def bench(self, name, directory, options):
+        cache = create_cache(name, directory)
+        cache.set('hits', 0)
+        operations = options['operations']
+        processes = options['processes']
+        started = time.perf_counter()
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(
+                target=run_worker,
+                args=(name, directory, operations, options['keys']))
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        hits = cache.get('hits') or 0
+        expected = processes * sum(
+            1 for number in range(operations) if number % 10)
+        self.stdout.write(
+            '%-10s %10.0f оп/с, общий счётчик: %d из %d' % (
+                name, processes * operations / elapsed, hits, expected))
@@ -0,0 +1,107 @@
+import multiprocessing
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, router, transaction
+
+from posts.models import Comment, Post, User
+
+BENCH_USERNAME = 'bench_database'
+
+
+def percentile(values, share):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def run_worker(kind, post_id, user_id, seconds, results):
+    # Каждый процесс открывает свои соединения.
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            if kind == 'read':
+                list(Post.objects.select_related('author', 'group')
+                     .order_by('-pub_date', '-pk')[:10])
+            else:
+                with transaction.atomic():
+                    Comment.objects.create(
+                        post_id=post_id, author_id=user_id,
+                        text='Комментарий для замера')
+        except OperationalError:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+    connections.close_all()
+    results.put((kind, latencies, errors))
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает базу одновременными чтениями ленты и записями '
+        'комментариев из нескольких процессов и выводит число '
+        'операций в секунду, задержки и ошибки блокировки. '
+        'Запустите с YATUBE_DATABASE_PROFILE=production и без него, '
+        'чтобы сравнить профили. Созданные записи удаляются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument(
+            '--seconds', type=float, default=5,
+            help='Сколько секунд длится замер.')
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username=BENCH_USERNAME)
+        post = Post.objects.create(author=user, text='Пост для замера')
+        with connections['default'].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+        self.stdout.write(
+            'Профиль: %s, journal_mode=%s, чтение из «%s»' % (
+                settings.DATABASE_PROFILE, journal_mode,
+                router.db_for_read(Post)))
+        try:
+            self.bench(post.pk, user.pk, options)
+        finally:
+            post.delete()
+            user.delete()
+
+    def bench(self, post_id, user_id, options):
+        # Открытые соединения не должны достаться дочерним процессам.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        kinds = (['read'] * options['readers']
+                 + ['write'] * options['writers'])
+        workers = [
+            context.Process(
+                target=run_worker,
+                args=(kind, post_id, user_id, options['seconds'], results))
+            for kind in kinds
+        ]
+        for worker in workers:
+            worker.start()
+        rows = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        for kind in ('read', 'write'):
+            own = [row for row in rows if row[0] == kind]
+            if not own:
+                continue
+            latencies = sorted(
+                latency for row in own for latency in row[1])
+            self.stdout.write(
+                '%-6s %8.0f оп/с  p50 %6.2f мс  p95 %6.2f мс  '
+                'max %7.2f мс  ошибок блокировки: %d' % (
+                    kind,
+                    len(latencies) / options['seconds'],
+                    percentile(latencies, 0.5) * 1000,
+                    percentile(latencies, 0.95) * 1000,
+                    (latencies[-1] if latencies else 0) * 1000,
+                    sum(row[2] for row in own)))
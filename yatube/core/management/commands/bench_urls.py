@@ -0,0 +1,235 @@
+import json
+import platform
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from posts.models import Comment, Follow, Group, Post, Profile, User
+from .bench_database import percentile
+
+# Пространства имён и адреса, которые не страницы для чтения: они
+# меняют данные или ведут в админку и отладку.
+SKIP_NAMESPACES = {'admin', 'djdt'}
+SKIP_NAMES = {
+    'logout',
+    'users:logout',
+    'posts:add_comment',
+    'posts:profile_follow',
+    'posts:profile_unfollow',
+}
+QUERY_STRINGS = {
+    'posts:search': {'q': 'пост'},
+}
+
+
+def named_urls(patterns=None, namespace=''):
+    """Имена всех адресов проекта с именами их параметров."""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace in SKIP_NAMESPACES:
+                continue
+            prefix = namespace
+            if pattern.namespace:
+                prefix += pattern.namespace + ':'
+            yield from named_urls(pattern.url_patterns, prefix)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield (namespace + pattern.name,
+                   sorted(pattern.pattern.regex.groupindex))
+
+
+def sample_kwargs():
+    """Параметры адресов: самые нагруженные страницы набора."""
+    post = Post.objects.order_by('-comments_count', '-pk').first()
+    author = Profile.objects.order_by(
+        '-followers_count', '-pk').values_list(
+        'user__username', flat=True).first()
+    group = (post.group if post is not None and post.group_id
+             else Group.objects.first())
+    values = {'username': author}
+    if post is not None:
+        values['post_id'] = post.pk
+    if group is not None:
+        values['slug'] = group.slug
+    return values
+
+
+def reader():
+    """Пользователь с самой длинной лентой подписок."""
+    return User.objects.filter(
+        pk=Follow.objects.values('user').order_by().annotate(
+            total=Count('author')
+        ).order_by('-total').values('user')[:1]).first()
+
+
+class Command(BaseCommand):
+    help = (
+        'Запрашивает каждый именованный адрес проекта через '
+        'тестовый клиент (все middleware, как в бою) и выводит '
+        'задержки p50/p95/p99, число SQL-запросов и пик памяти на '
+        'запрос. Данные берутся из текущей базы: для сравнения '
+        'выпусков заполните её командой seed с одним и тем же '
+        '--seed и сохраняйте результаты в --json.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Сколько раз запросить каждый адрес.')
+        parser.add_argument(
+            '--warmup', type=int, default=2,
+            help='Сколько запросов сделать до замера.')
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.')
+        parser.add_argument(
+            '--as', dest='users', nargs='+',
+            choices=('anonymous', 'user'), default=['anonymous', 'user'],
+            help='От чьего имени запрашивать страницы.')
+        parser.add_argument(
+            '--only', nargs='+', default=(),
+            help='Имена адресов для замера, например posts:index.')
+        parser.add_argument(
+            '--json', help='Сохранить результаты в файл.')
+        parser.add_argument(
+            '--compare', help='Сравнить с результатами из файла --json.')
+
+    def handle(self, *args, **options):
+        kwargs = sample_kwargs()
+        user = reader()
+        if 'user' in options['users'] and user is None:
+            raise CommandError(
+                'Нет пользователя с подписками: заполните базу '
+                'командой seed.')
+        urls = []
+        skipped = []
+        for name, params in named_urls():
+            if name in SKIP_NAMES or (
+                    options['only'] and name not in options['only']):
+                continue
+            if any(kwargs.get(param) is None for param in params):
+                skipped.append(name)
+                continue
+            urls.append((name, reverse(
+                name, kwargs={param: kwargs[param] for param in params})))
+        # Отладочная панель и DEBUG искажают замер, а тестовому
+        # клиенту нужен хост testserver.
+        with override_settings(
+                DEBUG=False,
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            results = [
+                self.measure(name, url, who, user, options)
+                for who in options['users']
+                for name, url in urls
+            ]
+        self.report(results, options.get('compare'))
+        for name in skipped:
+            self.stdout.write('Пропущен %s: нет данных для адреса' % name)
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as output:
+                json.dump({
+                    'django': django.get_version(),
+                    'python': platform.python_version(),
+                    'profile': settings.DATABASE_PROFILE,
+                    'rows': {
+                        model._meta.label_lower: model.objects.count()
+                        for model in (User, Group, Post, Comment, Follow)
+                    },
+                    'options': {
+                        key: options[key]
+                        for key in ('requests', 'warmup', 'cold')
+                    },
+                    'results': results,
+                }, output, ensure_ascii=False, indent=2)
+
+    def measure(self, name, url, who, user, options):
+        client = Client()
+        if who == 'user':
+            client.force_login(user)
+        data = QUERY_STRINGS.get(name)
+        for _ in range(options['warmup']):
+            client.get(url, data)
+        latencies = []
+        queries = []
+        status = None
+        for _ in range(options['requests']):
+            if options['cold']:
+                cache.clear()
+            with CaptureQueries() as captured:
+                started = time.perf_counter()
+                response = client.get(url, data)
+                # Потоковые ответы считаются вместе с выдачей тела.
+                b''.join(response)
+                latencies.append(time.perf_counter() - started)
+            queries.append(len(captured))
+            status = response.status_code
+        # Память отдельным запросом: трассировка сильно его замедляет.
+        if options['cold']:
+            cache.clear()
+        tracemalloc.start()
+        b''.join(client.get(url, data))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        latencies.sort()
+        return {
+            'name': name,
+            'user': who,
+            'status': status,
+            'p50': percentile(latencies, 0.5) * 1000,
+            'p95': percentile(latencies, 0.95) * 1000,
+            'p99': percentile(latencies, 0.99) * 1000,
+            'queries': sum(queries) / len(queries) if queries else 0,
+            'memory': peak / 1024,
+        }
+
+    def report(self, results, compare):
+        previous = {}
+        if compare:
+            with open(compare, encoding='utf-8') as saved:
+                previous = {
+                    (row['name'], row['user']): row
+                    for row in json.load(saved)['results']
+                }
+        self.stdout.write(
+            '%-26s %-9s %6s %9s %9s %9s %8s %9s' % (
+                'адрес', 'кто', 'код', 'p50 мс', 'p95 мс', 'p99 мс',
+                'запросов', 'пик КиБ'))
+        for row in results:
+            line = '%-26s %-9s %6s %9.2f %9.2f %9.2f %8.1f %9.0f' % (
+                row['name'], row['user'], row['status'], row['p50'],
+                row['p95'], row['p99'], row['queries'], row['memory'])
+            old = previous.get((row['name'], row['user']))
+            if old is not None and old['p50']:
+                line += '  p50 %+.0f%%, запросов %+.1f' % (
+                    (row['p50'] / old['p50'] - 1) * 100,
+                    row['queries'] - old['queries'])
+            self.stdout.write(line)
+
+
+class CaptureQueries:
+    """CaptureQueriesContext сразу для всех баз (основной и реплики)."""
+    def __enter__(self):
+        self.contexts = [
+            CaptureQueriesContext(connections[alias])
+            for alias in connections
+        ]
+        for context in self.contexts:
+            context.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        for context in self.contexts:
+            context.__exit__(*exc_info)
+
+    def __len__(self):
+        return sum(len(context) for context in self.contexts)
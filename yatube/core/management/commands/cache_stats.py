@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from core import metrics
+from core.cache import stats
+from core.lookups import OUTCOME_METRICS
+
+
+class Command(BaseCommand):
+    help = ('Показывает попадания и промахи кэша фрагментов и кэшей '
+            'поиска объектов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'fragments', nargs='*',
+            default=['index_page', 'group_page', 'profile_page'],
+            help='Имена фрагментов из тегов {% versioned_cache %}.')
+
+    def handle(self, *args, **options):
+        for name in options['fragments']:
+            self.write(name, stats(name))
+        # Кэши поиска живут в памяти процессов сервера; их счётчики
+        # собираются в общей таблице метрик.
+        metrics.flush()
+        hits = metrics.totals(OUTCOME_METRICS['hit'])
+        misses = metrics.totals(OUTCOME_METRICS['miss'])
+        for name in sorted(set(hits) | set(misses)):
+            total = hits.get(name, 0) + misses.get(name, 0)
+            self.write(name, {
+                'hits': hits.get(name, 0),
+                'misses': misses.get(name, 0),
+                'hit_rate': hits.get(name, 0) / total if total else 0.0,
+            })
+
+    def write(self, name, result):
+        self.stdout.write(
+            '%s: попаданий %d, промахов %d, доля попаданий %.1f%%' % (
+                name, result['hits'], result['misses'],
+                result['hit_rate'] * 100))
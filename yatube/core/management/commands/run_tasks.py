@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет задания из очереди core.tasks. Можно запустить '
+        'несколько обработчиков: каждый берёт задания в аренду '
+        'порциями по --batch-size.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.TASK_BATCH_SIZE,
+            help='Сколько заданий брать за раз.')
+        parser.add_argument(
+            '--lease', type=int, default=settings.TASK_LEASE,
+            help='На сколько секунд брать задания.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задания и выйти.')
+
+    def handle(self, *args, **options):
+        worker = tasks.worker_name()
+        done = 0
+        try:
+            while True:
+                close_old_connections()
+                claimed = tasks.run_batch(
+                    worker, options['batch_size'], options['lease'])
+                done += claimed
+                if not claimed:
+                    if options['once']:
+                        break
+                    time.sleep(settings.TASK_POLL_INTERVAL)
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            'Выполнено заданий: %d' % done))
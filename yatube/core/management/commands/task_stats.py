@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from core import metrics, tasks
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает очередь заданий: сколько готово, ждёт срока, '
+        'выполняется и не выполнено, сколько ждёт самое старое '
+        'готовое, и среднюю задержку и время выполнения по метрикам.'
+    )
+
+    def handle(self, *args, **options):
+        metrics.flush()
+        totals = {}
+        for name, view, le, value in metrics.collect():
+            if name.startswith('yatube_task_') and not le:
+                totals[name, view] = value
+        rows = tasks.summary()
+        names = sorted(set(rows) | {view for _, view in totals})
+        if not names:
+            self.stdout.write('Очередь пуста')
+            return
+        for name in names:
+            row = rows.get(name, {})
+            line = (
+                '%s: готово %d, ждут срока %d, выполняются %d, '
+                'не выполнено %d' % (
+                    name, row.get('ready', 0), row.get('waiting', 0),
+                    row.get('running', 0), row.get('failed', 0)))
+            if row.get('oldest') is not None:
+                line += ', старейшее ждёт %.0f с' % row['oldest']
+            runs = totals.get(('yatube_task_latency_seconds_count', name))
+            if runs:
+                line += (
+                    '; запусков %d, задержка %.2f с, время %.2f с, '
+                    'ошибок %d' % (
+                        runs,
+                        totals[
+                            'yatube_task_latency_seconds_sum', name] / runs,
+                        totals['yatube_task_seconds_total', name] / runs,
+                        totals.get(
+                            ('yatube_task_failures_total', name), 0)))
+            self.stdout.write(line)
@@ -0,0 +1,273 @@
+"""Метрики запросов в формате Prometheus.
+
+MetricsMiddleware копит в памяти процесса по имени адреса
+(view_name): гистограмму длительности запроса, число и время
+SQL-запросов ко всем базам из DATABASES, попадания и промахи кэша
+фрагментов и время рендеринга шаблонов. Обработчик очереди
+core.tasks так же копит задержку, время и ошибки заданий, с именем
+задания вместо имени адреса, а кэш фрагментов (core.cache) и кэши
+поиска core.lookups — попадания и промахи с именем фрагмента или
+кэша. Раз в METRICS_FLUSH_INTERVAL секунд накопленное прибавляется к
+общей для всех рабочих процессов таблице в файле SQLite
+METRICS_PATH, откуда его читает представление metrics. Измерители
+(GAUGES), например длина очереди, считаются при выводе.
+
+На запрос приходятся только сложения в словаре: к базе метрик
+обращается лишь сброс, один на интервал.
+"""
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+# Верхние границы корзин гистограммы длительности, в секундах.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKET_LABELS = tuple(repr(bound) for bound in BUCKETS) + ('+Inf',)
+
+# Метрика: (тип, описание).
+METRICS = {
+    'yatube_request_duration_seconds': (
+        'histogram', 'Длительность обработки запроса.'),
+    'yatube_db_queries_total': (
+        'counter', 'Число SQL-запросов.'),
+    'yatube_db_query_seconds_total': (
+        'counter', 'Время выполнения SQL-запросов.'),
+    'yatube_cache_hits_total': (
+        'counter', 'Попадания в кэш фрагментов.'),
+    'yatube_cache_misses_total': (
+        'counter', 'Промахи кэша фрагментов.'),
+    'yatube_fragment_hits_total': (
+        'counter', 'Попадания в кэш по имени фрагмента (core.cache).'),
+    'yatube_fragment_misses_total': (
+        'counter', 'Промахи кэша по имени фрагмента (core.cache).'),
+    'yatube_template_render_seconds_total': (
+        'counter', 'Время рендеринга шаблонов.'),
+    'yatube_lookup_hits_total': (
+        'counter', 'Попадания в кэш поиска объектов (core.lookups).'),
+    'yatube_lookup_misses_total': (
+        'counter', 'Промахи кэша поиска объектов (core.lookups).'),
+    'yatube_task_latency_seconds': (
+        'histogram', 'Задержка от срока задания до начала выполнения.'),
+    'yatube_task_seconds_total': (
+        'counter', 'Время выполнения заданий.'),
+    'yatube_task_failures_total': (
+        'counter', 'Задания, завершившиеся ошибкой.'),
+    'yatube_task_queue_depth': (
+        'gauge', 'Задания, готовые к выполнению.'),
+}
+# Значения измерителей считаются при выводе: метрика -> функция,
+# которая возвращает словарь {ряд: значение}.
+GAUGES = {
+    'yatube_task_queue_depth': 'core.tasks.queue_depth',
+}
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS metrics ('
+    ' name TEXT NOT NULL,'
+    ' view TEXT NOT NULL,'
+    ' le TEXT NOT NULL,'
+    ' value REAL NOT NULL,'
+    ' PRIMARY KEY (name, view, le))'
+)
+
+_local = threading.local()
+_lock = threading.Lock()
+# (метрика, view, le) -> накопленное с последнего сброса.
+_pending = defaultdict(float)
+_last_flush = time.monotonic()
+
+
+def add(name, value=1):
+    """Прибавляет value к счётчику текущего запроса.
+
+    Вне запроса, который проходит через MetricsMiddleware, ничего
+    не делает.
+    """
+    current = getattr(_local, 'current', None)
+    if current is not None:
+        current[name] += value
+
+
+class QueryTimer:
+    """Обёртка execute_wrapper: считает SQL-запросы и их время."""
+
+    def __init__(self, current):
+        self.current = current
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.current['yatube_db_queries_total'] += 1
+            self.current['yatube_db_query_seconds_total'] += (
+                time.perf_counter() - started)
+
+
+def observe(view, duration, current,
+            family='yatube_request_duration_seconds'):
+    bucket = BUCKET_LABELS[bisect_left(BUCKETS, duration)]
+    with _lock:
+        _pending[family + '_bucket', view, bucket] += 1
+        _pending[family + '_sum', view, ''] += duration
+        _pending[family + '_count', view, ''] += 1
+        for name, value in current.items():
+            _pending[name, view, ''] += value
+
+
+def add_to(view, name, value=1):
+    """Прибавляет value к счётчику ряда view вне запроса."""
+    with _lock:
+        _pending[name, view, ''] += value
+
+
+def observe_task(name, latency, duration, failed=False):
+    """Задержку и время выполнения задания (core.tasks) в ряд name."""
+    current = {'yatube_task_seconds_total': duration}
+    if failed:
+        current['yatube_task_failures_total'] = 1
+    observe(name, latency, current, 'yatube_task_latency_seconds')
+
+
+def _connect():
+    path = settings.METRICS_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    db = sqlite3.connect(path, timeout=30, isolation_level=None)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute(SCHEMA)
+    return db
+
+
+def flush():
+    """Прибавляет накопленное процессом к общей таблице."""
+    global _last_flush
+    with _lock:
+        rows = [
+            (name, view, le, value)
+            for (name, view, le), value in _pending.items()
+        ]
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if not rows:
+        return
+    db = _connect()
+    try:
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            db.executemany(
+                'INSERT INTO metrics (name, view, le, value) '
+                'VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (name, view, le) '
+                'DO UPDATE SET value = value + excluded.value', rows)
+    finally:
+        db.close()
+
+
+def maybe_flush():
+    if time.monotonic() - _last_flush >= settings.METRICS_FLUSH_INTERVAL:
+        flush()
+
+
+atexit.register(flush)
+
+
+def collect():
+    """Все строки общей таблицы: (метрика, view, le, значение)."""
+    db = _connect()
+    try:
+        return db.execute(
+            'SELECT name, view, le, value FROM metrics '
+            'ORDER BY name, view, le').fetchall()
+    finally:
+        db.close()
+
+
+def totals(name):
+    """Значения счётчика name из общей таблицы по рядам view."""
+    db = _connect()
+    try:
+        return dict(db.execute(
+            "SELECT view, value FROM metrics WHERE name = ? AND le = ''",
+            (name,)).fetchall())
+    finally:
+        db.close()
+
+
+def _labels(view, le=None):
+    labels = 'view="%s"' % view.replace('\\', '\\\\').replace('"', '\\"')
+    if le is not None:
+        labels += ',le="%s"' % le
+    return labels
+
+
+def render():
+    """Текст метрик в формате экспозиции Prometheus."""
+    values = {}
+    views = defaultdict(set)
+    for name, view, le, value in collect():
+        values[name, view, le] = value
+        views[name].add(view)
+    lines = []
+    for family, (kind, help_text) in METRICS.items():
+        lines.append('# HELP %s %s' % (family, help_text))
+        lines.append('# TYPE %s %s' % (family, kind))
+        if kind == 'histogram':
+            for view in sorted(views[family + '_count']):
+                # В базе у каждой корзины свой счёт, а Prometheus
+                # ждёт накопленный: число запросов не дольше le.
+                total = 0
+                for le in BUCKET_LABELS:
+                    total += values.get((family + '_bucket', view, le), 0)
+                    lines.append('%s_bucket{%s} %r' % (
+                        family, _labels(view, le), total))
+                for suffix in ('_sum', '_count'):
+                    lines.append('%s%s{%s} %r' % (
+                        family, suffix, _labels(view),
+                        values[family + suffix, view, '']))
+        elif kind == 'gauge':
+            gauge = import_string(GAUGES[family])
+            for view, value in sorted(gauge().items()):
+                lines.append('%s{%s} %r' % (
+                    family, _labels(view), value))
+        else:
+            for view in sorted(views[family]):
+                lines.append('%s{%s} %r' % (
+                    family, _labels(view), values[family, view, '']))
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        current = defaultdict(float)
+        _local.current = current
+        started = time.perf_counter()
+        timer = QueryTimer(current)
+        try:
+            with ExitStack() as stack:
+                # Чтения с репликой идут через свой псевдоним базы.
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(timer))
+                response = self.get_response(request)
+        finally:
+            _local.current = None
+        duration = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        # Нераспознанные адреса не плодят отдельных рядов метрик.
+        view = match.view_name if match is not None else 'unmatched'
+        observe(view, duration, current)
+        maybe_flush()
+        return response
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.6 on 2026-10-18 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='Задание')),
+                ('arguments', models.TextField(default='{}', verbose_name='Аргументы в JSON')),
+                ('priority', models.SmallIntegerField(default=0, verbose_name='Приоритет')),
+                ('run_at', models.DateTimeField(verbose_name='Выполнить не раньше')),
+                ('leased_until', models.DateTimeField(blank=True, null=True, verbose_name='Занято обработчиком до')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='Обработчик')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('failed', models.BooleanField(default=False, verbose_name='Попытки кончились')),
+                ('error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Поставлено')),
+            ],
+            options={
+                'verbose_name': 'Задание',
+                'verbose_name_plural': 'Задания',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['failed', '-priority', 'run_at'], name='task_ready_idx'),
+        ),
+    ]
@@ -11,3 +11,61 @@ class CreatedModel(models.Model):
     class Meta:
         # Это абстрактная модель:
         abstract = True
+
+
+class MediaFile(models.Model):
+    """Файл в core.storage.ContentAddressedStorage и число ссылок на
+    него: одинаковые загрузки хранятся одним файлом."""
+    name = models.CharField(
+        'Имя файла',
+        max_length=255,
+        unique=True
+    )
+    references = models.PositiveIntegerField(
+        'Число ссылок',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Медиафайл'
+        verbose_name_plural = 'Медиафайлы'
+
+    def __str__(self):
+        return self.name
+
+
+class Task(models.Model):
+    """Отложенное задание очереди core.tasks.
+
+    Выполненное задание удаляется; задание, у которого кончились
+    попытки, остаётся с failed=True и текстом последней ошибки.
+    """
+    name = models.CharField('Задание', max_length=200)
+    arguments = models.TextField('Аргументы в JSON', default='{}')
+    priority = models.SmallIntegerField('Приоритет', default=0)
+    run_at = models.DateTimeField('Выполнить не раньше')
+    leased_until = models.DateTimeField(
+        'Занято обработчиком до',
+        null=True,
+        blank=True
+    )
+    worker = models.CharField('Обработчик', max_length=100, blank=True)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    failed = models.BooleanField('Попытки кончились', default=False)
+    error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Поставлено', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Задание'
+        verbose_name_plural = 'Задания'
+        # Обработчик выбирает готовые задания по этому индексу сразу
+        # в порядке приоритета и срока.
+        indexes = [
+            models.Index(
+                fields=['failed', '-priority', 'run_at'],
+                name='task_ready_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return '%s #%s' % (self.name, self.pk)
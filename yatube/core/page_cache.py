@@ -0,0 +1,175 @@
+"""Кэш целых страниц с «дырками» для частей, зависящих от
+пользователя.
+
+Представление под декоратором cache_page рендерит страницу один раз
+на адрес и строку запроса. Части страницы, которые у каждого
+пользователя свои (шапка, кнопка подписки, форма комментария),
+выводятся тегом {% hole %}: в сохранённую копию попадает только
+метка, а при каждой выдаче на её место рендерится маленький
+фрагмент для текущего пользователя. Анонимному посетителю страница
+отдаётся без обращений к базе, авторизованному — с запросами только
+для его фрагментов.
+
+Сохранённая страница действительна, пока не сменились поколения
+областей кэша (core.cache), которые представление передало через
+core.conditional.Validator. Попадания и промахи считаются как у
+кэша фрагментов под именем 'page' и видны в метриках.
+"""
+import re
+from functools import wraps
+from http import HTTPStatus
+from urllib.parse import quote, unquote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers
+)
+from django.utils.crypto import salted_hmac
+from django.utils.http import http_date
+
+from .cache import count, get_generations
+from .conditional import make_etag
+
+PAGE_KEY = 'page:%s'
+# Метка подписана ключом проекта, чтобы её нельзя было подделать
+# текстом поста (он экранируется, но лишняя защита дешева).
+TOKEN = salted_hmac('core.page_cache', 'hole').hexdigest()[:16]
+HOLE = re.compile(r'<!--hole:%s:(\w+)((?::[^:>]*)*)-->' % TOKEN)
+
+# Имя дырки -> (шаблон фрагмента, функция контекста).
+_holes = {}
+
+
+def hole(name, template_name):
+    """Регистрирует фрагмент для тега {% hole name аргументы %}.
+
+    Декорируемая функция получает запрос и аргументы тега строками
+    и возвращает контекст шаблона фрагмента. Простые значения
+    контекста (строки, числа, bool) входят в ETag страницы: они и
+    пользователь определяют, как выглядит фрагмент.
+    """
+    def decorator(context):
+        _holes[name] = (template_name, context)
+        return context
+    return decorator
+
+
+def marker(name, args):
+    return '<!--hole:%s:%s%s-->' % (TOKEN, name, ''.join(
+        ':' + quote(str(arg), safe='') for arg in args))
+
+
+def is_punching(request):
+    return getattr(request, 'punch_holes', False)
+
+
+def fill(request, name, args):
+    """Контекст фрагмента для текущего пользователя."""
+    template_name, context = _holes[name]
+    return template_name, context(request, *args)
+
+
+def render_hole(request, name, args):
+    template_name, context = fill(request, name, args)
+    return render_to_string(template_name, context, request)
+
+
+def _state(context):
+    return repr(sorted(
+        (key, value) for key, value in context.items()
+        if isinstance(value, (str, int, bool, type(None)))
+    ))
+
+
+def _holes_in(content):
+    return [
+        (match.group(1),
+         [unquote(arg) for arg in match.group(2).split(':')[1:]])
+        for match in HOLE.finditer(content)
+    ]
+
+
+def punch(request, content):
+    """Вставляет фрагменты текущего пользователя на место меток."""
+    return HOLE.sub(
+        lambda match: render_hole(
+            request, match.group(1),
+            [unquote(arg) for arg in match.group(2).split(':')[1:]]),
+        content)
+
+
+def serve(request, entry):
+    """Ответ из сохранённой страницы для текущего пользователя."""
+    filled = [
+        fill(request, name, args) for name, args in entry['holes']
+    ]
+    etag = make_etag(
+        entry['etag'], str(request.user.pk),
+        *[_state(context) for _, context in filled])
+    response = get_conditional_response(
+        request, etag=etag, last_modified=entry['last_modified'])
+    if response is None:
+        fragments = iter([
+            render_to_string(template_name, context, request)
+            for template_name, context in filled
+        ])
+        response = HttpResponse(
+            HOLE.sub(lambda match: next(fragments), entry['content']),
+            content_type=entry['content_type'])
+        patch_cache_control(response, no_cache=True)
+    response['ETag'] = etag
+    if entry['last_modified'] is not None:
+        response['Last-Modified'] = http_date(entry['last_modified'])
+    # Фрагменты зависят от сессии, даже если их контекст её не читал.
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def make_entry(response):
+    content = response.content.decode(response.charset)
+    validator = response.validator
+    return {
+        'scopes': validator.scopes,
+        'generations': validator.generations,
+        'last_modified': validator.last_modified,
+        'etag': make_etag(content),
+        'content': content,
+        'content_type': response['Content-Type'],
+        'holes': _holes_in(content),
+    }
+
+
+def cache_page(view):
+    """Кэширует страницу представления с дырками для пользователя."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        key = PAGE_KEY % make_etag(request.get_full_path()).strip('"')
+        entry = cache.get(key)
+        if entry is not None and (
+                entry['generations'] == get_generations(entry['scopes'])):
+            count('page', 'hit')
+            return serve(request, entry)
+        count('page', 'miss')
+        request.punch_holes = True
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            # Страницы ошибок рендерятся уже без меток.
+            request.punch_holes = False
+        if response.streaming:
+            return response
+        if (response.status_code != HTTPStatus.OK
+                or getattr(response, 'validator', None) is None
+                or response.cookies):
+            response.content = punch(
+                request, response.content.decode(response.charset))
+            return response
+        entry = make_entry(response)
+        cache.set(key, entry, settings.PAGE_CACHE_TIMEOUT)
+        return serve(request, entry)
+    return wrapper
@@ -0,0 +1,246 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+# Границы знакового 64-битного целого: большие числа SQLite не
+# принимает в параметрах запроса (OverflowError).
+MIN_INT = -2 ** 63
+MAX_INT = 2 ** 63 - 1
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage(Sequence):
+    """Страница курсорной пагинации.
+
+    Повторяет ту часть интерфейса django.core.paginator.Page,
+    которой пользуются шаблоны, но вместо номеров страниц отдаёт
+    непрозрачные курсоры для ?after= и ?before=. Запрос к базе
+    выполняется при первом обращении к содержимому страницы, так
+    что закэшированный фрагмент ленты обходится без него.
+    """
+    is_cursor = True
+
+    def __init__(self, paginator, after=None, before=None):
+        self.paginator = paginator
+        self.after = after
+        self.before = before
+        self._result = None
+
+    def __repr__(self):
+        # Используется как ключ {% cache ... with page_obj %},
+        # поэтому у каждой страницы он свой.
+        if self.after:
+            return '<CursorPage after=%s>' % self.after
+        if self.before:
+            return '<CursorPage before=%s>' % self.before
+        return '<CursorPage first>'
+
+    def _load(self):
+        if self._result is None:
+            self._result = self.paginator.fetch(self.after, self.before)
+        return self._result
+
+    @property
+    def object_list(self):
+        return self._load()[0]
+
+    @property
+    def next_cursor(self):
+        return self._load()[1]
+
+    @property
+    def previous_cursor(self):
+        return self._load()[2]
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Пагинация по ключу (keyset) вместо OFFSET.
+
+    Страница выбирается условием по паре полей ordering, поэтому
+    не нужен ни COUNT(*), ни пропуск строк: стоимость запроса не
+    зависит от того, насколько глубоко листает пользователь.
+    Поля ordering (одно или два) должны быть отсортированы в одном
+    направлении, последнее поле должно быть уникальным.
+    """
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-pk')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.descending = ordering[0].startswith('-')
+        self.fields = tuple(field.lstrip('-') for field in ordering)
+
+    def _order_by(self, reverse=False):
+        prefix = '-' if self.descending != reverse else ''
+        return [prefix + field for field in self.fields]
+
+    def _model_field(self, name):
+        opts = self.object_list.model._meta
+        if name == 'pk':
+            return opts.pk
+        # Листать можно и по аннотациям, например по полям связанной
+        # таблицы, индекс которой задаёт порядок.
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return opts.get_field(name)
+
+    def _values(self, obj):
+        # Строки .values() тоже можно листать.
+        if isinstance(obj, dict):
+            return tuple(obj[name] for name in self.fields)
+        return tuple(getattr(obj, name) for name in self.fields)
+
+    def encode_cursor(self, obj):
+        values = [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in self._values(obj)
+        ]
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded))
+            if len(values) != len(self.fields):
+                raise InvalidCursor(cursor)
+            values = [
+                self._model_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (ValueError, TypeError, binascii.Error,
+                ValidationError):
+            raise InvalidCursor(cursor)
+        for value in values:
+            # None нельзя сравнивать в условии, а слишком большое
+            # целое не влезает в параметр запроса.
+            if value is None or (
+                    isinstance(value, int)
+                    and not MIN_INT <= value <= MAX_INT):
+                raise InvalidCursor(cursor)
+        return values
+
+    def _seek(self, values, reverse=False):
+        lookup = 'lt' if self.descending != reverse else 'gt'
+        if len(self.fields) == 1:
+            return Q(**{'%s__%s' % (self.fields[0], lookup): values[0]})
+        first, second = self.fields
+        # Избыточное условие first <= value даёт СУБД диапазон для
+        # поиска по индексу: одно только OR она читает с начала.
+        return Q(**{'%s__%se' % (first, lookup): values[0]}) & (
+            Q(**{'%s__%s' % (first, lookup): values[0]})
+            | Q(**{first: values[0],
+                   '%s__%s' % (second, lookup): values[1]})
+        )
+
+    def _slice(self, cursor, reverse, limit):
+        """Первые limit объектов за курсором в порядке чтения."""
+        queryset = self.object_list
+        if cursor:
+            queryset = queryset.filter(
+                self._seek(self.decode_cursor(cursor), reverse))
+        queryset = queryset.order_by(*self._order_by(reverse))
+        return list(queryset[:limit])
+
+    def fetch(self, after=None, before=None):
+        """Объекты страницы и курсоры соседних страниц."""
+        reverse = bool(before) and not after
+        cursor = before if reverse else after
+        # Лишняя строка показывает, есть ли что-то за краем страницы.
+        objects = self._slice(cursor, reverse, self.per_page + 1)
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if reverse and not objects:
+            # Перед курсором ничего нет: это уже начало ленты.
+            return self.fetch()
+        if reverse:
+            objects.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor)
+        return (
+            objects,
+            self.encode_cursor(objects[-1])
+            if has_next and objects else None,
+            self.encode_cursor(objects[0])
+            if has_previous and objects else None,
+        )
+
+    def page(self, after=None, before=None):
+        """Возвращает страницу после курсора after или перед before.
+
+        Без курсоров возвращает первую страницу. Некорректный
+        курсор вызывает InvalidCursor.
+        """
+        for cursor in (after, before):
+            if cursor:
+                self.decode_cursor(cursor)
+        return CursorPage(self, after or None, before or None)
+
+    def get_page(self, after=None, before=None):
+        """Как page(), но при некорректном курсоре отдаёт первую
+        страницу, по аналогии с Paginator.get_page()."""
+        try:
+            return self.page(after, before)
+        except InvalidCursor:
+            return self.page()
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Курсорная пагинация объединения нескольких querysets.
+
+    Условие OR по разным индексам СУБД читает целиком и сортирует.
+    Здесь каждый queryset листается отдельно с тем же курсором и
+    LIMIT, а страница собирается слиянием в Python. Когда уже
+    прочитанных объектов хватает на страницу, следующие querysets
+    читаются только до последнего из них: дальше страница не зайдёт,
+    и даже запрос с сортировкой читает узкий диапазон индекса.
+    Поля ordering должны быть у всех querysets (например, аннотации
+    с общими именами); объекты с одинаковыми значениями этих полей
+    считаются одним.
+    """
+
+    def __init__(self, object_lists, per_page,
+                 ordering=('-pub_date', '-pk')):
+        super().__init__(object_lists[0], per_page, ordering)
+        self.object_lists = object_lists
+
+    def _slice(self, cursor, reverse, limit):
+        values = self.decode_cursor(cursor) if cursor else None
+        objects = {}
+        keys = []
+        for queryset in self.object_lists:
+            if values is not None:
+                queryset = queryset.filter(self._seek(values, reverse))
+            if len(keys) >= limit:
+                queryset = queryset.filter(
+                    self._seek(keys[limit - 1], not reverse))
+            queryset = queryset.order_by(*self._order_by(reverse))
+            for obj in queryset[:limit]:
+                objects.setdefault(self._values(obj), obj)
+            keys = sorted(objects, reverse=self.descending != reverse)
+        return [objects[key] for key in keys[:limit]]
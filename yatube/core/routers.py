@@ -0,0 +1,80 @@
+"""Чтение с отдельного соединения, запись — в основное.
+
+Если в DATABASES есть база REPLICA_DATABASE, PrimaryReplicaRouter
+отправляет на неё чтения, а записи — в default. Чтения идут в
+default, когда запрос закреплён за основной базой:
+    * сам запрос изменяет данные (POST и другие небезопасные методы);
+    * после такого запроса не прошло REPLICA_STICKY_SECONDS — об этом
+      помнит кука, поэтому пользователь сразу видит свою запись;
+    * default сейчас внутри транзакции, и чтение должно видеть её
+      незафиксированные изменения.
+"""
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = threading.local()
+
+UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+def replica_enabled():
+    return settings.REPLICA_DATABASE in settings.DATABASES
+
+
+def is_pinned():
+    return (
+        getattr(_state, 'pinned', False)
+        or connections[DEFAULT_DB_ALIAS].in_atomic_block
+    )
+
+
+class pin_primary:
+    """Контекст, в котором все чтения идут в основную базу."""
+
+    def __enter__(self):
+        self.previous = getattr(_state, 'pinned', False)
+        _state.pinned = True
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _state.pinned = self.previous
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if replica_enabled() and not is_pinned():
+            return settings.REPLICA_DATABASE
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Обе базы — это один и тот же файл.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryPinMiddleware:
+    """Закрепляет за основной базой запросы на запись и запросы,
+    которые пришли вскоре после них."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cookie = settings.REPLICA_STICKY_COOKIE
+        unsafe = request.method in UNSAFE_METHODS
+        _state.pinned = unsafe or cookie in request.COOKIES
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.pinned = False
+        if unsafe and replica_enabled():
+            response.set_cookie(
+                cookie, '1', max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax')
+        return response
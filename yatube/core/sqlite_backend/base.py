@@ -0,0 +1,31 @@
+"""SQLite с настраиваемыми прагмами и BEGIN IMMEDIATE.
+
+Дополнительные ключи OPTIONS в DATABASES:
+    pragmas — словарь PRAGMA, которые выполняются на каждом новом
+    соединении (journal_mode, synchronous, mmap_size, cache_size...);
+    transaction_mode — 'IMMEDIATE', чтобы транзакции сразу брали
+    блокировку записи. При обычном BEGIN транзакция, которая сначала
+    читает, а потом пишет, в WAL получает «database is locked» без
+    ожидания busy_timeout, если другой процесс успел записать.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop('pragmas', {})
+        self.transaction_mode = params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute('PRAGMA %s = %s' % (name, value))
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute('BEGIN %s' % self.transaction_mode)
+        else:
+            super()._start_transaction_under_autocommit()
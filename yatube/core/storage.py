@@ -0,0 +1,100 @@
+"""Хранилище медиафайлов с именами по содержимому.
+
+ContentAddressedStorage сохраняет файл под именем
+<каталог upload_to>/<ab>/<sha256><расширение>, где ab — первые два
+символа хэша. Одинаковые загрузки попадают в один файл, а число
+ссылок на него хранится в core.models.MediaFile: save() добавляет
+ссылку, delete() убирает, и файл удаляется с последней ссылкой.
+Файлы, сохранённые до появления хранилища, ссылок не имеют и
+удаляются сразу.
+
+Содержимое файла под таким именем никогда не меняется, поэтому
+медиа можно отдавать с Cache-Control: immutable (см. core.views.media
+и MEDIA_CACHE_CONTROL). Копии sorl-thumbnail называются по имени
+исходного файла и тоже не меняются.
+
+Ссылка добавляется в транзакции запроса: если она откатится, файл
+останется на диске без ссылок. Это та же утечка, что и у обычного
+FileSystemStorage, только без дубликатов.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import MediaFile
+
+HASH_DIR_LENGTH = 2
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Имя всё равно заменяется хэшем в _save(), а совпадение
+        # имён для одинакового содержимого и нужно.
+        return name
+
+    def _save(self, name, content):
+        directory = os.path.dirname(self.path(name))
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        # Временный файл рядом с итоговым, чтобы перенос был
+        # атомарным переименованием, а не копированием.
+        fd, temporary = tempfile.mkstemp(dir=directory, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as output:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    output.write(chunk)
+            name = self.hashed_name(name, digest.hexdigest())
+            path = self.path(name)
+            with transaction.atomic():
+                self.add_reference(name)
+                if os.path.exists(path):
+                    os.remove(temporary)
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    file_move_safe(temporary, path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(path, self.file_permissions_mode)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        return name
+
+    @staticmethod
+    def hashed_name(name, digest):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            directory, digest[:HASH_DIR_LENGTH], digest + extension
+        ).replace('\\', '/')
+
+    @staticmethod
+    def add_reference(name):
+        files = MediaFile.objects.filter(name=name)
+        if files.update(references=F('references') + 1):
+            return
+        try:
+            with transaction.atomic():
+                MediaFile.objects.create(name=name, references=1)
+        except IntegrityError:
+            # Ту же картинку одновременно загрузили в другом запросе.
+            files.update(references=F('references') + 1)
+
+    def delete(self, name):
+        if not name:
+            raise ValueError('The name must be given to delete().')
+        with transaction.atomic():
+            files = MediaFile.objects.filter(name=name)
+            if files.update(references=F('references') - 1):
+                if not files.filter(references__lte=0).delete()[0]:
+                    return
+            super().delete(name)
+
+    def references(self, name):
+        return MediaFile.objects.filter(name=name).values_list(
+            'references', flat=True).first() or 0
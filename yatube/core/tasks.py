@@ -0,0 +1,229 @@
+"""Очередь отложенных заданий в основной базе.
+
+Медленные побочные действия (обработка картинок, письма, прогрев
+кэша) не выполняются в запросе, а ставятся в очередь:
+
+    @task(priority=10)
+    def process_image(post_id):
+        ...
+
+    process_image.delay(post.pk)
+
+Задание — строка core.models.Task. Она пишется в той же транзакции,
+что и данные запроса: откат не оставляет лишних заданий, а
+зафиксированное задание не теряется при остановке сервера. Брокер не
+нужен.
+
+Выполняет задания команда run_tasks. Обработчик одним запросом
+выбирает до TASK_BATCH_SIZE готовых заданий в порядке приоритета и
+срока и берёт их в аренду на TASK_LEASE секунд. Если обработчик
+упал, по истечении аренды задания заберёт другой, поэтому задание
+должно выдерживать повторное выполнение. Задание с ошибкой
+повторяется через TASK_RETRY_DELAY секунд, каждый следующий раз вдвое
+позже, но не позже TASK_RETRY_MAX_DELAY, пока не кончатся
+max_attempts попыток.
+
+Задержка от срока задания до начала выполнения, время выполнения и
+ошибки попадают в метрики (core.metrics) с именем задания вместо
+имени адреса, число готовых заданий — в yatube_task_queue_depth.
+"""
+import json
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, CharField, Count, Min, Q, Value, When
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import metrics
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+# Имя задания -> функция с настройками.
+_tasks = {}
+
+
+def task(priority=0, max_attempts=None):
+    """Регистрирует функцию как задание и добавляет ей delay().
+
+    Имя задания — путь к функции, по нему обработчик её и находит.
+    Аргументы задания должны сериализоваться в JSON.
+    """
+    def decorator(function):
+        name = '%s.%s' % (function.__module__, function.__qualname__)
+        function.task_name = name
+        function.priority = priority
+        function.max_attempts = max_attempts or settings.TASK_MAX_ATTEMPTS
+
+        def delay(*args, **kwargs):
+            return enqueue(name, args, kwargs, priority)
+
+        function.delay = delay
+        _tasks[name] = function
+        return function
+    return decorator
+
+
+def serialize(args=(), kwargs=None):
+    return json.dumps({'args': list(args), 'kwargs': kwargs or {}})
+
+
+def enqueue(name, args=(), kwargs=None, priority=0, countdown=0):
+    """Ставит задание в очередь в текущей транзакции."""
+    return Task.objects.create(
+        name=name,
+        arguments=serialize(args, kwargs),
+        priority=priority,
+        run_at=timezone.now() + timedelta(seconds=countdown),
+    )
+
+
+def pending(name, args=None, kwargs=None):
+    """Стоит ли задание name в очереди, не выполняясь сейчас.
+
+    С args или kwargs учитываются только задания с такими же
+    аргументами.
+    """
+    tasks = Task.objects.filter(name=name, failed=False)
+    if args is not None or kwargs is not None:
+        tasks = tasks.filter(arguments=serialize(args or (), kwargs))
+    # Уже идущее задание не считается: то, что изменилось во время
+    # него, сделает следующее.
+    return tasks.filter(
+        Q(leased_until__isnull=True) | Q(leased_until__lt=timezone.now())
+    ).exists()
+
+
+def get_task(name):
+    if name not in _tasks:
+        # Импорт модуля регистрирует его задания.
+        import_string(name)
+    return _tasks[name]
+
+
+def worker_name():
+    return '%s:%s' % (socket.gethostname(), os.getpid())
+
+
+def ready(now):
+    return Task.objects.filter(failed=False, run_at__lte=now).filter(
+        Q(leased_until__isnull=True) | Q(leased_until__lt=now))
+
+
+def claim(worker, limit, lease):
+    """Берёт в аренду до limit готовых заданий."""
+    now = timezone.now()
+    leased_until = now + timedelta(seconds=lease)
+    with transaction.atomic():
+        # В PostgreSQL параллельные обработчики пропускают чужие
+        # строки; SQLite и так пускает в транзакцию записи по одному.
+        ids = list(
+            ready(now).select_for_update(skip_locked=True)
+            .order_by('-priority', 'run_at')
+            .values_list('pk', flat=True)[:limit])
+        ready(now).filter(pk__in=ids).update(
+            leased_until=leased_until, worker=worker)
+        return list(Task.objects.filter(
+            pk__in=ids, worker=worker, leased_until=leased_until
+        ).order_by('-priority', 'run_at'))
+
+
+def backoff(attempts):
+    """Через сколько секунд повторить задание после attempts неудач."""
+    return min(
+        settings.TASK_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.TASK_RETRY_MAX_DELAY)
+
+
+def leased(item):
+    """Задание item, пока его аренда у этого обработчика.
+
+    Если аренда истекла и задание уже взял другой обработчик, итог
+    запишет он, а этот ничего не удалит и не сбросит.
+    """
+    return Task.objects.filter(
+        pk=item.pk, worker=item.worker, leased_until=item.leased_until)
+
+
+def execute(item):
+    """Выполняет взятое задание; False, если оно завершилось ошибкой."""
+    started = timezone.now()
+    latency = max((started - item.run_at).total_seconds(), 0)
+    timer = time.perf_counter()
+    attempts = item.attempts + 1
+    try:
+        function = get_task(item.name)
+        arguments = json.loads(item.arguments)
+        function(*arguments['args'], **arguments['kwargs'])
+    except Exception:
+        logger.exception('Задание %s завершилось ошибкой', item)
+        duration = time.perf_counter() - timer
+        function = _tasks.get(item.name)
+        max_attempts = (
+            function.max_attempts if function is not None
+            else settings.TASK_MAX_ATTEMPTS)
+        leased(item).update(
+            attempts=attempts,
+            failed=attempts >= max_attempts,
+            run_at=timezone.now() + timedelta(seconds=backoff(attempts)),
+            leased_until=None,
+            worker='',
+            error=traceback.format_exc())
+        metrics.observe_task(item.name, latency, duration, failed=True)
+        return False
+    duration = time.perf_counter() - timer
+    leased(item).delete()
+    metrics.observe_task(item.name, latency, duration)
+    return True
+
+
+def run_batch(worker, limit=None, lease=None):
+    """Выполняет одну порцию заданий; возвращает их число."""
+    tasks = claim(
+        worker,
+        limit or settings.TASK_BATCH_SIZE,
+        lease or settings.TASK_LEASE)
+    for item in tasks:
+        execute(item)
+    metrics.maybe_flush()
+    return len(tasks)
+
+
+def queue_depth():
+    """Число готовых к выполнению заданий по именам."""
+    return dict(
+        ready(timezone.now()).order_by().values_list('name')
+        .annotate(total=Count('pk')))
+
+
+def _state(now):
+    return Case(
+        When(failed=True, then=Value('failed')),
+        When(leased_until__gte=now, then=Value('running')),
+        When(run_at__gt=now, then=Value('waiting')),
+        default=Value('ready'),
+        output_field=CharField())
+
+
+def summary():
+    """Состояние очереди по именам заданий для команды task_stats."""
+    now = timezone.now()
+    rows = {}
+    for name, state, total, oldest in (
+            Task.objects.annotate(
+                state=_state(now)).order_by().values_list('name', 'state')
+            .annotate(total=Count('pk'), oldest=Min('run_at'))):
+        row = rows.setdefault(name, {
+            'ready': 0, 'waiting': 0, 'running': 0, 'failed': 0,
+            'oldest': None})
+        row[state] = total
+        if state == 'ready':
+            row['oldest'] = (now - oldest).total_seconds()
+    return rows
@@ -0,0 +1,48 @@
+"""Шаблонизатор Django, который замеряет время рендеринга.
+
+Время добавляется к метрике текущего запроса в core.metrics. В него
+входят и SQL-запросы ленивых QuerySet, выполненные при рендеринге.
+Вложенные {% include %} и шаблоны, которые рендерят теги (например,
+карточки постов), входят во время шаблона верхнего уровня и отдельно
+не считаются.
+"""
+import threading
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import (
+    DjangoTemplates, Template, reraise
+)
+
+from . import metrics
+
+
+# Глубина вложенных render() в этом потоке.
+_local = threading.local()
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        depth = getattr(_local, 'depth', 0)
+        _local.depth = depth + 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            _local.depth = depth
+            if not depth:
+                metrics.add(
+                    'yatube_template_render_seconds_total',
+                    time.perf_counter() - started)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(
+                self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
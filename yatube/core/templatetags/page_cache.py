@@ -0,0 +1,23 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.page_cache import is_punching, marker, render_hole
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, *args):
+    """Фрагмент, который у каждого пользователя свой.
+
+    {% hole <имя> [аргументы] %}
+
+    На странице под core.page_cache.cache_page выводит метку, на
+    место которой при выдаче встаёт фрагмент текущего пользователя,
+    на остальных страницах — сразу фрагмент.
+    """
+    request = context['request']
+    args = [str(arg) for arg in args]
+    if is_punching(request):
+        return mark_safe(marker(name, args))
+    return mark_safe(render_hole(request, name, args))
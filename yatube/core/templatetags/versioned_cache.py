@@ -0,0 +1,61 @@
+from django import template
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+from core.cache import count, get_generations
+from core.page_cache import is_punching, punch
+
+register = template.Library()
+
+
+class VersionedCacheNode(template.Node):
+    def __init__(self, nodelist, expire_time, fragment_name, scopes,
+                 vary_on):
+        self.nodelist = nodelist
+        self.expire_time = expire_time
+        self.fragment_name = fragment_name
+        self.scopes = scopes
+        self.vary_on = vary_on
+
+    def render(self, context):
+        expire_time = self.expire_time.resolve(context)
+        vary_on = [get_generations(self.scopes.resolve(context))]
+        vary_on += [var.resolve(context) for var in self.vary_on]
+        key = make_template_fragment_key(self.fragment_name, vary_on)
+        value = cache.get(key)
+        if value is None:
+            count(self.fragment_name, 'miss')
+            value = self.nodelist.render(context)
+            cache.set(key, value, expire_time)
+        else:
+            count(self.fragment_name, 'hit')
+        # Метки фрагментов пользователя заполняет core.page_cache;
+        # вне кэша страниц их надо заполнить здесь.
+        request = context.get('request')
+        if request is not None and not is_punching(request):
+            value = punch(request, value)
+        return value
+
+
+@register.tag('versioned_cache')
+def do_versioned_cache(parser, token):
+    """Кэширует фрагмент до смены поколения его областей.
+
+    {% versioned_cache <время жизни> <имя> <области> [зависит от] %}
+
+    <области> — список имён областей из core.cache: фрагмент
+    пересчитывается, как только меняется поколение любой из них.
+    """
+    nodelist = parser.parse(('endversioned_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 4:
+        raise template.TemplateSyntaxError(
+            "'%r' tag requires at least 3 arguments." % tokens[0])
+    return VersionedCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        parser.compile_filter(tokens[3]),
+        [parser.compile_filter(token) for token in tokens[4:]],
+    )
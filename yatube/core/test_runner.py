@@ -0,0 +1,39 @@
+"""Запуск тестов без общих файлов кэша и метрик.
+
+Кэш (core.cache_backends) и метрики (core.metrics) лежат в файлах
+SQLite рядом с проектом, и тесты, очищающие кэш, стёрли бы кэш
+разработчика. На время тестов оба файла переносятся во временный
+каталог.
+"""
+import copy
+import os
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+from . import metrics
+
+
+class TemporaryFilesRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.directory = tempfile.TemporaryDirectory()
+        caches = copy.deepcopy(settings.CACHES)
+        for alias, options in caches.items():
+            if options['BACKEND'] == 'core.cache_backends.SQLiteCache':
+                options['LOCATION'] = os.path.join(
+                    self.directory.name, '%s.sqlite3' % alias)
+        self.files = override_settings(
+            CACHES=caches,
+            METRICS_PATH=os.path.join(
+                self.directory.name, 'metrics.sqlite3'))
+        self.files.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        # Иначе накопленное сбросилось бы при выходе в настоящий файл.
+        metrics._pending.clear()
+        self.files.disable()
+        self.directory.cleanup()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,58 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import Follow, Group, Post, User
+
+
+class BenchUrlsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Post.objects.create(author=author, group=group, text='Пост')
+        Follow.objects.create(user=reader, author=author)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'bench.json')
+
+    def bench(self, *args):
+        stdout = StringIO()
+        call_command(
+            'bench_urls', '--requests', '3', '--warmup', '0',
+            '--json', self.path, *args, stdout=stdout)
+        with open(self.path, encoding='utf-8') as saved:
+            return stdout.getvalue(), json.load(saved)
+
+    def test_every_named_page_is_measured(self):
+        output, saved = self.bench()
+        results = {
+            (row['name'], row['user']): row for row in saved['results']
+        }
+        for name in ('posts:index', 'posts:profile', 'posts:post_detail',
+                     'posts:group_list', 'api:post_list', 'about:tech'):
+            for user in ('anonymous', 'user'):
+                self.assertEqual(results[name, user]['status'], 200)
+        self.assertEqual(results['posts:follow_index', 'user']['status'], 200)
+        self.assertNotIn(('posts:profile_follow', 'user'), results)
+        self.assertNotIn(('logout', 'user'), results)
+        row = results['posts:index', 'anonymous']
+        self.assertLessEqual(row['p50'], row['p99'])
+        self.assertGreater(row['memory'], 0)
+        self.assertIn('posts:post_detail', output)
+
+    def test_compare_with_previous_run(self):
+        self.bench('--only', 'posts:index', '--as', 'anonymous')
+        os.rename(self.path, self.path + '.old')
+        output, saved = self.bench(
+            '--only', 'posts:index', '--as', 'anonymous',
+            '--compare', self.path + '.old')
+        self.assertEqual(len(saved['results']), 1)
+        self.assertIn('p50 ', output.splitlines()[1])
@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from ..cache_backends import SQLiteCache
+
+
+def increment(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {
+            'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_INTERVAL': 1}
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_get_set_add_delete(self):
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertTrue(self.cache.add('other', 2))
+        self.assertEqual(
+            self.cache.get_many(['key', 'other', 'missing']),
+            {'key': {'value': 1}, 'other': 2})
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_expired_entry_is_missing(self):
+        self.cache.set('key', 1, timeout=-1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 2))
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_cull_keeps_max_entries(self):
+        for number in range(30):
+            self.cache.set('key%d' % number, number)
+        self.assertLessEqual(len(self.cache.get_many(
+            ['key%d' % number for number in range(30)])), 10)
+        self.assertEqual(self.cache.get('key29'), 29)
+
+    def test_totals_follow_writes(self):
+        cache = SQLiteCache(self.path, {})
+        cache.set('key', 'x' * 100)
+        cache.set('key', 'x' * 10)
+        cache.set('counter', 1)
+        cache.incr('counter', 1000)
+        cache.add('other', 'value')
+        cache.delete('other')
+        db = cache._db
+        self.assertEqual(
+            cache._totals(db),
+            db.execute(
+                'SELECT COUNT(*), SUM(size) FROM cache').fetchone())
+        cache.clear()
+        self.assertEqual(cache._totals(db), (0, 0))
+
+    def test_cull_keeps_max_size(self):
+        cache = SQLiteCache(self.path, {
+            'OPTIONS': {'MAX_SIZE': 2000, 'CULL_INTERVAL': 1}
+        })
+        for number in range(30):
+            cache.set('key%d' % number, 'x' * 200)
+        self.assertLessEqual(cache._totals(cache._db)[1], 2000)
+        self.assertIsNotNone(cache.get('key29'))
+
+    def test_incr_is_atomic_between_processes(self):
+        # Процессы не теряют приращения друг друга
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('spawn')
+        workers = [
+            context.Process(target=increment, args=(self.path, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+
+class TestFilesTests(SimpleTestCase):
+    def test_tests_do_not_touch_project_files(self):
+        # cache.clear() в тестах не должен стирать кэш разработчика.
+        self.assertFalse(
+            cache._path.startswith(settings.BASE_DIR))
+        self.assertFalse(
+            settings.METRICS_PATH.startswith(settings.BASE_DIR))
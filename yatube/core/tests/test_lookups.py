@@ -0,0 +1,120 @@
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import Http404
+from django.test import TestCase, override_settings
+
+from posts.lookups import groups, users
+from posts.models import Group, User
+from .. import metrics
+from ..cache import bump
+from ..lookups import SCOPE, LookupCache
+
+
+class LookupCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            METRICS_PATH=os.path.join(directory.name, 'metrics.sqlite3'))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        metrics._pending.clear()
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        self.lookup = LookupCache('test_groups', Group, 'slug', size=2)
+
+    def test_hit_needs_no_queries(self):
+        self.assertEqual(self.lookup.get('group'), self.group)
+        with self.assertNumQueries(0):
+            group = self.lookup.get('group')
+        self.assertEqual(group.title, 'Группа')
+        self.assertEqual(self.lookup.stats(), {
+            'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_each_lookup_gets_own_instance(self):
+        first = self.lookup.get('group')
+        first.title = 'Изменено'
+        self.assertEqual(self.lookup.get('group').title, 'Группа')
+
+    def test_missing_value(self):
+        self.assertIsNone(self.lookup.get('missing'))
+        with self.assertRaises(Http404):
+            self.lookup.get_or_404('missing')
+
+    def test_save_invalidates(self):
+        self.assertEqual(groups.get('group').title, 'Группа')
+        self.group.slug = 'renamed'
+        self.group.save()
+        self.assertIsNone(groups.get('group'))
+        self.assertEqual(groups.get('renamed').pk, self.group.pk)
+
+    def test_other_process_bump_clears_cache(self):
+        self.lookup.get('group')
+        # Так invalidate() в другом процессе меняет общее поколение.
+        bump(SCOPE % self.lookup.name)
+        with self.assertNumQueries(1):
+            self.lookup.get('group')
+
+    def test_least_recently_used_is_evicted(self):
+        for slug in ('second', 'third'):
+            Group.objects.create(title=slug, slug=slug, description='')
+        self.lookup.get('group')
+        self.lookup.get('second')
+        self.lookup.get('group')
+        self.lookup.get('third')
+        self.assertEqual(list(self.lookup.entries), ['group', 'third'])
+
+    def test_entries_expire(self):
+        self.lookup.get('group')
+        with patch('core.lookups.time.monotonic',
+                   return_value=10 ** 9):
+            with self.assertNumQueries(1):
+                self.lookup.get('group')
+
+    def test_login_keeps_user_cache(self):
+        user = User.objects.create_user(username='author')
+        users.get('author')
+        user.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            users.get('author')
+        user.first_name = 'Лев'
+        user.save()
+        self.assertEqual(users.get('author').first_name, 'Лев')
+
+    def test_user_cache_keeps_only_page_fields(self):
+        User.objects.create_user(
+            username='author', password='secret', first_name='Лев')
+        users.get('author')
+        values = next(iter(users.entries.values()))[0]
+        self.assertNotIn('password', users.attnames)
+        self.assertEqual(len(values), 4)
+        with self.assertNumQueries(0):
+            author = users.get('author')
+            self.assertEqual(author.get_full_name(), 'Лев')
+        # Остальные поля загружаются при обращении.
+        with self.assertNumQueries(1):
+            self.assertTrue(author.check_password('secret'))
+
+    def test_signup_keeps_user_cache(self):
+        User.objects.create_user(username='author')
+        users.get('author')
+        User.objects.create_user(username='reader')
+        with self.assertNumQueries(0):
+            users.get('author')
+
+    def test_cache_stats_reports_hit_rate(self):
+        self.lookup.get('group')
+        self.lookup.get('group')
+        self.lookup.get('group')
+        self.lookup.get('group')
+        output = StringIO()
+        call_command('cache_stats', stdout=output)
+        self.assertIn(
+            'test_groups: попаданий 3, промахов 1, доля попаданий 75.0%',
+            output.getvalue())
@@ -0,0 +1,127 @@
+import os
+import re
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.db.utils import ConnectionHandler
+from django.template import engines
+from django.http import HttpResponse
+from django.test import (
+    Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+)
+from django.urls import reverse
+
+from .. import metrics
+
+METRICS_URL = reverse('metrics')
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            METRICS_PATH=os.path.join(directory.name, 'metrics.sqlite3'))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # Накопленное другими тестами к этому файлу не относится.
+        metrics._pending.clear()
+        cache.clear()
+        self.client = Client()
+
+    def value(self, text, name, view, le=None):
+        labels = 'view="%s"' % view
+        if le is not None:
+            labels += ',le="%s"' % le
+        match = re.search(
+            r'^%s\{%s\} (\S+)$' % (re.escape(name), re.escape(labels)),
+            text, re.MULTILINE)
+        return float(match.group(1)) if match else None
+
+    def test_requests_are_measured_per_view(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('about:author'))
+        text = self.client.get(METRICS_URL).content.decode()
+        self.assertEqual(self.value(
+            text, 'yatube_request_duration_seconds_count',
+            'posts:index'), 2)
+        self.assertEqual(self.value(
+            text, 'yatube_request_duration_seconds_bucket',
+            'posts:index', '+Inf'), 2)
+        self.assertGreater(self.value(
+            text, 'yatube_db_queries_total', 'posts:index'), 0)
+        self.assertGreater(self.value(
+            text, 'yatube_template_render_seconds_total', 'about:author'),
+            0)
+        # Первый запрос промахивается мимо кэша страниц и фрагмента
+        # ленты, второй попадает в кэш страниц.
+        self.assertEqual(self.value(
+            text, 'yatube_cache_misses_total', 'posts:index'), 2)
+        self.assertEqual(self.value(
+            text, 'yatube_cache_hits_total', 'posts:index'), 1)
+
+    def test_flushes_from_workers_add_up(self):
+        # Каждый процесс прибавляет свои значения к общей таблице
+        for _ in range(2):
+            metrics.observe('posts:index', 0.02, {})
+            metrics.flush()
+        text = metrics.render()
+        self.assertEqual(self.value(
+            text, 'yatube_request_duration_seconds_count',
+            'posts:index'), 2)
+        self.assertEqual(self.value(
+            text, 'yatube_request_duration_seconds_bucket',
+            'posts:index', '0.01'), 0)
+        self.assertEqual(self.value(
+            text, 'yatube_request_duration_seconds_bucket',
+            'posts:index', '0.025'), 2)
+
+    @override_settings(METRICS_ALLOWED_IPS=[])
+    def test_endpoint_is_private(self):
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 403)
+
+
+class ReplicaQueriesTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            METRICS_PATH=os.path.join(directory.name, 'metrics.sqlite3'))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        metrics._pending.clear()
+        # Свои соединения: основная база и реплика в отдельных файлах.
+        self.connections = ConnectionHandler({
+            alias: {
+                'ENGINE': 'core.sqlite_backend',
+                'NAME': os.path.join(directory.name, alias + '.sqlite3'),
+            }
+            for alias in ('default', 'replica')
+        })
+        self.addCleanup(self.connections.close_all)
+
+    def test_replica_queries_are_counted(self):
+        def get_response(request):
+            for alias in ('default', 'replica', 'replica'):
+                with self.connections[alias].cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            return HttpResponse()
+
+        with mock.patch.object(metrics, 'connections', self.connections):
+            metrics.MetricsMiddleware(get_response)(
+                RequestFactory().get('/'))
+        self.assertEqual(metrics._pending[
+            'yatube_db_queries_total', 'unmatched', ''], 3)
+
+
+class TemplateTimingTests(SimpleTestCase):
+    def test_nested_render_is_counted_once(self):
+        # Так карточки постов рендерятся внутри страницы.
+        engine = engines.all()[0]
+        inner = engine.from_string('карточка')
+        outer = engine.from_string('{{ card }}')
+        with mock.patch.object(metrics, 'add') as add:
+            outer.render({'card': inner.render})
+        add.assert_called_once()
@@ -0,0 +1,101 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.http import HttpResponse
+from django.db import transaction
+from django.test import RequestFactory, SimpleTestCase
+
+from posts.models import Post
+from .. import routers
+from ..sqlite_backend.base import DatabaseWrapper
+
+
+@mock.patch.object(routers, 'replica_enabled', return_value=True)
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    # Без транзакции TestCase, которая сама закрепила бы чтения.
+    databases = {'default'}
+
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def read_db_during(self, request):
+        seen = []
+
+        def get_response(request):
+            seen.append(self.router.db_for_read(Post))
+            return HttpResponse()
+
+        response = routers.PrimaryPinMiddleware(get_response)(request)
+        return seen[0], response
+
+    def test_reads_go_to_replica_and_writes_to_default(self, enabled):
+        self.assertEqual(self.router.db_for_read(Post), 'replica')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_reads_in_transaction_or_pinned_go_to_default(self, enabled):
+        with routers.pin_primary():
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+        with transaction.atomic():
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_unsafe_request_is_pinned_and_sets_cookie(self, enabled):
+        database, response = self.read_db_during(self.factory.post('/'))
+        self.assertEqual(database, 'default')
+        self.assertIn('use_primary', response.cookies)
+
+    def test_request_with_cookie_reads_from_default(self, enabled):
+        request = self.factory.get('/')
+        request.COOKIES['use_primary'] = '1'
+        database, response = self.read_db_during(request)
+        self.assertEqual(database, 'default')
+        self.assertNotIn('use_primary', response.cookies)
+
+    def test_only_default_is_migrated(self, enabled):
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+
+
+class RouterWithoutReplicaTests(SimpleTestCase):
+    def test_reads_go_to_default(self):
+        router = routers.PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(Post), 'default')
+        response = routers.PrimaryPinMiddleware(
+            lambda request: HttpResponse())(RequestFactory().post('/'))
+        self.assertNotIn('use_primary', response.cookies)
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    def make_connection(self, options):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        wrapper = DatabaseWrapper({
+            'ENGINE': 'core.sqlite_backend',
+            'NAME': os.path.join(directory.name, 'test.sqlite3'),
+            'OPTIONS': options,
+            'ATOMIC_REQUESTS': False,
+            'AUTOCOMMIT': True,
+            'CONN_MAX_AGE': 0,
+            'TIME_ZONE': None,
+        })
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_pragmas_are_applied(self):
+        wrapper = self.make_connection({
+            'pragmas': {'journal_mode': 'WAL', 'cache_size': -1234},
+        })
+        with wrapper.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -1234)
+
+    def test_transactions_begin_immediate(self):
+        wrapper = self.make_connection({'transaction_mode': 'IMMEDIATE'})
+        wrapper.force_debug_cursor = True
+        wrapper.ensure_connection()
+        wrapper._start_transaction_under_autocommit()
+        self.assertEqual(wrapper.queries[-1]['sql'], 'BEGIN IMMEDIATE')
+        wrapper.connection.rollback()
@@ -0,0 +1,60 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+
+from .. import views
+from ..storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        self.storage = ContentAddressedStorage(location=self.root)
+
+    def test_identical_content_is_stored_once(self):
+        first = self.storage.save('posts/a.JPG', ContentFile(b'photo'))
+        second = self.storage.save('posts/b.jpg', ContentFile(b'photo'))
+        other = self.storage.save('posts/a.jpg', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertRegex(first, r'^posts/([0-9a-f]{2})/\1[0-9a-f]{62}\.jpg$')
+        self.assertEqual(self.storage.references(first), 2)
+        self.assertEqual(
+            sorted(os.listdir(os.path.dirname(self.storage.path(first)))),
+            [os.path.basename(first)])
+
+    def test_file_is_deleted_with_last_reference(self):
+        name = self.storage.save('posts/a.gif', ContentFile(b'gif'))
+        self.storage.save('posts/b.gif', ContentFile(b'gif'))
+        self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertEqual(self.storage.references(name), 0)
+
+    def test_file_without_references_is_deleted(self):
+        # Загружен до появления хранилища
+        path = os.path.join(self.root, 'posts', 'old.gif')
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as old:
+            old.write(b'gif')
+        self.storage.delete('posts/old.gif')
+        self.assertFalse(os.path.exists(path))
+
+    def test_media_is_immutable(self):
+        name = self.storage.save('posts/a.gif', ContentFile(b'gif'))
+        factory = RequestFactory()
+        with override_settings(MEDIA_ROOT=self.root):
+            response = views.media(factory.get('/media/' + name), name)
+            response.close()
+            self.assertEqual(
+                response['Cache-Control'], settings.MEDIA_CACHE_CONTROL)
+            with self.assertRaises(Http404):
+                views.media(factory.get('/media/posts/missing.gif'),
+                            'posts/missing.gif')
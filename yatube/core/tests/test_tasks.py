@@ -0,0 +1,130 @@
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import metrics, tasks
+from ..models import Task
+
+CALLS = []
+
+
+@tasks.task()
+def remember(value):
+    CALLS.append(value)
+
+
+@tasks.task(priority=5)
+def urgent(value):
+    CALLS.append(value)
+
+
+@tasks.task(max_attempts=2)
+def broken():
+    raise ValueError('Сломано')
+
+
+def steal():
+    # Аренда истекла посреди выполнения, и задание взял другой.
+    Task.objects.update(leased_until=timezone.now() - timedelta(seconds=1))
+    tasks.claim('other', 10, 60)
+
+
+@tasks.task()
+def slow():
+    steal()
+
+
+@tasks.task()
+def slow_and_broken():
+    steal()
+    raise ValueError('Сломано')
+
+
+@override_settings(TASK_RETRY_DELAY=10)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            METRICS_PATH=os.path.join(directory.name, 'metrics.sqlite3'))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        metrics._pending.clear()
+
+    def expire(self):
+        past = timezone.now() - timedelta(seconds=1)
+        Task.objects.update(run_at=past, leased_until=past)
+
+    def test_priority_and_batch(self):
+        remember.delay('первое')
+        remember.delay('второе')
+        urgent.delay('срочное')
+        self.assertEqual(tasks.run_batch('worker', limit=2), 2)
+        self.assertEqual(CALLS, ['срочное', 'первое'])
+        self.assertEqual(tasks.run_batch('worker'), 1)
+        self.assertEqual(CALLS, ['срочное', 'первое', 'второе'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_lease_hides_task_until_it_expires(self):
+        remember.delay('раз')
+        self.assertEqual(len(tasks.claim('first', 10, 300)), 1)
+        self.assertEqual(tasks.claim('second', 10, 300), [])
+        # Первый обработчик упал, и аренда истекла.
+        self.expire()
+        claimed = tasks.claim('second', 10, 300)
+        self.assertEqual([task.worker for task in claimed], ['second'])
+
+    def test_expired_lease_keeps_task_of_other_worker(self):
+        for function in (slow, slow_and_broken):
+            with self.subTest(task=function.task_name):
+                function.delay()
+                tasks.run_batch('worker')
+                task = Task.objects.get()
+                self.assertEqual(task.worker, 'other')
+                self.assertEqual(task.attempts, 0)
+                self.assertGreater(task.leased_until, timezone.now())
+                task.delete()
+
+    def test_retries_with_backoff(self):
+        broken.delay()
+        started = timezone.now()
+        tasks.run_batch('worker')
+        task = Task.objects.get()
+        self.assertEqual(task.attempts, 1)
+        self.assertFalse(task.failed)
+        self.assertGreaterEqual(task.run_at, started + timedelta(seconds=10))
+        self.assertEqual(tasks.run_batch('worker'), 0)
+        self.expire()
+        tasks.run_batch('worker')
+        task = Task.objects.get()
+        self.assertTrue(task.failed)
+        self.assertIn('Сломано', task.error)
+        self.expire()
+        self.assertEqual(tasks.run_batch('worker'), 0)
+
+    def test_depth_and_latency_are_reported(self):
+        remember.delay('раз')
+        broken.delay()
+        text = metrics.render()
+        self.assertIn(
+            'yatube_task_queue_depth{view="%s"} 1' % remember.task_name,
+            text)
+        call_command('run_tasks', '--once', stdout=StringIO())
+        metrics.flush()
+        text = metrics.render()
+        self.assertIn(
+            'yatube_task_latency_seconds_count{view="%s"} 1.0'
+            % remember.task_name, text)
+        self.assertIn(
+            'yatube_task_failures_total{view="%s"} 1.0'
+            % broken.task_name, text)
+        output = StringIO()
+        call_command('task_stats', stdout=output)
+        self.assertIn('%s: готово 0, ждут срока 1' % broken.task_name,
+                      output.getvalue())
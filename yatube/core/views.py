@@ -1,6 +1,11 @@
 from http import HTTPStatus
 
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
+from django.views import static
+
+from . import metrics as request_metrics
 
 
 def page_not_found(request, exception):
@@ -26,3 +31,25 @@ def csrf_failure(request, reason=''):
         'core/403csrf.html',
         status=HTTPStatus.FORBIDDEN
     )
+
+
+def metrics(request):
+    # Метрики для Prometheus: со своих адресов или для персонала.
+    allowed = request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+    if not (allowed or request.user.is_staff):
+        return HttpResponseForbidden()
+    request_metrics.flush()
+    return HttpResponse(
+        request_metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+def media(request, path):
+    # Для отладочного сервера; в бою тот же заголовок ставит
+    # веб-сервер. Имена файлов — хэши содержимого (core.storage).
+    response = static.serve(
+        request, path, document_root=settings.MEDIA_ROOT)
+    if response.status_code == HTTPStatus.OK:
+        response['Cache-Control'] = settings.MEDIA_CACHE_CONTROL
+    return response
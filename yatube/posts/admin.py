@@ -2,6 +2,7 @@ from django.conf import settings
 from django.contrib import admin
 
 from .models import Group, Post, Comment, Follow
+from .search import filter_posts
 
 
 @admin.register(Post)
@@ -14,10 +15,16 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
-    search_fields = ('text',)
+    search_fields = ('text', 'group__title')
     list_filter = ('pub_date',)
     empty_value_display = settings.EMPTY_VALUE_DISPLAY
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по полнотекстовому индексу вместо LIKE по всей таблице.
+        if not search_term.split():
+            return queryset, False
+        return filter_posts(queryset, search_term), False
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -1,5 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def restore_search_index(sender, using, **kwargs):
+    # Миграции, пересоздавшие таблицы постов в SQLite, теряют
+    # триггеры поискового индекса (см. posts.search).
+    from .search import restore_index
+    restore_index(using)
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from . import holes, signals  # noqa: F401
+        post_migrate.connect(restore_search_index, sender=self)
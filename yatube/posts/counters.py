@@ -0,0 +1,56 @@
+"""Денормализованные счётчики Profile и Post.comments_count.
+
+При записи счётчики меняются атомарным UPDATE ... SET x = x + 1
+в той же транзакции, что и сама запись; recount_* заново считают
+их по таблицам, чтобы исправить расхождения.
+"""
+from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, Profile
+
+# Поле Profile: (модель, поле этой модели со ссылкой на пользователя)
+PROFILE_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def change(queryset, field, delta):
+    """Прибавляет delta к счётчику, не опуская его ниже нуля."""
+    if delta < 0:
+        queryset = queryset.filter(**{field + '__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def _count_of(model, field, outer):
+    rows = (
+        model.objects.filter(**{field: OuterRef(outer)})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(
+        Subquery(rows, output_field=models.IntegerField()), 0)
+
+
+def create_missing_profiles(users):
+    Profile.objects.bulk_create(
+        [Profile(user_id=pk) for pk in users.filter(
+            profile__isnull=True).values_list('pk', flat=True)],
+        ignore_conflicts=True
+    )
+
+
+def recount_profiles(profiles):
+    profiles.update(**{
+        name: _count_of(model, field, 'user')
+        for name, (model, field) in PROFILE_COUNTERS.items()
+    })
+
+
+def recount_posts(posts):
+    posts.update(comments_count=_count_of(Comment, 'post', 'pk'))
@@ -0,0 +1,126 @@
+"""Письма подписчикам о новых постах.
+
+Письмо на каждый пост каждому подписчику в запросе create_post у
+автора с тысячами подписчиков отправлялось бы минутами. Вместо этого
+новый пост только ставит в очередь core.tasks рассылку через
+NOTIFICATION_DIGEST_INTERVAL секунд, если она ещё не стоит. Рассылка
+(Digest) собирает для каждого подписчика одно письмо со всеми
+постами его авторов за промежуток с прошлой рассылки.
+
+Подписки читаются порциями по NOTIFICATION_DIGEST_CHUNK_SIZE
+подписчиков по индексу (user, author), и в памяти одновременно
+только одна порция и посты промежутка. Письма порции уходят через
+одно соединение EMAIL_BACKEND, после чего рассылка запоминает
+последнего получателя.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Exists, OuterRef
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils import timezone
+
+from core.tasks import enqueue, pending, task
+from .models import Digest, Follow, Post, User
+
+SUBJECT = 'Новые посты авторов, на которых вы подписаны'
+
+
+def current_digest(now):
+    """Прерванная рассылка или новая — от конца предыдущей до now."""
+    digest = Digest.objects.filter(finished=False).order_by('pk').first()
+    if digest is not None:
+        return digest
+    since = Digest.objects.order_by('-until').values_list(
+        'until', flat=True).first()
+    if since is None:
+        since = now - timedelta(seconds=settings.NOTIFICATION_DIGEST_INTERVAL)
+    return Digest.objects.create(since=since, until=now)
+
+
+def window(digest):
+    return Post.objects.filter(
+        pub_date__gt=digest.since, pub_date__lte=digest.until)
+
+
+def recipients(digest, size):
+    """id следующих size подписчиков с адресом почты."""
+    # Коррелированный EXISTS вместо author IN (...): так подписки
+    # читаются по индексу (user, author) в порядке подписчиков и без
+    # сортировки, а посты автора — по индексу (author, pub_date).
+    return list(
+        Follow.objects.annotate(active=Exists(
+            window(digest).filter(author=OuterRef('author')))
+        ).filter(active=True, user__gt=digest.last_user)
+        .exclude(user__email='')
+        .order_by('user').values_list('user', flat=True).distinct()[:size])
+
+
+def messages(digest, users):
+    """Письма подписчикам users о постах их авторов из рассылки."""
+    authors = defaultdict(list)
+    for user_id, author_id in Follow.objects.filter(
+            user__in=users,
+            author__in=window(digest).values('author')
+    ).values_list('user', 'author'):
+        authors[user_id].append(author_id)
+    posts = defaultdict(list)
+    for post in window(digest).filter(
+            author__in={pk for ids in authors.values() for pk in ids}
+    ).select_related('author').order_by('-pub_date', '-pk'):
+        posts[post.author_id].append(post)
+    template = get_template('posts/digest_email.txt')
+    for user in User.objects.filter(pk__in=users).order_by('pk').only(
+            'username', 'email'):
+        user_posts = sorted(
+            (post for author_id in authors[user.pk]
+             for post in posts[author_id]),
+            key=lambda post: (post.pub_date, post.pk), reverse=True)
+        shown = user_posts[:settings.NOTIFICATION_DIGEST_MAX_POSTS]
+        body = template.render({
+            'user': user,
+            'posts': [
+                (post, settings.SITE_URL + reverse(
+                    'posts:post_detail', kwargs={'post_id': post.pk}))
+                for post in shown
+            ],
+            'more': len(user_posts) - len(shown),
+            'follow_url': settings.SITE_URL + reverse(
+                'posts:follow_index'),
+        })
+        yield EmailMessage(SUBJECT, body, to=[user.email])
+
+
+def send(digest):
+    """Отправляет письма рассылки порциями; возвращает их число."""
+    size = settings.NOTIFICATION_DIGEST_CHUNK_SIZE
+    users = recipients(digest, size)
+    while users:
+        batch = list(messages(digest, users))
+        with get_connection() as connection:
+            connection.send_messages(batch)
+        digest.last_user = users[-1]
+        digest.emails += len(batch)
+        digest.save(update_fields=('last_user', 'emails'))
+        users = recipients(digest, size)
+    digest.finished = True
+    digest.save(update_fields=('finished',))
+    return digest.emails
+
+
+@task()
+def send_digest():
+    send(current_digest(timezone.now()))
+
+
+def schedule():
+    """Ставит рассылку в очередь, если она ещё не стоит."""
+    # Посты, опубликованные во время идущей рассылки, попадут в
+    # следующую.
+    if not pending(send_digest.task_name):
+        enqueue(
+            send_digest.task_name,
+            countdown=settings.NOTIFICATION_DIGEST_INTERVAL)
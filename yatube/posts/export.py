@@ -0,0 +1,76 @@
+"""Потоковая выгрузка постов, комментариев и подписок в NDJSON.
+
+Каждая строка — JSON-объект одной записи с ключом "model" и
+значениями полей таблицы (внешние ключи — в виде *_id). Таблицы
+читаются порциями по первичному ключу, поэтому память не зависит
+от их размера, а чтение не держит одну длинную транзакцию.
+"""
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Follow, Post
+
+MODELS = {
+    'posts': Post,
+    'comments': Comment,
+    'follows': Follow,
+}
+
+
+def columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def iter_chunks(model, chunk_size):
+    """Строки таблицы порциями в порядке первичного ключа."""
+    pk = model._meta.pk.attname
+    queryset = model.objects.order_by(pk).values(*columns(model))
+    last = None
+    while True:
+        chunk = queryset
+        if last is not None:
+            chunk = chunk.filter(pk__gt=last)
+        rows = list(chunk[:chunk_size])
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1][pk]
+
+
+class Export:
+    """Выгрузка таблиц из MODELS в NDJSON.
+
+    При обходе отдаёт байты порциями по chunk_size строк; rows —
+    сколько строк уже отдано.
+    """
+
+    def __init__(self, names, chunk_size=2000):
+        self.names = names
+        self.chunk_size = chunk_size
+        self.rows = 0
+
+    def __iter__(self):
+        encoder = DjangoJSONEncoder(
+            ensure_ascii=False, separators=(',', ':'))
+        for name in self.names:
+            model = MODELS[name]
+            label = model._meta.label_lower
+            for rows in iter_chunks(model, self.chunk_size):
+                lines = [
+                    encoder.encode(dict(model=label, **row))
+                    for row in rows
+                ]
+                self.rows += len(rows)
+                yield ('\n'.join(lines) + '\n').encode()
+
+
+def gzip_stream(chunks, level=6):
+    """Сжимает поток байтов в формат gzip на лету."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
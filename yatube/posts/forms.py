@@ -1,5 +1,7 @@
 from django import forms
+from django.conf import settings
 
+from .images import schedule
 from .models import Group, Post, Comment
 
 
@@ -19,6 +21,30 @@ class PostForm(forms.ModelForm):
         )
         image = forms.ImageField()
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # ImageField уже прочитал заголовок файла; сама картинка
+        # декодируется только при обработке, вне запроса.
+        header = getattr(image, 'image', None)
+        if header is not None and (
+                header.width * header.height
+                > settings.POST_IMAGE_MAX_PIXELS):
+            raise forms.ValidationError(
+                'Картинка слишком большая: не больше %d мегапикселей.'
+                % (settings.POST_IMAGE_MAX_PIXELS // 10 ** 6))
+        return image
+
+    def save(self, commit=True):
+        new_image = 'image' in self.changed_data and self.instance.image
+        if new_image:
+            self.instance.image_ready = False
+        post = super().save(commit)
+        if commit and new_image:
+            # Картинка уменьшается и перекодируется в фоне, а копии
+            # для лент создаются там же, а не при первом показе.
+            schedule(post.pk)
+        return post
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,47 @@
+"""Части страниц, которые у каждого пользователя свои.
+
+Страницы под core.page_cache.cache_page сохраняются одни на всех, а
+эти фрагменты рендерятся для каждого запроса заново. Аргументы тега
+{% hole %} приходят строками.
+"""
+from core.page_cache import hole
+from .forms import CommentForm
+from .models import Follow
+
+
+@hole('header', 'includes/header.html')
+def header(request):
+    return {}
+
+
+@hole('switcher', 'includes/switcher.html')
+def switcher(request):
+    return {}
+
+
+@hole('follow_button', 'includes/follow_button.html')
+def follow_button(request, username):
+    user = request.user
+    following = (
+        user.is_authenticated and user.username != username
+        and Follow.objects.filter(
+            user=user, author__username=username).exists()
+    )
+    return {'username': username, 'following': following}
+
+
+@hole('post_actions', 'includes/post_actions.html')
+def post_actions(request, post_id, author_id):
+    # У поста удалённого автора author_id — 'None', как и pk анонима.
+    user = request.user
+    return {
+        'post_id': post_id,
+        'is_author': (
+            user.is_authenticated and author_id.isdigit()
+            and user.pk == int(author_id)),
+    }
+
+
+@hole('comment_form', 'includes/comment_form.html')
+def comment_form(request, post_id):
+    return {'post_id': post_id, 'form': CommentForm()}
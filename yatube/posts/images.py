@@ -0,0 +1,124 @@
+"""Обработка картинок постов и их уменьшенные копии.
+
+Запрос на создание или правку поста только сохраняет загруженный
+файл и помечает пост image_ready=False. schedule() в той же
+транзакции ставит задание в очередь core.tasks, и обработчик
+run_tasks в process() уменьшает картинку до POST_IMAGE_MAX_SIZE,
+поворачивает по EXIF, отбрасывает метаданные, перекодирует её и
+создаёт копии для srcset. Пока обработка не закончилась, в лентах
+выводится заглушка. Посты, загруженные до появления очереди,
+доделывает команда process_images.
+
+Для каждой ширины из POST_IMAGE_WIDTHS создаются JPEG и WebP.
+Копии создаются заранее, поэтому при выводе ленты sorl-thumbnail
+только находит их в хранилище ключей.
+"""
+import logging
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+from sorl.thumbnail import get_thumbnail
+
+from core.cache import bump
+from core.tasks import task
+from .models import Post
+from .utils import feed_scopes
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('WEBP', 'JPEG')
+
+
+def get_variants(image, image_format):
+    """Копии картинки в формате image_format от узкой к широкой."""
+    return [
+        get_thumbnail(
+            image, str(width), format=image_format,
+            quality=settings.POST_IMAGE_QUALITY)
+        for width in settings.POST_IMAGE_WIDTHS
+    ]
+
+
+def generate_variants(image):
+    """Создаёт все копии картинки; ошибки только пишет в журнал."""
+    try:
+        for image_format in FORMATS:
+            get_variants(image, image_format)
+    except Exception:
+        logger.exception('Не удалось создать копии картинки %s', image)
+
+
+def srcset(variants):
+    # Маленькая картинка не растягивается, и несколько копий могут
+    # совпасть по ширине: в srcset оставляем по одной.
+    candidates = {}
+    for variant in variants:
+        candidates.setdefault(variant.width, variant.url)
+    return ', '.join(
+        '%s %sw' % (url, width) for width, url in candidates.items())
+
+
+def reencode(source):
+    """Уменьшенная картинка без метаданных: (байты, расширение)."""
+    max_size = settings.POST_IMAGE_MAX_SIZE
+    image = Image.open(source)
+    # JPEG сразу декодируется в масштабе 1/2–1/8, ближайшем к
+    # итоговому размеру, и картинка исходного размера целиком в
+    # память не попадает. Поворот по EXIF — уже после уменьшения.
+    scale = min(1, max_size / max(image.size))
+    image.draft('RGB', (
+        round(image.width * scale), round(image.height * scale)))
+    image.thumbnail((max_size, max_size))
+    image = ImageOps.exif_transpose(image)
+    transparent = image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info)
+    # EXIF, ICC и прочие метаданные не переносятся в новый файл.
+    image.info = {
+        key: value for key, value in image.info.items()
+        if key == 'transparency'
+    }
+    output = BytesIO()
+    if transparent:
+        image.save(output, 'PNG', optimize=True)
+        return output.getvalue(), '.png'
+    image.convert('RGB').save(
+        output, 'JPEG', quality=settings.POST_IMAGE_QUALITY,
+        optimize=True, progressive=True)
+    return output.getvalue(), '.jpg'
+
+
+@task(priority=settings.POST_IMAGE_TASK_PRIORITY)
+def process(post_id):
+    """Обрабатывает картинку поста, если она ещё не обработана."""
+    post = Post.objects.filter(pk=post_id, image_ready=False).first()
+    if post is None:
+        return
+    original = post.image.name
+    with post.image.open('rb') as source:
+        content, extension = reencode(source)
+    # Хранилище называет файл по хэшу содержимого (core.storage),
+    # от исходного имени берётся только каталог upload_to.
+    post.image.name = default_storage.save(
+        post.image.field.generate_filename(post, 'image' + extension),
+        ContentFile(content))
+    generate_variants(post.image)
+    # Пока шла обработка, автор мог загрузить другую картинку: тогда
+    # её обработает своё задание, а эта копия не нужна.
+    updated = Post.objects.filter(
+        pk=post_id, image=original, image_ready=False
+    ).update(image=post.image.name, image_ready=True,
+             updated=timezone.now())
+    if not updated:
+        default_storage.delete(post.image.name)
+        return
+    default_storage.delete(original)
+    bump(*feed_scopes(post))
+
+
+def schedule(post_id):
+    """Ставит обработку картинки в очередь в текущей транзакции."""
+    process.delay(post_id)
@@ -0,0 +1,339 @@
+"""Пакетный импорт пользователей, групп, постов, комментариев и
+подписок со старой платформы.
+
+Строки читаются потоком и пишутся порциями через bulk_create,
+каждая порция — в своей транзакции. Id и внешние ключи в строках —
+это id на старой платформе; они переводятся в наши id через словари
+в памяти, которые при необходимости дополняются из ImportedRecord.
+По ImportedRecord же повторный запуск пропускает уже
+импортированные строки.
+
+bulk_create не вызывает сигналы, поэтому профили, счётчики, ленты
+подписок и поколения кэша обновляются после импорта пакетно, в
+Importer.finish(). Поисковый индекс поддерживают триггеры базы.
+"""
+import csv
+import json
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, models, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from core.cache import bump
+from . import timeline
+from .counters import (
+    create_missing_profiles, recount_posts, recount_profiles
+)
+from .models import (
+    Comment, Follow, Group, ImportedRecord, Post, Profile, User
+)
+
+# Короткие имена для --model и метки из выгрузки export_ndjson.
+LABELS = {
+    'users': 'auth.user',
+    'groups': 'posts.group',
+    'posts': 'posts.post',
+    'comments': 'posts.comment',
+    'follows': 'posts.follow',
+}
+
+
+class InvalidRow(Exception):
+    pass
+
+
+class Spec:
+    """Как импортировать строки одной модели.
+
+    fields — поля, которые копируются из строки; references — поля
+    внешних ключей и метки моделей, на которые они ссылаются;
+    natural_key — поля, по которым уже существующая у нас запись
+    считается той же самой.
+    """
+
+    def __init__(self, model, fields, references=None, natural_key=()):
+        self.model = model
+        self.fields = fields
+        self.references = references or {}
+        self.natural_key = natural_key
+
+    @property
+    def label(self):
+        return self.model._meta.label_lower
+
+    def key(self, obj):
+        return tuple(getattr(obj, name) for name in self.natural_key)
+
+
+SPECS = {
+    'auth.user': Spec(
+        User, ('username', 'first_name', 'last_name', 'email'),
+        natural_key=('username',)),
+    'posts.group': Spec(
+        Group, ('title', 'slug', 'description'),
+        natural_key=('slug',)),
+    'posts.post': Spec(
+        Post, ('text', 'pub_date', 'image'),
+        references={'author_id': 'auth.user', 'group_id': 'posts.group'}),
+    'posts.comment': Spec(
+        Comment, ('text', 'created'),
+        references={'post_id': 'posts.post', 'author_id': 'auth.user'}),
+    'posts.follow': Spec(
+        Follow, (),
+        references={'user_id': 'auth.user', 'author_id': 'auth.user'},
+        natural_key=('user_id', 'author_id')),
+}
+# Порядок, в котором модели порции пишутся в базу: сначала те,
+# на которые ссылаются остальные.
+ORDER = list(SPECS)
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def read_ndjson(lines):
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(lines, model):
+    for row in csv.DictReader(lines):
+        row['model'] = model
+        yield row
+
+
+@contextmanager
+def keep_dates():
+    # Даты публикации и комментариев переносятся со старой
+    # платформы, а auto_now_add перезаписал бы их текущим временем.
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Importer:
+    def __init__(self, source='default', chunk_size=1000):
+        self.source = source
+        self.chunk_size = chunk_size
+        # Метка модели -> {id в источнике: наш id}.
+        self.maps = defaultdict(dict)
+        self.stats = Counter()
+        self.rows = 0
+        self.users = set()
+        self.posts = set()
+        self.authors = set()
+        self.groups = set()
+        self.follows = set()
+
+    def run(self, rows, default_model=None):
+        """Импортирует строки; после всех файлов нужен finish()."""
+        for chunk in batches(rows, self.chunk_size):
+            self.import_chunk(chunk, default_model)
+
+    def label_of(self, row, default_model):
+        name = row.get('model') or default_model
+        label = LABELS.get(name, name)
+        if label not in SPECS:
+            raise InvalidRow('Неизвестная модель: %s' % name)
+        if row.get('id') in ('', None):
+            raise InvalidRow('Строка без id: %s' % row)
+        return label
+
+    def import_chunk(self, rows, default_model=None):
+        grouped = defaultdict(list)
+        for row in rows:
+            grouped[self.label_of(row, default_model)].append(row)
+        with transaction.atomic(), keep_dates():
+            for label in ORDER:
+                if grouped[label]:
+                    self.import_rows(SPECS[label], grouped[label])
+        self.rows += len(rows)
+
+    def load_map(self, label, source_ids):
+        """Дополняет словарь id модели записями ImportedRecord."""
+        mapping = self.maps[label]
+        missing = {
+            pk for pk in source_ids if pk is not None and pk not in mapping
+        }
+        if not missing:
+            return
+        mapping.update(ImportedRecord.objects.filter(
+            source=self.source, model=label, source_id__in=missing
+        ).values_list('source_id', 'object_id'))
+
+    def reference(self, row, attname):
+        # Внешний ключ может называться и author_id, и author.
+        raw = row.get(attname, row.get(attname[:-len('_id')]))
+        return None if raw in ('', None) else str(raw)
+
+    def value(self, field, raw):
+        if raw == '' or raw is None:
+            if isinstance(field, models.DateTimeField):
+                return timezone.now()
+            return None if field.null else field.get_default()
+        return field.to_python(raw)
+
+    def build(self, spec, row):
+        """Объект модели по строке или None, если ссылка не найдена."""
+        opts = spec.model._meta
+        values = {}
+        for name in spec.fields:
+            if name in row:
+                values[name] = self.value(opts.get_field(name), row[name])
+        for attname, label in spec.references.items():
+            raw = self.reference(row, attname)
+            values[attname] = raw and self.maps[label].get(raw)
+            if raw is not None and values[attname] is None:
+                return None
+        if spec.model is Follow and (
+                values['user_id'] == values['author_id']):
+            return None
+        if spec.model is User:
+            values['password'] = make_password(None)
+        return spec.model(**values)
+
+    def import_rows(self, spec, rows):
+        label = spec.label
+        self.load_map(label, [str(row['id']) for row in rows])
+        for attname, ref_label in spec.references.items():
+            self.load_map(ref_label, [
+                self.reference(row, attname) for row in rows
+            ])
+        mapping = self.maps[label]
+        pending = {}
+        for row in rows:
+            source_id = str(row['id'])
+            if source_id in mapping or source_id in pending:
+                self.stats[label, 'existing'] += 1
+                continue
+            obj = self.build(spec, row)
+            if obj is None:
+                self.stats[label, 'skipped'] += 1
+                continue
+            pending[source_id] = obj
+        matched, aliases = self.match(spec, pending)
+        new = [
+            (source_id, obj) for source_id, obj in pending.items()
+            if source_id not in matched and source_id not in aliases
+        ]
+        self.create(spec, [obj for _, obj in new])
+        created = {source_id: obj.pk for source_id, obj in new}
+        created.update(matched)
+        for source_id, first in aliases.items():
+            created[source_id] = created[first]
+        ImportedRecord.objects.bulk_create([
+            ImportedRecord(source=self.source, model=label,
+                           source_id=source_id, object_id=object_id)
+            for source_id, object_id in created.items()
+        ], batch_size=self.chunk_size)
+        mapping.update(created)
+        self.stats[label, 'created'] += len(new)
+        self.stats[label, 'existing'] += len(matched) + len(aliases)
+        self.remember(spec, [obj for _, obj in new])
+
+    def match(self, spec, pending):
+        """Строки, которые у нас уже есть под тем же естественным
+        ключом (имя пользователя, slug группы, пара подписки).
+
+        Возвращает наши id для таких строк и повторы ключа внутри
+        порции: они ссылаются на первую строку с этим ключом.
+        """
+        if not spec.natural_key or not pending:
+            return {}, {}
+        keys = defaultdict(list)
+        for source_id, obj in pending.items():
+            keys[spec.key(obj)].append(source_id)
+        existing = spec.model.objects.filter(**{
+            '%s__in' % name: {key[index] for key in keys}
+            for index, name in enumerate(spec.natural_key)
+        }).values_list('pk', *spec.natural_key)
+        matched = {}
+        for pk, *key in existing:
+            for source_id in keys.pop(tuple(key), ()):
+                matched[source_id] = pk
+        aliases = {
+            source_id: source_ids[0]
+            for source_ids in keys.values()
+            for source_id in source_ids[1:]
+        }
+        return matched, aliases
+
+    def create(self, spec, objects):
+        if not objects:
+            return
+        model = spec.model
+        if not connection.features.can_return_ids_from_bulk_insert:
+            # SQLite не возвращает id из bulk_create, поэтому они
+            # выдаются заранее — внутри транзакции порции.
+            start = model.objects.aggregate(last=Max('pk'))['last'] or 0
+            for offset, obj in enumerate(objects, start + 1):
+                obj.pk = offset
+        model.objects.bulk_create(objects, batch_size=self.chunk_size)
+
+    def remember(self, spec, objects):
+        # Что пересчитать в finish().
+        for obj in objects:
+            if spec.model is User:
+                self.users.add(obj.pk)
+            elif spec.model is Post:
+                self.users.add(obj.author_id)
+                self.authors.add(obj.author_id)
+                self.posts.add(obj.pk)
+                self.groups.add(obj.group_id)
+            elif spec.model is Comment:
+                self.posts.add(obj.post_id)
+            elif spec.model is Follow:
+                self.users.update((obj.user_id, obj.author_id))
+                self.follows.add((obj.user_id, obj.author_id))
+
+    def finish(self):
+        """Делает за сигналы то, что они сделали бы для каждой строки."""
+        for ids in (self.users, self.authors, self.groups):
+            ids.discard(None)
+        for users in batches(sorted(self.users), self.chunk_size):
+            with transaction.atomic():
+                create_missing_profiles(User.objects.filter(pk__in=users))
+                recount_profiles(
+                    Profile.objects.filter(user__in=users))
+        for posts in batches(sorted(self.posts), self.chunk_size):
+            with transaction.atomic():
+                recount_posts(Post.objects.filter(pk__in=posts))
+        # Авторы, у которых число подписчиков перешло порог, меняют
+        # раскладку на подмешивание или обратно.
+        followed = sorted({author_id for _, author_id in self.follows})
+        for authors in batches(followed, self.chunk_size):
+            with transaction.atomic():
+                timeline.rebalance(authors)
+        # Ленты подписок: новые подписки и подписчики авторов новых
+        # постов получают последние посты автора.
+        pairs = set(self.follows)
+        for authors in batches(sorted(self.authors), self.chunk_size):
+            pairs.update(Follow.objects.filter(
+                author__in=authors).values_list('user', 'author'))
+        for batch in batches(sorted(pairs), self.chunk_size):
+            with transaction.atomic():
+                for user_id, author_id in batch:
+                    timeline.backfill(user_id, author_id)
+        if self.users or self.posts:
+            bump('index', 'groups',
+                 *['profile:%s' % pk for pk in self.users],
+                 *['group:%s' % pk for pk in self.groups])
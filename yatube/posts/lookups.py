@@ -0,0 +1,9 @@
+"""Кэши поиска групп и авторов по адресу страницы (core.lookups)."""
+from core.lookups import LookupCache
+from .models import Group, User
+
+groups = LookupCache('group_by_slug', Group, 'slug')
+# Только то, что выводят страницы: без пароля и прав.
+users = LookupCache(
+    'user_by_username', User, 'username',
+    fields=('username', 'first_name', 'last_name'))
@@ -0,0 +1,85 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from core.paginators import CursorPaginator
+from posts.models import Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время выдачи страницы ленты через Paginator '
+        '(COUNT + OFFSET) и через курсорную пагинацию на разной '
+        'глубине. Недостающие посты создаются во временной '
+        'транзакции и откатываются после замера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=100000,
+            help='Минимальное число постов в таблице на время замера.')
+        parser.add_argument(
+            '--depths', type=int, nargs='+',
+            default=[1, 10, 100, 1000, 5000],
+            help='Номера страниц, на которых делается замер.')
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз повторять каждый замер.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.fill(options['posts'])
+            self.run(options['depths'], options['repeat'])
+            transaction.set_rollback(True)
+
+    def fill(self, total):
+        missing = total - Post.objects.count()
+        if missing <= 0:
+            return
+        author = User.objects.create_user(username='bench_pagination')
+        batch = 10000
+        for start in range(0, missing, batch):
+            Post.objects.bulk_create(
+                Post(author=author, text='Пост %d' % number)
+                for number in range(start, min(start + batch, missing))
+            )
+        self.stdout.write('Добавлено временных постов: %d' % missing)
+
+    def measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings) * 1000
+
+    def run(self, depths, repeat):
+        per_page = settings.NUMBER_OF_POSTS_ON_PAGE
+        post_list = Post.objects.all()
+        ordered = post_list.order_by('-pub_date', '-pk')
+        offset_paginator = Paginator(ordered, per_page)
+        cursor_paginator = CursorPaginator(post_list, per_page)
+        self.stdout.write(
+            '%8s %14s %14s' % ('страница', 'offset, мс', 'cursor, мс'))
+        for depth in depths:
+            if depth > offset_paginator.num_pages:
+                break
+            cursor = None
+            if depth > 1:
+                # Последний пост предыдущей страницы — то, что
+                # пользователь получил бы в ссылке «Следующая».
+                last = ordered[(depth - 1) * per_page - 1]
+                cursor = cursor_paginator.encode_cursor(last)
+            offset_ms = self.measure(
+                lambda: list(Paginator(ordered, per_page).page(depth)),
+                repeat
+            )
+            cursor_ms = self.measure(
+                lambda: list(cursor_paginator.page(after=cursor)),
+                repeat
+            )
+            self.stdout.write(
+                '%8d %14.2f %14.2f' % (depth, offset_ms, cursor_ms))
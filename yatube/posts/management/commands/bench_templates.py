@@ -0,0 +1,135 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.template import Template
+from django.template.loader import render_to_string
+from django.test import RequestFactory, override_settings
+
+from core.cache import bump
+from core.management.commands.bench_database import percentile
+from posts import timeline
+from posts.models import Follow, Group, Post, User
+from posts.templatetags.post_cards import card_key
+from posts.utils import get_page
+
+UNCACHED_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+CACHED_LOADERS = [
+    ('django.template.loaders.cached.Loader', UNCACHED_LOADERS),
+]
+# Режим: (загрузчики шаблонов, запоминать ли карточки постов)
+MODES = (
+    ('без cached.Loader, карточки рендерятся', UNCACHED_LOADERS, False),
+    ('cached.Loader, карточки рендерятся', CACHED_LOADERS, False),
+    ('cached.Loader, карточки из кэша', CACHED_LOADERS, True),
+)
+
+
+def templates_with(loaders):
+    options = dict(settings.TEMPLATES[0]['OPTIONS'], loaders=loaders)
+    return [dict(settings.TEMPLATES[0], APP_DIRS=False, OPTIONS=options)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время рендеринга шаблонов лент (главная, группа, '
+        'профиль, подписки) на постах из текущей базы: без '
+        'cached.Loader, с ним и с запомненными карточками постов. '
+        'Кэши фрагментов лент сбрасываются перед каждым рендерингом, '
+        'кэш целых страниц не участвует.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=50,
+            help='Сколько раз рендерить каждую страницу.')
+
+    def pages(self, request):
+        """(имя, шаблон, контекст, области кэша) для каждой ленты."""
+        post = Post.objects.exclude(group=None).order_by('-pk').first()
+        if post is None:
+            raise CommandError(
+                'Нет постов в группах: заполните базу командой seed.')
+        posts = Post.objects.select_related('author', 'group')
+        group = Group.objects.get(pk=post.group_id)
+        author = User.objects.select_related('profile').get(
+            pk=post.author_id)
+        pages = [
+            ('index', 'posts/index.html',
+             {'text': 'Последние обновления на сайте'},
+             ('index', 'groups'), get_page(request, posts)),
+            ('group_list', 'posts/group_list.html',
+             {'group': group}, ('group:%s' % group.pk, 'groups'),
+             get_page(request, posts.filter(group=group))),
+            ('profile', 'posts/profile.html',
+             {'author': author, 'title': author.get_full_name()},
+             ('profile:%s' % author.pk, 'groups'),
+             get_page(request, posts.filter(author=author))),
+        ]
+        if request.user.is_authenticated:
+            pages.append((
+                'follow_index', 'posts/follow.html',
+                {'text': 'Посты избранных авторов'}, (),
+                timeline.get_page(request, request.user)))
+        for name, template, context, scopes, page_obj in pages:
+            # Посты выбираются до замера: он только о шаблонах.
+            len(page_obj)
+            yield name, template, dict(
+                context, page_obj=page_obj, cache_scopes=scopes), scopes
+
+    def handle(self, *args, **options):
+        # При DEBUG панель шаблонов debug_toolbar подменяет
+        # Template._render инструментированной версией, которая
+        # замедляет каждый рендеринг; в бою её нет.
+        instrumented = Template._render
+        Template._render = getattr(
+            Template, 'original_render', Template._render)
+        try:
+            self.run(options['repeat'])
+        finally:
+            Template._render = instrumented
+
+    def run(self, repeat):
+        factory = RequestFactory()
+        reader = User.objects.filter(
+            pk__in=Follow.objects.values('user')).first()
+        users = [AnonymousUser()] + ([reader] if reader else [])
+        for user in users:
+            request = factory.get('/')
+            request.user = user
+            self.stdout.write('Пользователь: %s' % (
+                user.username or 'аноним'))
+            for name, template, context, scopes in self.pages(request):
+                timings = [
+                    self.measure(
+                        template, context, scopes, request, loaders,
+                        memo, repeat)
+                    for _, loaders, memo in MODES
+                ]
+                self.stdout.write('  %-13s %s' % (name, '  '.join(
+                    '%s: %6.2f мс' % (mode[0], timing)
+                    for mode, timing in zip(MODES, timings))))
+
+    def measure(self, template, context, scopes, request, loaders, memo,
+                repeat):
+        timings = []
+        with override_settings(TEMPLATES=templates_with(loaders)):
+            # Первый рендеринг наполняет cached.Loader и кэш карточек.
+            render_to_string(template, context, request)
+            for _ in range(repeat):
+                # Фрагмент ленты рендерится заново, как после нового
+                # поста; вне замера.
+                bump(*scopes)
+                if not memo:
+                    cache.delete_many(
+                        [card_key(post) for post in context['page_obj']])
+                started = time.perf_counter()
+                render_to_string(template, context, request)
+                timings.append(time.perf_counter() - started)
+        timings.sort()
+        return percentile(timings, 0.5) * 1000
@@ -0,0 +1,57 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import MODELS, Export, gzip_stream
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии и подписки в NDJSON, по записи '
+        'в строке. Таблицы читаются порциями, поэтому память не '
+        'растёт с их размером. В конце выводит скорость в строках '
+        'в секунду.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'models', nargs='*',
+            help='Какие таблицы выгружать (%s); по умолчанию все.'
+            % ', '.join(MODELS))
+        parser.add_argument(
+            '--output', '-o', default='-',
+            help='Файл для выгрузки; «-» — стандартный вывод.')
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Сжимать выгрузку в gzip.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько строк читать из базы за один запрос.')
+
+    def handle(self, *args, **options):
+        names = options['models'] or list(MODELS)
+        unknown = set(names) - set(MODELS)
+        if unknown:
+            raise CommandError(
+                'Неизвестные таблицы: %s' % ', '.join(sorted(unknown)))
+        export = Export(names, options['chunk_size'])
+        stream = export
+        if options['gzip']:
+            stream = gzip_stream(stream)
+        started = time.perf_counter()
+        if options['output'] == '-':
+            self.write(sys.stdout.buffer, stream)
+        else:
+            with open(options['output'], 'wb') as output:
+                self.write(output, stream)
+        elapsed = time.perf_counter() - started
+        self.stderr.write(self.style.SUCCESS(
+            'Выгружено строк: %d за %.2f с (%.0f строк/с)'
+            % (export.rows, elapsed,
+               export.rows / elapsed if elapsed else 0)))
+
+    def write(self, output, stream):
+        for chunk in stream:
+            output.write(chunk)
+        output.flush()
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts.images import process
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Обрабатывает картинки постов, для которых нет задания в '
+        'очереди: например, загруженные до её появления.'
+    )
+
+    def handle(self, *args, **options):
+        pending = list(Post.objects.filter(image_ready=False).exclude(
+            image='').values_list('pk', flat=True))
+        for post_id in pending:
+            process(post_id)
+        self.stdout.write(self.style.SUCCESS(
+            'Обработано картинок: %d' % len(pending)))
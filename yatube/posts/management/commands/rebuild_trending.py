@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+
+from posts import trending
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает оценки ленты «Популярное» по публикациям и '
+        'комментариям последних TRENDING_WINDOW секунд и убирает из '
+        'неё затихшие посты. Работает диапазонами id постов, каждый '
+        'диапазон — в своей транзакции; запускается периодически, '
+        'например из cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Сколько постов пересчитывать за одну транзакцию.')
+
+    def handle(self, *args, **options):
+        size = options['chunk_size']
+        now = timezone.now()
+        last = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        ranked = 0
+        for start in range(0, last + 1, size):
+            ranked += trending.rebuild(start, start + size, now)
+        self.stdout.write(self.style.SUCCESS(
+            'В ленте «Популярное» постов: %s' % ranked))
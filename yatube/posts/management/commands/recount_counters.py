@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Q
+
+from posts import timeline
+from posts.counters import (
+    create_missing_profiles, recount_posts, recount_profiles
+)
+from posts.models import Post, Profile, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики постов, комментариев и подписок '
+        'по таблицам. Работает диапазонами первичных ключей, каждый '
+        'диапазон — в своей транзакции.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Сколько строк пересчитывать за одну транзакцию.')
+
+    def chunks(self, queryset, size):
+        last = queryset.aggregate(last=Max('pk'))['last'] or 0
+        for start in range(0, last + 1, size):
+            yield queryset.filter(pk__gte=start, pk__lt=start + size)
+
+    def handle(self, *args, **options):
+        size = options['chunk_size']
+        for users in self.chunks(User.objects.all(), size):
+            with transaction.atomic():
+                create_missing_profiles(users)
+        for profiles in self.chunks(Profile.objects.all(), size):
+            with transaction.atomic():
+                recount_profiles(profiles)
+        for posts in self.chunks(Post.objects.all(), size):
+            with transaction.atomic():
+                recount_posts(posts)
+        # Исправленное число подписчиков могло перейти пороги ленты.
+        crossed = Profile.objects.filter(
+            Q(fan_in=False,
+              followers_count__gte=settings.TIMELINE_FANOUT_LIMIT)
+            | Q(fan_in=True,
+                followers_count__lt=settings.TIMELINE_FANOUT_RESUME)
+        ).values_list('user', flat=True)
+        with transaction.atomic():
+            timeline.rebalance(list(crossed))
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
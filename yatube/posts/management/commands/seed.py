@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.seeding import PREFIX, Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу воспроизводимым набором данных для '
+        'нагрузочных замеров: пользователи, группы, посты, '
+        'комментарии, подписки и картинки со степенными '
+        'распределениями. Пишет порциями без сигналов. Для '
+        'замеров лучше указать отдельный файл базы в '
+        'YATUBE_DATABASE_PATH и выполнить для него migrate.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=200000)
+        parser.add_argument('--comments', type=int, default=500000)
+        parser.add_argument(
+            '--follows', type=int, default=30,
+            help='Среднее число подписок пользователя.')
+        parser.add_argument(
+            '--images', type=int, default=20,
+            help='Сколько разных картинок создать.')
+        parser.add_argument(
+            '--image-share', type=float, default=0.1,
+            help='Доля постов с картинкой.')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько последних дней публикуются посты.')
+        parser.add_argument(
+            '--exponent', type=float, default=1.1,
+            help='Показатель закона Ципфа: чем больше, тем сильнее '
+                 'популярность сосредоточена у немногих.')
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Начальное значение генератора случайных чисел.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Сколько строк писать за одну транзакцию.')
+
+    def handle(self, *args, **options):
+        seeder = Seeder(
+            options['seed'], options['chunk_size'],
+            options['exponent'], options['days'])
+        if seeder.exists():
+            raise CommandError(
+                'В базе уже есть пользователи %s*: заполните чистую '
+                'базу, чтобы набор совпадал с прошлыми замерами.'
+                % PREFIX)
+        started = time.perf_counter()
+        seeder.run(
+            options['users'], options['groups'], options['posts'],
+            options['comments'], options['follows'], options['images'],
+            options['image_share'])
+        elapsed = time.perf_counter() - started
+        for label, total in sorted(seeder.stats.items()):
+            self.stdout.write('%s: %d' % (label, total))
+        self.stdout.write(self.style.SUCCESS(
+            'Создано строк: %d за %.2f с'
+            % (sum(seeder.stats.values()), elapsed)))
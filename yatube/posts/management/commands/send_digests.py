@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.digests import current_digest, send
+
+
+class Command(BaseCommand):
+    help = (
+        'Отправляет подписчикам письма о постах, опубликованных с '
+        'прошлой рассылки, не дожидаясь задания из очереди. '
+        'Прерванную рассылку продолжает с места остановки.'
+    )
+
+    def handle(self, *args, **options):
+        digest = current_digest(timezone.now())
+        sent = send(digest)
+        self.stdout.write(self.style.SUCCESS(
+            'Отправлено писем: %d' % sent))
@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# Полнотекстовый индекс SQLite FTS5 по тексту поста и названию его
+# группы. rowid записи индекса совпадает с id поста; индекс
+# поддерживают триггеры, так что он обновляется при любой записи,
+# в том числе в обход ORM.
+FORWARD = [
+    "CREATE VIRTUAL TABLE posts_post_fts USING fts5("
+    " text, group_title, tokenize='unicode61 remove_diacritics 2')",
+    # Текст поста весит больше, чем совпадение в названии группы.
+    "INSERT INTO posts_post_fts (posts_post_fts, rank) "
+    "VALUES ('rank', 'bm25(1.0, 0.5)')",
+    "INSERT INTO posts_post_fts (rowid, text, group_title) "
+    "SELECT p.id, p.text, g.title FROM posts_post p "
+    "LEFT JOIN posts_group g ON g.id = p.group_id",
+    "CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post "
+    "BEGIN "
+    " INSERT INTO posts_post_fts (rowid, text, group_title) VALUES ("
+    "  new.id, new.text,"
+    "  (SELECT title FROM posts_group WHERE id = new.group_id));"
+    "END",
+    "CREATE TRIGGER posts_post_fts_update "
+    "AFTER UPDATE OF text, group_id ON posts_post "
+    "BEGIN "
+    " DELETE FROM posts_post_fts WHERE rowid = old.id;"
+    " INSERT INTO posts_post_fts (rowid, text, group_title) VALUES ("
+    "  new.id, new.text,"
+    "  (SELECT title FROM posts_group WHERE id = new.group_id));"
+    "END",
+    "CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post "
+    "BEGIN "
+    " DELETE FROM posts_post_fts WHERE rowid = old.id;"
+    "END",
+    "CREATE TRIGGER posts_group_fts_update "
+    "AFTER UPDATE OF title ON posts_group "
+    "BEGIN "
+    " UPDATE posts_post_fts SET group_title = new.title"
+    " WHERE rowid IN (SELECT id FROM posts_post WHERE group_id = new.id);"
+    "END",
+]
+BACKWARD = [
+    'DROP TRIGGER IF EXISTS posts_group_fts_update',
+    'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+    'DROP TRIGGER IF EXISTS posts_post_fts_update',
+    'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+    'DROP TABLE IF EXISTS posts_post_fts',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        # На других СУБД поиск работает без индекса, через LIKE.
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(FORWARD), run(BACKWARD)),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.6 on 2026-10-18 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_post_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportedRecord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50, verbose_name='Источник')),
+                ('model', models.CharField(max_length=50, verbose_name='Модель')),
+                ('source_id', models.CharField(max_length=64, verbose_name='Id в источнике')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Id записи')),
+            ],
+            options={
+                'verbose_name': 'Импортированная запись',
+                'verbose_name_plural': 'Импортированные записи',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='importedrecord',
+            constraint=models.UniqueConstraint(fields=('source', 'model', 'source_id'), name='unique_imported_record'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Индексы внешних ключей, которые повторяют начало составных индексов
+# из 0011. AlterField в SQLite пересоздал бы таблицы и потерял
+# триггеры поискового индекса из 0009, поэтому индексы удаляются
+# напрямую, а AlterField меняет только состояние моделей.
+INDEXES = (
+    ('posts_comment_post_id_e81436d7', 'posts_comment', 'post_id'),
+    ('posts_post_author_id_fe5487bf', 'posts_post', 'author_id'),
+    ('posts_post_group_id_c91a8485', 'posts_post', 'group_id'),
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    'DROP INDEX "%s"' % name,
+                    'CREATE INDEX "%s" ON "%s" ("%s")' % (
+                        name, table, column),
+                )
+                for name, table, column in INDEXES
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='comment',
+                    name='post',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='posts.Post'),
+                ),
+                migrations.AlterField(
+                    model_name='post',
+                    name='author',
+                    field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='posts', to=settings.AUTH_USER_MODEL),
+                ),
+                migrations.AlterField(
+                    model_name='post',
+                    name='group',
+                    field=models.ForeignKey(blank=True, db_index=False, help_text='Группа, к которой будет относиться пост', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_group_posts', to='posts.Group', verbose_name='Группа'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,104 @@
+import sqlite3
+
+from django.db import migrations, models
+
+FIELD = models.BooleanField(
+    default=True, editable=False, verbose_name='Картинка обработана')
+
+
+# Триггеры поиска из 0009. Пока они есть, SQLite не пересоздаёт
+# posts_post: posts_group_fts_update ссылается на неё.
+DROP_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS posts_group_fts_update',
+    'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+    'DROP TRIGGER IF EXISTS posts_post_fts_update',
+    'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+]
+CREATE_TRIGGERS = [
+    "CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post "
+    "BEGIN "
+    " INSERT INTO posts_post_fts (rowid, text, group_title) VALUES ("
+    "  new.id, new.text,"
+    "  (SELECT title FROM posts_group WHERE id = new.group_id));"
+    "END",
+    "CREATE TRIGGER posts_post_fts_update "
+    "AFTER UPDATE OF text, group_id ON posts_post "
+    "BEGIN "
+    " DELETE FROM posts_post_fts WHERE rowid = old.id;"
+    " INSERT INTO posts_post_fts (rowid, text, group_title) VALUES ("
+    "  new.id, new.text,"
+    "  (SELECT title FROM posts_group WHERE id = new.group_id));"
+    "END",
+    "CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post "
+    "BEGIN "
+    " DELETE FROM posts_post_fts WHERE rowid = old.id;"
+    "END",
+    "CREATE TRIGGER posts_group_fts_update "
+    "AFTER UPDATE OF title ON posts_group "
+    "BEGIN "
+    " UPDATE posts_post_fts SET group_title = new.title"
+    " WHERE rowid IN (SELECT id FROM posts_post WHERE group_id = new.id);"
+    "END",
+]
+
+
+def column():
+    field = FIELD.clone()
+    field.set_attributes_from_name('image_ready')
+    return field
+
+
+# AddField в SQLite пересоздал бы таблицу posts_post и потерял
+# триггеры поискового индекса из 0009, а колонку с постоянным
+# значением по умолчанию SQLite умеет добавлять на месте.
+def add_column(apps, schema_editor):
+    model = apps.get_model('posts', 'Post')
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            'ALTER TABLE posts_post '
+            'ADD COLUMN image_ready bool NOT NULL DEFAULT 1')
+    else:
+        schema_editor.add_field(model, column())
+
+
+def drop_column(apps, schema_editor):
+    model = apps.get_model('posts', 'Post')
+    # DROP COLUMN есть в SQLite с 3.35. В старых версиях таблица
+    # пересоздаётся, и на это время триггеры поиска удаляются.
+    if (schema_editor.connection.vendor == 'sqlite'
+            and sqlite3.sqlite_version_info >= (3, 35)):
+        schema_editor.execute(
+            'ALTER TABLE posts_post DROP COLUMN image_ready')
+    else:
+        # При откате поля в состоянии моделей уже нет, а remove_field
+        # ищет его в модели.
+        field = column()
+        model.add_to_class(field.name, field)
+        sqlite = schema_editor.connection.vendor == 'sqlite'
+        for statement in DROP_TRIGGERS if sqlite else []:
+            schema_editor.execute(statement)
+        schema_editor.remove_field(model, field)
+        for statement in CREATE_TRIGGERS if sqlite else []:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_drop_foreign_key_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(add_column, drop_column),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='post',
+                    name='image_ready',
+                    field=FIELD,
+                ),
+            ],
+        ),
+    ]
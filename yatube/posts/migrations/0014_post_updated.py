@@ -0,0 +1,105 @@
+import sqlite3
+
+from django.db import migrations, models
+
+FIELD = models.DateTimeField(auto_now=True, verbose_name='Дата изменения')
+
+
+# Триггеры поиска из 0009. Пока они есть, SQLite не пересоздаёт
+# posts_post: posts_group_fts_update ссылается на неё.
+DROP_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS posts_group_fts_update',
+    'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+    'DROP TRIGGER IF EXISTS posts_post_fts_update',
+    'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+]
+CREATE_TRIGGERS = [
+    "CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post "
+    "BEGIN "
+    " INSERT INTO posts_post_fts (rowid, text, group_title) VALUES ("
+    "  new.id, new.text,"
+    "  (SELECT title FROM posts_group WHERE id = new.group_id));"
+    "END",
+    "CREATE TRIGGER posts_post_fts_update "
+    "AFTER UPDATE OF text, group_id ON posts_post "
+    "BEGIN "
+    " DELETE FROM posts_post_fts WHERE rowid = old.id;"
+    " INSERT INTO posts_post_fts (rowid, text, group_title) VALUES ("
+    "  new.id, new.text,"
+    "  (SELECT title FROM posts_group WHERE id = new.group_id));"
+    "END",
+    "CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post "
+    "BEGIN "
+    " DELETE FROM posts_post_fts WHERE rowid = old.id;"
+    "END",
+    "CREATE TRIGGER posts_group_fts_update "
+    "AFTER UPDATE OF title ON posts_group "
+    "BEGIN "
+    " UPDATE posts_post_fts SET group_title = new.title"
+    " WHERE rowid IN (SELECT id FROM posts_post WHERE group_id = new.id);"
+    "END",
+]
+
+
+def column():
+    field = FIELD.clone()
+    field.set_attributes_from_name('updated')
+    return field
+
+
+# Как в 0013: колонка добавляется на месте, без пересоздания таблицы
+# и триггеров поиска. Старые посты считаются изменёнными в день
+# публикации.
+def add_column(apps, schema_editor):
+    model = apps.get_model('posts', 'Post')
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            'ALTER TABLE posts_post ADD COLUMN updated datetime '
+            "NOT NULL DEFAULT '1970-01-01 00:00:00'")
+    else:
+        field = column()
+        field.default = '1970-01-01 00:00:00'
+        schema_editor.add_field(model, field)
+    schema_editor.execute('UPDATE posts_post SET updated = pub_date')
+
+
+def drop_column(apps, schema_editor):
+    model = apps.get_model('posts', 'Post')
+    # DROP COLUMN есть в SQLite с 3.35. В старых версиях таблица
+    # пересоздаётся, и на это время триггеры поиска удаляются.
+    if (schema_editor.connection.vendor == 'sqlite'
+            and sqlite3.sqlite_version_info >= (3, 35)):
+        schema_editor.execute('ALTER TABLE posts_post DROP COLUMN updated')
+    else:
+        # При откате поля в состоянии моделей уже нет, а remove_field
+        # ищет его в модели.
+        field = column()
+        model.add_to_class(field.name, field)
+        sqlite = schema_editor.connection.vendor == 'sqlite'
+        for statement in DROP_TRIGGERS if sqlite else []:
+            schema_editor.execute(statement)
+        schema_editor.remove_field(model, field)
+        for statement in CREATE_TRIGGERS if sqlite else []:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_image_ready'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(add_column, drop_column),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='post',
+                    name='updated',
+                    field=FIELD,
+                ),
+            ],
+        ),
+    ]
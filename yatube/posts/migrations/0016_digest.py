@@ -0,0 +1,28 @@
+# Generated by Django 2.2.6 on 2026-10-18 18:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_trendingpost'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Digest',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('since', models.DateTimeField(verbose_name='Посты после')),
+                ('until', models.DateTimeField(verbose_name='Посты до')),
+                ('last_user', models.PositiveIntegerField(default=0, verbose_name='Последний получатель')),
+                ('emails', models.PositiveIntegerField(default=0, verbose_name='Отправлено писем')),
+                ('finished', models.BooleanField(default=False, verbose_name='Закончена')),
+            ],
+            options={
+                'verbose_name': 'Рассылка о новых постах',
+                'verbose_name_plural': 'Рассылки о новых постах',
+            },
+        ),
+    ]
@@ -33,16 +33,27 @@ class Post(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    # По дате изменения и id запоминается HTML карточки поста
+    # (posts.templatetags.post_cards).
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
+    # Вместо отдельных индексов внешних ключей работают составные
+    # индексы из Meta: по ним же считаются валидаторы лент
+    # (core.conditional) без чтения таблицы.
     author = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
         null=True,
-        related_name='posts'
+        related_name='posts',
+        db_index=False
     )
     group = models.ForeignKey(
         Group,
         blank=True,
         null=True,
+        db_index=False,
         on_delete=models.SET_NULL,
         related_name='order_group_posts',
         verbose_name='Группа',
@@ -53,12 +64,38 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    # Загруженная картинка уменьшается и очищается от метаданных
+    # в фоне (posts.images.schedule); до тех пор в лентах заглушка.
+    image_ready = models.BooleanField(
+        'Картинка обработана',
+        default=True,
+        editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
 
-
-class Meta:
-    ordering = ('pub_date',)
-    verbose_name = 'Пост'
-    verbose_name_plural = 'Посты'
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Пост'
+        verbose_name_plural = 'Посты'
+        # Ленты группы и автора читаются по индексу в обратном
+        # порядке, без сортировки во временном B-дереве. Индексы
+        # по возрастанию: id в конце индекса SQLite тоже хранит по
+        # возрастанию, и только так обратный проход даёт порядок
+        # (pub_date DESC, id DESC), нужный курсорам.
+        indexes = [
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', 'pub_date'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text
@@ -68,7 +105,8 @@ class Comment(CreatedModel):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
-        related_name='comments'
+        related_name='comments',
+        db_index=False
     )
     author = models.ForeignKey(
         User,
@@ -80,6 +118,14 @@ class Comment(CreatedModel):
         help_text='Введите текст комментария'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.text
 
@@ -110,3 +156,157 @@ class Follow(models.Model):
                 name='unique_users'
             ),
         ]
+        # Индекс (user, author) создаёт ограничение unique_users;
+        # подписчики автора ищутся по обратному.
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок пользователя.
+
+    Записи создаются при публикации поста (fan-out on write),
+    поэтому лента подписок читается без соединения Follow и Post.
+    Дата поста копируется в запись: лента листается по индексу
+    (user, pub_date, post) без сортировки.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'
+            ),
+        ]
+
+
+class TrendingPost(models.Model):
+    """Оценка поста в ленте «Популярное» (posts.trending).
+
+    Растёт при публикации поста и каждом комментарии; команда
+    rebuild_trending пересчитывает оценки по событиям последних
+    TRENDING_WINDOW секунд и убирает затихшие посты.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending'
+    )
+    score = models.FloatField('Оценка')
+    updated = models.DateTimeField('Последнее событие')
+
+    class Meta:
+        verbose_name = 'Популярный пост'
+        verbose_name_plural = 'Популярные посты'
+        # Лента читается по индексу в порядке (score, post) от конца.
+        indexes = [
+            models.Index(
+                fields=['score', 'post'],
+                name='trending_score_post_idx'
+            ),
+        ]
+
+
+class Digest(models.Model):
+    """Рассылка писем о новых постах подписчикам (posts.digests).
+
+    Охватывает посты, опубликованные в промежутке (since, until].
+    Подписчики обходятся по возрастанию id, и last_user — последний,
+    кому письмо уже отправлено: прерванная рассылка продолжается с
+    него, а не начинается заново.
+    """
+    since = models.DateTimeField('Посты после')
+    until = models.DateTimeField('Посты до')
+    last_user = models.PositiveIntegerField(
+        'Последний получатель', default=0)
+    emails = models.PositiveIntegerField('Отправлено писем', default=0)
+    finished = models.BooleanField('Закончена', default=False)
+
+    class Meta:
+        verbose_name = 'Рассылка о новых постах'
+        verbose_name_plural = 'Рассылки о новых постах'
+
+
+class Profile(models.Model):
+    """Счётчики автора, которые поддерживаются при записи.
+
+    Позволяют выводить число постов и подписок без COUNT-запросов;
+    расхождения исправляет команда recount_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='profile'
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'Число подписок',
+        default=0
+    )
+    # Посты автора не раскладываются по лентам подписчиков, а
+    # подмешиваются при чтении (posts.timeline).
+    fan_in = models.BooleanField(
+        'Посты подмешиваются при чтении ленты',
+        default=False,
+        editable=False
+    )
+
+    class Meta:
+        verbose_name = 'Профиль'
+        verbose_name_plural = 'Профили'
+
+    def __str__(self):
+        return self.user.username
+
+
+class ImportedRecord(models.Model):
+    """Соответствие id записи на старой платформе и id у нас.
+
+    Заполняется командой import_data: по нему переводятся внешние
+    ключи импортируемых строк и пропускаются уже импортированные.
+    """
+    source = models.CharField('Источник', max_length=50)
+    model = models.CharField('Модель', max_length=50)
+    source_id = models.CharField('Id в источнике', max_length=64)
+    object_id = models.PositiveIntegerField('Id записи')
+
+    class Meta:
+        verbose_name = 'Импортированная запись'
+        verbose_name_plural = 'Импортированные записи'
+        constraints = [
+            UniqueConstraint(
+                fields=['source', 'model', 'source_id'],
+                name='unique_imported_record'
+            ),
+        ]
+
+    def __str__(self):
+        return '%s:%s:%s' % (self.source, self.model, self.source_id)
@@ -0,0 +1,181 @@
+"""Полнотекстовый поиск по постам.
+
+На SQLite поиск идёт по индексу FTS5 posts_post_fts (миграция
+0009) с текстом поста и названием группы. Результаты упорядочены
+по релевантности bm25 и листаются курсорами по (rank, id), так что
+глубокие страницы стоят столько же, сколько первая. На других СУБД
+индекса нет, и поиск сводится к LIKE с пагинацией по дате.
+
+Индекс поддерживают триггеры из 0009. Миграция, которая в SQLite
+пересоздаёт таблицу posts_post или posts_group (AlterField и многие
+другие операции), с ними не проходит: она должна сама удалить их
+перед операцией и создать заново после, со своей копией SQL, как
+0013. Если триггеры всё же потеряны, после каждого migrate
+restore_index() создаёт недостающие и перестраивает индекс.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from core.paginators import CursorPaginator
+from .models import Post
+
+MATCH_SQL = 'SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s'
+# Те же триггеры, что создаёт миграция 0009.
+TRIGGERS = {
+    'posts_post_fts_insert':
+        "CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post "
+        "BEGIN "
+        " INSERT INTO posts_post_fts (rowid, text, group_title) VALUES ("
+        "  new.id, new.text,"
+        "  (SELECT title FROM posts_group WHERE id = new.group_id));"
+        "END",
+    'posts_post_fts_update':
+        "CREATE TRIGGER posts_post_fts_update "
+        "AFTER UPDATE OF text, group_id ON posts_post "
+        "BEGIN "
+        " DELETE FROM posts_post_fts WHERE rowid = old.id;"
+        " INSERT INTO posts_post_fts (rowid, text, group_title) VALUES ("
+        "  new.id, new.text,"
+        "  (SELECT title FROM posts_group WHERE id = new.group_id));"
+        "END",
+    'posts_post_fts_delete':
+        "CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post "
+        "BEGIN "
+        " DELETE FROM posts_post_fts WHERE rowid = old.id;"
+        "END",
+    'posts_group_fts_update':
+        "CREATE TRIGGER posts_group_fts_update "
+        "AFTER UPDATE OF title ON posts_group "
+        "BEGIN "
+        " UPDATE posts_post_fts SET group_title = new.title"
+        " WHERE rowid IN (SELECT id FROM posts_post WHERE group_id = new.id);"
+        "END",
+}
+REINDEX = (
+    'DELETE FROM posts_post_fts',
+    'INSERT INTO posts_post_fts (rowid, text, group_title) '
+    'SELECT p.id, p.text, g.title FROM posts_post p '
+    'LEFT JOIN posts_group g ON g.id = p.group_id',
+)
+
+
+def has_index():
+    return connection.vendor == 'sqlite'
+
+
+def missing_triggers(using=DEFAULT_DB_ALIAS):
+    """Триггеры индекса, которых нет в базе using."""
+    db = connections[using]
+    if db.vendor != 'sqlite':
+        return []
+    with db.cursor() as cursor:
+        if 'posts_post_fts' not in db.introspection.table_names(cursor):
+            # Миграция 0009 ещё не применена или отменена.
+            return []
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        existing = {name for name, in cursor.fetchall()}
+    return [name for name in TRIGGERS if name not in existing]
+
+
+def restore_index(using=DEFAULT_DB_ALIAS):
+    """Создаёт потерянные триггеры и перестраивает индекс.
+
+    Пока триггеров не было, индекс мог разойтись с постами. Возвращает
+    имена созданных триггеров.
+    """
+    missing = missing_triggers(using)
+    if missing:
+        with transaction.atomic(using), \
+                connections[using].cursor() as cursor:
+            for name in missing:
+                cursor.execute(TRIGGERS[name])
+            for statement in REINDEX:
+                cursor.execute(statement)
+    return missing
+
+
+def match_expression(query):
+    """Запрос пользователя в синтаксисе FTS5.
+
+    Каждое слово берётся в кавычки, чтобы операторы FTS5 в тексте
+    запроса не давали синтаксических ошибок, и ищется как префикс:
+    «пост» находит и «посты», и «постов».
+    """
+    return ' '.join(
+        '"%s"*' % term.replace('"', '""') for term in query.split())
+
+
+def filter_posts(queryset, query):
+    """Посты queryset, подходящие под запрос, без ранжирования."""
+    if not query.split():
+        return queryset.none()
+    if has_index():
+        return queryset.filter(
+            pk__in=RawSQL(MATCH_SQL, (match_expression(query),)))
+    condition = Q()
+    for term in query.split():
+        condition &= (
+            Q(text__icontains=term) | Q(group__title__icontains=term))
+    return queryset.filter(condition)
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсорная пагинация результатов FTS5 по (rank, id).
+
+    rank в FTS5 меньше у более релевантных документов, поэтому
+    сортировка по возрастанию. Страница читается из индекса одним
+    запросом, посты загружаются вторым по списку id.
+    """
+
+    def __init__(self, query, per_page):
+        super().__init__(
+            Post.objects.select_related('author', 'group'), per_page,
+            ordering=('rank', 'pk'))
+        self.match = match_expression(query)
+
+    def _model_field(self, name):
+        if name == 'rank':
+            return FloatField()
+        return super()._model_field(name)
+
+    def _slice(self, cursor, reverse, limit):
+        sql = MATCH_SQL.replace('rowid', 'rowid, rank', 1)
+        params = [self.match]
+        if cursor:
+            rank, pk = self.decode_cursor(cursor)
+            lookup = '<' if reverse else '>'
+            sql += ' AND (rank %s %%s OR (rank = %%s AND rowid %s %%s))' % (
+                lookup, lookup)
+            params += [rank, rank, pk]
+        direction = 'DESC' if reverse else 'ASC'
+        sql += ' ORDER BY rank %s, rowid %s LIMIT %%s' % (
+            direction, direction)
+        params.append(limit)
+        with connection.cursor() as db:
+            db.execute(sql, params)
+            ranks = dict(db.fetchall())
+        posts = self.object_list.in_bulk(list(ranks))
+        objects = []
+        for pk, rank in ranks.items():
+            # Пост мог быть удалён между двумя запросами.
+            if pk in posts:
+                posts[pk].rank = rank
+                objects.append(posts[pk])
+        return objects
+
+
+def get_search_page(request, query):
+    """Страница результатов поиска по запросу query."""
+    if has_index():
+        paginator = SearchPaginator(query, settings.NUMBER_OF_POSTS_ON_PAGE)
+    else:
+        paginator = CursorPaginator(
+            filter_posts(Post.objects.select_related('author', 'group'),
+                         query),
+            settings.NUMBER_OF_POSTS_ON_PAGE)
+    return paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before')
+    )
@@ -0,0 +1,296 @@
+"""Синтетические данные для нагрузочных замеров (команда seed).
+
+Набор воспроизводим: при том же --seed и тех же размерах получаются
+те же строки. Распределения похожи на настоящие: авторов постов и
+подписок и посты для комментариев выбирают по закону Ципфа. Поэтому
+у нескольких авторов тысячи подписчиков (их посты подмешиваются в
+ленты при чтении, см. posts.timeline), а у нескольких «горячих»
+постов сотни комментариев. У большинства остальных почти ничего нет.
+Картинки берутся из небольшого набора: content-addressed хранилище
+(core.storage) хранит каждую один раз и считает ссылки на неё.
+
+Строки пишутся порциями через executemany, каждая порция — в своей
+транзакции. Сигналы при этом не вызываются, поэтому профили,
+счётчики, ленты подписок и «Популярное» заполняются после вставки
+пакетно, как в posts.importer.
+"""
+import random
+from collections import Counter, defaultdict
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F, Max
+from django.utils import timezone
+from PIL import Image, ImageDraw
+from sorl.thumbnail.images import ImageFile
+
+from core.cache import bump
+from core.models import MediaFile
+from . import timeline, trending
+from .counters import (
+    create_missing_profiles, recount_posts, recount_profiles
+)
+from .images import generate_variants
+from .importer import batches
+from .models import (
+    Comment, Follow, Group, Post, Profile, TimelineEntry, User
+)
+
+PLAIN_TYPES = {
+    'AutoField', 'BooleanField', 'CharField', 'FileField', 'ForeignKey',
+    'IntegerField', 'PositiveIntegerField', 'SlugField', 'TextField',
+}
+# Имена созданных пользователей и адреса групп начинаются с него.
+PREFIX = 'seed_'
+WORDS = (
+    'пост', 'лента', 'друзья', 'город', 'утро', 'вечер', 'море', 'кофе',
+    'книга', 'фото', 'дорога', 'работа', 'проект', 'идея', 'погода',
+    'концерт', 'кино', 'спорт', 'лес', 'горы', 'код', 'релиз', 'кот',
+    'сегодня', 'вчера', 'завтра', 'наконец', 'очень', 'новый', 'старый',
+    'хороший', 'интересный', 'быстро', 'медленно', 'снова', 'впервые',
+)
+
+
+def zipf(count, exponent):
+    """Накопленные веса рангов 1..count для random.choices."""
+    return list(accumulate(
+        rank ** -exponent for rank in range(1, count + 1)))
+
+
+class Seeder:
+    def __init__(self, seed=0, chunk_size=5000, exponent=1.1, days=365):
+        self.random = random.Random(seed)
+        self.chunk_size = chunk_size
+        self.exponent = exponent
+        self.end = timezone.now()
+        self.start = self.end - timedelta(days=days)
+        self.stats = Counter()
+
+    def exists(self):
+        return User.objects.filter(username__startswith=PREFIX).exists()
+
+    def text(self, low, high):
+        words = self.random.choices(WORDS, k=self.random.randint(low, high))
+        return ' '.join(words).capitalize() + '.'
+
+    def ranked(self, ids):
+        """Id в случайном порядке популярности и веса для выбора."""
+        ids = list(ids)
+        self.random.shuffle(ids)
+        return ids, zipf(len(ids), self.exponent)
+
+    def insert(self, model, rows):
+        """Вставляет строки-словари {attname: значение} порциями.
+
+        То же, что bulk_create, но без объектов моделей: на миллионах
+        строк их создание и компиляция INSERT занимали большую часть
+        времени. Недостающие значения берутся по умолчанию.
+        """
+        quote = connection.ops.quote_name
+        fields = [
+            field for field in model._meta.concrete_fields
+            if not field.primary_key
+        ]
+        sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+            quote(model._meta.db_table),
+            ', '.join(quote(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields)))
+        # Числа и строки SQLite принимает как есть; поля остальных
+        # типов (даты) готовят значение сами.
+        prepare = [
+            None if field.get_internal_type() in PLAIN_TYPES
+            else field.get_db_prep_save for field in fields
+        ]
+        for batch in batches(rows, self.chunk_size):
+            params = []
+            for row in batch:
+                values = []
+                for field, prepare_value in zip(fields, prepare):
+                    value = (row[field.attname] if field.attname in row
+                             else field.get_default())
+                    if prepare_value is not None:
+                        value = prepare_value(value, connection)
+                    values.append(value)
+                params.append(values)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, params)
+            self.stats[model._meta.label_lower] += len(batch)
+
+    def new_ids(self, model, create):
+        """Создаёт строки и возвращает их id по возрастанию."""
+        last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        create()
+        return list(model.objects.filter(pk__gt=last).order_by(
+            'pk').values_list('pk', flat=True))
+
+    def run(self, users, groups, posts, comments, follows, images,
+            image_share):
+        password = make_password(None)
+        user_ids = self.new_ids(User, lambda: self.insert(User, (
+            dict(username='%s%d' % (PREFIX, number), password=password)
+            for number in range(users))))
+        group_ids = self.new_ids(Group, lambda: self.insert(Group, (
+            dict(
+                title='Группа %d' % number,
+                slug='%s%d' % (PREFIX.replace('_', '-'), number),
+                description=self.text(5, 30))
+            for number in range(groups))))
+        followers = self.follow(user_ids, follows)
+        pool = self.images(images)
+        post_ids = self.new_ids(Post, lambda: self.publish(
+            user_ids, group_ids, posts, pool, image_share))
+        self.comment(user_ids, post_ids, comments)
+        self.count_images(pool)
+        self.finish(user_ids, post_ids, followers)
+
+    def follow(self, user_ids, mean):
+        """Подписки: у каждого их число с тяжёлым хвостом, авторы —
+        по Ципфу. Возвращает подписчиков каждого автора."""
+        authors, weights = self.ranked(user_ids)
+        followers = defaultdict(list)
+        limit = len(user_ids) - 1
+
+        def rows():
+            for user_id in user_ids:
+                # Среднее распределения Парето с alpha=2 равно 2.
+                wanted = min(limit, int(
+                    self.random.paretovariate(2) * mean / 2))
+                chosen = set(self.random.choices(
+                    authors, cum_weights=weights, k=wanted))
+                chosen.discard(user_id)
+                for author_id in sorted(chosen):
+                    followers[author_id].append(user_id)
+                    yield dict(user_id=user_id, author_id=author_id)
+
+        if limit > 0:
+            self.insert(Follow, rows())
+        return followers
+
+    def images(self, count):
+        """Несколько разных картинок с готовыми копиями для srcset."""
+        names = []
+        for number in range(count):
+            image = Image.new('RGB', (1200, 800), self.color())
+            draw = ImageDraw.Draw(image)
+            for _ in range(12):
+                left = self.random.randrange(1100)
+                top = self.random.randrange(700)
+                draw.rectangle(
+                    (left, top, left + self.random.randrange(50, 400),
+                     top + self.random.randrange(50, 300)),
+                    fill=self.color())
+            output = BytesIO()
+            image.save(output, 'JPEG', quality=settings.POST_IMAGE_QUALITY)
+            name = default_storage.save(
+                'posts/%s%d.jpg' % (PREFIX, number),
+                ContentFile(output.getvalue()))
+            # Копии ищутся по хранилищу исходника, как у post.image.
+            generate_variants(ImageFile(name, default_storage))
+            names.append(name)
+        return Counter({name: 0 for name in names})
+
+    def color(self):
+        return tuple(self.random.randrange(256) for _ in range(3))
+
+    def date(self, index, total):
+        """Дата index-го из total событий, равномерно по периоду."""
+        step = (self.end - self.start) / max(total, 1)
+        return self.start + step * (index + self.random.random())
+
+    def publish(self, user_ids, group_ids, total, pool, image_share):
+        authors, author_weights = self.ranked(user_ids)
+        groups, group_weights = self.ranked(group_ids)
+        names = sorted(pool)
+
+        def rows():
+            for number in range(total):
+                image = ''
+                if names and self.random.random() < image_share:
+                    image = self.random.choice(names)
+                    pool[image] += 1
+                group_id = None
+                if groups and self.random.random() < 0.7:
+                    group_id = self.random.choices(
+                        groups, cum_weights=group_weights)[0]
+                row = dict(
+                    author_id=self.random.choices(
+                        authors, cum_weights=author_weights)[0],
+                    group_id=group_id,
+                    text=self.text(5, 60),
+                    image=image,
+                    pub_date=self.date(number, total))
+                row['updated'] = row['pub_date']
+                yield row
+
+        self.insert(Post, rows())
+
+    def comment(self, user_ids, post_ids, total):
+        # Посты идут по возрастанию даты, и комментарий к посту
+        # пишется между его публикацией и концом периода.
+        index = {post_id: number for number, post_id in enumerate(post_ids)}
+        hot, weights = self.ranked(post_ids)
+        span = self.end - self.start
+
+        def rows():
+            for _ in range(total):
+                post_id = self.random.choices(hot, cum_weights=weights)[0]
+                published = self.start + span * (
+                    (index[post_id] + 1) / len(post_ids))
+                yield dict(
+                    post_id=post_id,
+                    author_id=self.random.choice(user_ids),
+                    text=self.text(2, 25),
+                    created=published + (
+                        self.end - published) * self.random.random())
+
+        if post_ids:
+            self.insert(Comment, rows())
+
+    def count_images(self, pool):
+        # save() уже добавил по одной ссылке на каждую картинку.
+        for name, uses in pool.items():
+            if uses:
+                MediaFile.objects.filter(name=name).update(
+                    references=F('references') + uses - 1)
+            else:
+                default_storage.delete(name)
+        self.stats['core.mediafile'] = sum(1 for uses in pool.values() if uses)
+
+    def finish(self, user_ids, post_ids, followers):
+        """Делает за сигналы то, что они сделали бы для каждой строки."""
+        for users in batches(user_ids, self.chunk_size):
+            with transaction.atomic():
+                create_missing_profiles(
+                    User.objects.filter(pk__gte=users[0], pk__lte=users[-1]))
+                recount_profiles(Profile.objects.filter(
+                    user__gte=users[0], user__lte=users[-1]))
+        for posts in batches(post_ids, self.chunk_size):
+            with transaction.atomic():
+                recount_posts(Post.objects.filter(
+                    pk__gte=posts[0], pk__lte=posts[-1]))
+            trending.rebuild(posts[0], posts[-1] + 1)
+        Profile.objects.filter(
+            followers_count__gte=settings.TIMELINE_FANOUT_LIMIT
+        ).update(fan_in=True)
+        self.insert(TimelineEntry, self.timeline(followers))
+        timeline.trim_timelines()
+        bump('index', 'groups')
+
+    def timeline(self, followers):
+        # То же, что timeline.backfill для каждой подписки, но по
+        # одному запросу на автора. Популярных авторов в лентах нет.
+        for author_id, users in sorted(followers.items()):
+            if len(users) >= settings.TIMELINE_FANOUT_LIMIT:
+                continue
+            recent = Post.objects.filter(author=author_id).order_by(
+                '-pub_date').values_list('pk', 'pub_date')
+            for post_id, pub_date in recent[:settings.TIMELINE_BACKFILL]:
+                for user_id in users:
+                    yield dict(
+                        user_id=user_id, post_id=post_id, pub_date=pub_date)
@@ -0,0 +1,226 @@
+import threading
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from core.cache import bump
+from . import digests, timeline, trending
+from .counters import change
+from .lookups import groups, users
+from .models import Comment, Follow, Group, Post, Profile, User
+from .utils import feed_scopes
+
+# id постов, которые сейчас удаляются в этом потоке. Их комментарии
+# удаляются каскадом, и менять счётчик и кэш поста для каждого из
+# них незачем: пост и так пропадает из лент.
+_deleting = threading.local()
+
+
+def deleting_posts():
+    if not hasattr(_deleting, 'posts'):
+        _deleting.posts = set()
+    return _deleting.posts
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def schedule_digest(sender, instance, created, raw=False, **kwargs):
+    # Подписчики узнают о посте из ближайшей рассылки posts.digests.
+    if created and not raw:
+        digests.schedule()
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change(Profile.objects.filter(user=instance.author_id),
+               'posts_count', 1)
+
+
+@receiver(post_save, sender=Post)
+def rank_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.record(
+            instance.pk, settings.TRENDING_POST_WEIGHT, instance.pub_date)
+
+
+@receiver(pre_delete, sender=Post)
+def mark_deleting_post(sender, instance, **kwargs):
+    # Сигналы pre_delete приходят до удаления комментариев.
+    deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def unmark_deleting_post(sender, instance, **kwargs):
+    # Комментарии удаляются раньше поста.
+    deleting_posts().discard(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    change(Profile.objects.filter(user=instance.author_id),
+           'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change(Post.objects.filter(pk=instance.post_id),
+               'comments_count', 1)
+
+
+@receiver(post_save, sender=Comment)
+def rank_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.record(
+            instance.post_id, settings.TRENDING_COMMENT_WEIGHT,
+            instance.created)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    if instance.post_id in deleting_posts():
+        return
+    change(Post.objects.filter(pk=instance.post_id), 'comments_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change(Profile.objects.filter(user=instance.author_id),
+               'followers_count', 1)
+        change(Profile.objects.filter(user=instance.user_id),
+               'following_count', 1)
+        timeline.promote(instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    change(Profile.objects.filter(user=instance.author_id),
+           'followers_count', -1)
+    change(Profile.objects.filter(user=instance.user_id),
+           'following_count', -1)
+    timeline.demote(instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous(sender, instance, raw=False, **kwargs):
+    # Пост, перенесённый в другую группу, пропадает из ленты
+    # прежней группы, и её кэш тоже надо сбросить. Заменённая
+    # картинка освобождается после сохранения.
+    instance._previous_group_id = None
+    instance._previous_image = ''
+    if instance.pk is not None and not raw:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group', 'image').first() or (None, ''))
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, raw=False, **kwargs):
+    # Хранилище считает ссылки (core.storage): файл удалится, только
+    # если его не использует другой пост.
+    previous = getattr(instance, '_previous_image', '')
+    if previous and previous != instance.image.name and not raw:
+        default_storage.delete(previous)
+    instance._previous_image = instance.image.name
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    if instance.image:
+        instance.image.delete(save=False)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, **kwargs):
+    bump(*feed_scopes(
+        instance, getattr(instance, '_previous_group_id', None)))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_feeds(sender, instance, **kwargs):
+    if instance.post_id in deleting_posts():
+        return
+    # В карточках постов выводится число комментариев.
+    bump(*feed_scopes(instance.post))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_profiles(sender, instance, **kwargs):
+    # На странице профиля выводятся число подписчиков и подписок.
+    bump('profile:%s' % instance.author_id, 'profile:%s' % instance.user_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_feeds(sender, instance, **kwargs):
+    bump('groups', 'group:%s' % instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_lookups(sender, instance, **kwargs):
+    groups.invalidate()
+
+
+@receiver(post_save, sender=User)
+@receiver(pre_delete, sender=User)
+def invalidate_user_pages(sender, instance, created=False,
+                          update_fields=None, **kwargs):
+    # Имя автора выводится на его постах в лентах и на странице
+    # профиля, и сохранённые страницы (core.page_cache) устаревают.
+    # При удалении посты ещё не отвязаны от автора.
+    if created:
+        return
+    if update_fields is not None and not set(update_fields) & {
+            'username', 'first_name', 'last_name'}:
+        return
+    groups = Post.objects.filter(
+        author=instance.pk, group__isnull=False
+    ).order_by().values_list('group', flat=True).distinct()
+    bump('index', 'trending', 'profile:%s' % instance.pk,
+         *('group:%s' % group for group in groups))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_lookups(sender, instance, created=False,
+                            update_fields=None, **kwargs):
+    # Нового пользователя в кэше нет: неудачный поиск не запоминается.
+    if created:
+        return
+    # Вход пользователя сохраняет только last_login: страницы его не
+    # выводят, и сбрасывать кэш всех процессов на каждый вход незачем.
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    users.invalidate()
@@ -0,0 +1,79 @@
+"""Карточки постов в лентах.
+
+Все ленты выводят карточку includes/post_card.html тегом
+{% post_cards page_obj %}. HTML карточки запоминается в кэше по id
+поста и его версии: дате изменения и тому, что видно в карточке и
+меняется без Post.save(), — числу комментариев, картинке, именам
+автора, адресу и названию группы. Ключи всех карточек страницы
+читаются одним get_many, так что новый пост в ленте перерисовывает
+только себя.
+
+Карточка рендерится без запроса и одинакова для всех. Кнопка правки
+у каждого своя: в карточке на её месте метка фрагмента post_actions
+(core.page_cache). На страницах под cache_page метки заполняет кэш
+страниц, на остальных — сам тег.
+"""
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from core.cache import count
+from core.conditional import make_etag
+from core.page_cache import is_punching, marker, punch
+
+CARD_KEY = 'post_card:%s:%s'
+SEPARATOR = '\n<hr>\n'
+
+register = template.Library()
+
+
+def card_key(post):
+    author = post.author if post.author_id else None
+    version = make_etag(
+        post.updated.isoformat(),
+        str(post.comments_count),
+        post.image.name or '',
+        str(post.image_ready),
+        author.username if author else '',
+        author.get_full_name() if author else '',
+        post.group.slug if post.group_id else '',
+        post.group.title if post.group_id else '',
+    )
+    return CARD_KEY % (post.pk, version.strip('"'))
+
+
+def render_card(post, card=None):
+    if card is None:
+        card = get_template('includes/post_card.html')
+    return card.render({
+        'post': post,
+        'actions': mark_safe(
+            marker('post_actions', (post.pk, post.author_id))),
+    })
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """Карточки постов, разделённые <hr>."""
+    posts = list(posts)
+    keys = [card_key(post) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {}
+    if len(cards) < len(keys):
+        card = get_template('includes/post_card.html')
+        missing = {
+            key: render_card(post, card)
+            for key, post in zip(keys, posts) if key not in cards
+        }
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_TIMEOUT)
+        cards.update(missing)
+    count('post_card', 'hit', len(keys) - len(missing))
+    count('post_card', 'miss', len(missing))
+    html = SEPARATOR.join(cards[key] for key in keys)
+    request = context['request']
+    if not is_punching(request):
+        html = punch(request, html)
+    return mark_safe(html)
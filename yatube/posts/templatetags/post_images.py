@@ -0,0 +1,33 @@
+import logging
+
+from django import template
+
+from ..images import get_variants, srcset
+
+logger = logging.getLogger(__name__)
+register = template.Library()
+
+
+@register.inclusion_tag('includes/post_image.html')
+def post_image(post, sizes='100vw'):
+    """Адаптивная картинка поста: WebP и JPEG разной ширины."""
+    if not post.image:
+        return {}
+    if not post.image_ready:
+        return {'processing': True}
+    try:
+        webp = get_variants(post.image, 'WEBP')
+        jpeg = get_variants(post.image, 'JPEG')
+        # Средняя копия служит запасным src и задаёт пропорции.
+        fallback = jpeg[len(jpeg) // 2]
+        return {
+            'webp_srcset': srcset(webp),
+            'jpeg_srcset': srcset(jpeg),
+            'sizes': sizes,
+            'src': fallback.url,
+            'width': fallback.width,
+            'height': fallback.height,
+        }
+    except Exception:
+        logger.exception('Не удалось вывести картинку поста %s', post.pk)
+        return {}
@@ -0,0 +1,147 @@
+import time
+from http import HTTPStatus
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Сколько SQL-запросов стоит ответ 304: сессия, пользователь и
+# объекты страницы (группа, автор и подписка на него, пост).
+# Валидатор к базе не обращается.
+NOT_MODIFIED_BUDGETS = {
+    'index': 2,
+    'group_list': 3,
+    'profile': 4,
+    'post_detail': 3,
+}
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание'
+        )
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Тестовый пост')
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.urls = {
+            'index': reverse('posts:index'),
+            'group_list': reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': 'author'}),
+            'post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.pk}),
+        }
+
+    def revalidate(self, url, response):
+        return self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_page_is_not_modified(self):
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertIn('Last-Modified', response)
+                with CaptureQueriesContext(connection) as context:
+                    repeated = self.revalidate(url, response)
+                self.assertEqual(
+                    repeated.status_code, HTTPStatus.NOT_MODIFIED)
+                self.assertEqual(repeated.content, b'')
+                self.assertLessEqual(
+                    len(context), NOT_MODIFIED_BUDGETS[name])
+                repeated = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(
+                    repeated.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def edit_post(self):
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+
+    def add_comment(self):
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+
+    def add_post(self):
+        Post.objects.create(
+            author=self.author, group=self.group, text='Новый пост')
+
+    def test_changes_invalidate_etag(self):
+        changes = {
+            self.edit_post: self.urls,
+            self.add_comment: self.urls,
+            # Страница поста не выводит другие посты.
+            self.add_post: [
+                name for name in self.urls if name != 'post_detail'],
+        }
+        for change, names in changes.items():
+            responses = {
+                name: self.client.get(self.urls[name]) for name in names
+            }
+            change()
+            for name in names:
+                with self.subTest(change=change.__name__, name=name):
+                    self.assertEqual(self.revalidate(
+                        self.urls[name], responses[name]).status_code,
+                        HTTPStatus.OK)
+
+    def test_follow_changes_profile_etag(self):
+        url = self.urls['profile']
+        response = self.client.get(url)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            self.revalidate(url, response).status_code, HTTPStatus.OK)
+
+    def test_etag_depends_on_user(self):
+        url = self.urls['index']
+        response = self.client.get(url)
+        self.assertEqual(
+            Client().get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            .status_code, HTTPStatus.OK)
+
+    def test_validator_does_not_query_rows(self):
+        for name, url in self.urls.items():
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(url)
+            with self.subTest(name=name):
+                self.assertFalse([
+                    query['sql'] for query in context.captured_queries
+                    if 'COUNT(' in query['sql'] or 'MAX(' in query['sql']
+                ])
+
+    def test_if_modified_since_sees_edits_and_deletes(self):
+        older = self.post
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Новый пост')
+        changes = {
+            'edit': lambda: Post.objects.get(pk=older.pk).save(),
+            'delete': lambda: Post.objects.filter(pk=older.pk).delete(),
+        }
+        url = self.urls['index']
+        later = time.time()
+        for change, apply_change in changes.items():
+            response = self.client.get(url)
+            # Last-Modified точен до секунды: правка — позже.
+            later += 10
+            with patch('core.cache.time.time', return_value=later):
+                apply_change()
+            with self.subTest(change=change):
+                self.assertEqual(self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                ).status_code, HTTPStatus.OK)
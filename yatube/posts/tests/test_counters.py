@@ -0,0 +1,85 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Post, Profile
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def profile(self, user):
+        return Profile.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        self.author_client.post(
+            reverse('posts:create_post'), {'text': 'Тестовый пост'})
+        post = Post.objects.get()
+        self.reader_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'Комментарий'}
+        )
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'author'}))
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.profile(self.author).posts_count, 1)
+        self.assertEqual(self.profile(self.author).followers_count, 1)
+        self.assertEqual(self.profile(self.reader).following_count, 1)
+
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'author'}))
+        Comment.objects.all().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.profile(self.author).followers_count, 0)
+        self.assertEqual(self.profile(self.reader).following_count, 0)
+        post.delete()
+        self.assertEqual(self.profile(self.author).posts_count, 0)
+
+    def delete_queries(self, comments):
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.bulk_create([
+            Comment(post=post, author=self.reader, text='Комментарий')
+            for _ in range(comments)
+        ])
+        with CaptureQueriesContext(connection) as context:
+            post.delete()
+        return len(context)
+
+    def test_post_delete_skips_comment_counters(self):
+        # Комментарии удаляемого поста не трогают его счётчик и кэш.
+        single = self.delete_queries(1)
+        self.assertEqual(self.delete_queries(50), single)
+        comment = Comment.objects.create(
+            post=Post.objects.create(author=self.author, text='Пост'),
+            author=self.reader, text='Комментарий')
+        Post.objects.filter(pk=comment.post_id).update(comments_count=1)
+        comment.delete()
+        self.assertEqual(
+            Post.objects.get(pk=comment.post_id).comments_count, 0)
+
+    def test_recount_repairs_drift(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        Profile.objects.filter(user=self.author).update(posts_count=42)
+        Post.objects.update(comments_count=7)
+        Profile.objects.filter(user=self.reader).delete()
+        call_command('recount_counters', chunk_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(self.profile(self.author).posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        self.assertTrue(Profile.objects.filter(user=self.reader).exists())
@@ -0,0 +1,80 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail import get_connection
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import Task
+from core.tasks import run_batch
+from ..digests import send_digest
+from ..models import Digest, Follow, Post
+
+User = get_user_model()
+
+
+@override_settings(NOTIFICATION_DIGEST_CHUNK_SIZE=2)
+class DigestTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.other = User.objects.create_user(username='other')
+        self.followers = [
+            User.objects.create_user(
+                username='reader%d' % number,
+                email='reader%d@example.com' % number)
+            for number in range(5)
+        ]
+        for user in self.followers:
+            Follow.objects.create(user=user, author=self.author)
+        silent = User.objects.create_user(username='silent')
+        Follow.objects.create(user=silent, author=self.author)
+
+    def test_posts_share_one_scheduled_digest(self):
+        Post.objects.create(author=self.author, text='Первый пост')
+        Post.objects.create(author=self.other, text='Чужой пост')
+        self.assertEqual(
+            Task.objects.filter(name=send_digest.task_name).count(), 1)
+        self.assertEqual(mail.outbox, [])
+        Task.objects.update(run_at=timezone.now())
+        run_batch('worker')
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            [user.email for user in self.followers])
+        self.assertIn('Первый пост', mail.outbox[0].body)
+        self.assertNotIn('Чужой пост', mail.outbox[0].body)
+        self.assertTrue(Digest.objects.get().finished)
+
+    def test_digest_groups_posts_per_follower(self):
+        Post.objects.create(author=self.author, text='Первый пост')
+        Post.objects.create(author=self.author, text='Второй пост')
+        call_command('send_digests', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), len(self.followers))
+        body = mail.outbox[0].body
+        self.assertLess(body.index('Второй пост'), body.index('Первый пост'))
+        # Следующая рассылка начинается с конца этой.
+        call_command('send_digests', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), len(self.followers))
+
+    def test_interrupted_digest_resumes(self):
+        Post.objects.create(author=self.author, text='Пост')
+        calls = []
+
+        def flaky_connection():
+            calls.append(1)
+            if len(calls) == 2:
+                raise ConnectionError('Почтовый сервер недоступен')
+            return get_connection()
+
+        with patch('posts.digests.get_connection', flaky_connection):
+            with self.assertRaises(ConnectionError):
+                call_command('send_digests', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+        call_command('send_digests', stdout=StringIO())
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            [user.email for user in self.followers])
+        digest = Digest.objects.get()
+        self.assertEqual(digest.emails, len(self.followers))
@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, Profile
+
+User = get_user_model()
+
+# Таблицы, запросы к которым с ORDER BY должны читаться по индексу.
+FEED_TABLES = ('"posts_post"', '"posts_comment"', '"posts_follow"')
+
+
+class ExplainTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание'
+        )
+        # Посты популярных авторов подмешиваются в ленту подписок
+        # при чтении, одним запросом по индексу (author, pub_date).
+        popular = User.objects.create_user(username='popular')
+        Profile.objects.filter(user=popular).update(fan_in=True)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=popular)
+        for number in range(15):
+            cls.post = Post.objects.create(
+                author=cls.author, group=cls.group,
+                text='Тестовый пост %d' % number)
+            Post.objects.create(
+                author=popular, text='Популярный пост %d' % number)
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text='Комментарий')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed_queries(self, url, params=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+            # Курсорная страница загружается при рендеринге шаблона.
+            self.assertEqual(response.status_code, 200)
+        return [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+            and 'ORDER BY' in query['sql']
+            and any(table in query['sql'] for table in FEED_TABLES)
+        ]
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def is_author_window(self, plan):
+        # Посты нескольких авторов сортируются после чтения, но
+        # каждого читается только отрезок индекса по датам за
+        # курсором или в пределах страницы ленты (timeline.sources).
+        return any(
+            'post_author_pub_date_idx (author_id=? AND pub_date' in step
+            for step in plan)
+
+    def test_feeds_are_read_in_index_order(self):
+        urls = {
+            'index': reverse('posts:index'),
+            'group_list': reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': 'author'}),
+            'follow_index': reverse('posts:follow_index'),
+            'post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.pk}),
+        }
+        for name, url in urls.items():
+            first_page = self.client.get(url).context.get('page_obj')
+            pages = [None]
+            if first_page is not None and first_page.has_next():
+                pages.append({'after': first_page.next_cursor})
+            for params in pages:
+                queries = self.feed_queries(url, params)
+                self.assertTrue(queries, name)
+                for sql in queries:
+                    with self.subTest(name=name, params=params, sql=sql):
+                        plan = self.plan(sql)
+                        # Таблицы не читаются целиком.
+                        self.assertFalse([
+                            step for step in plan
+                            if step.startswith('SCAN') and 'INDEX' not in step
+                        ], plan)
+                        if self.is_author_window(plan):
+                            continue
+                        self.assertFalse([
+                            step for step in plan
+                            if 'TEMP B-TREE' in step
+                        ], plan)
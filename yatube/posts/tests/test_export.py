@@ -0,0 +1,70 @@
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post
+
+User = get_user_model()
+
+EXPORT_URL = reverse('posts:export')
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.posts = [
+            Post.objects.create(author=self.author, text='Пост %d' % number)
+            for number in range(5)
+        ]
+        Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Комментарий')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def parse(self, content):
+        return [json.loads(line) for line in content.decode().splitlines()]
+
+    def test_command_streams_all_tables(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dump.ndjson.gz')
+            stderr = StringIO()
+            call_command(
+                'export_ndjson', output=path, gzip=True, chunk_size=2,
+                stderr=stderr)
+            with gzip.open(path) as dump:
+                rows = self.parse(dump.read())
+        self.assertEqual(
+            [row['model'] for row in rows],
+            ['posts.post'] * 5 + ['posts.comment', 'posts.follow'])
+        self.assertEqual(
+            [row['id'] for row in rows[:5]],
+            [post.pk for post in self.posts])
+        self.assertEqual(rows[5]['post_id'], self.posts[0].pk)
+        self.assertIn('строк/с', stderr.getvalue())
+
+    def test_endpoint_is_staff_only(self):
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(EXPORT_URL)
+        self.assertEqual(response.status_code, 302)
+        admin = User.objects.create_user(username='admin', is_staff=True)
+        client.force_login(admin)
+        response = client.get(
+            EXPORT_URL, {'models': 'follows', 'gzip': '1'})
+        rows = self.parse(gzip.decompress(
+            b''.join(response.streaming_content)))
+        self.assertEqual(rows, [{
+            'model': 'posts.follow',
+            'id': Follow.objects.get().pk,
+            'user_id': self.reader.pk,
+            'author_id': self.author.pk,
+        }])
+        response = client.get(EXPORT_URL, {'models': 'users'})
+        self.assertEqual(response.status_code, 400)
@@ -1,18 +1,34 @@
+import hashlib
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import BytesIO
+from unittest.mock import patch
 
 from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
 
+from core.tasks import run_batch
 from .. import models
 from ..forms import PostForm
+from ..images import FORMATS, get_variants, process
 from ..models import Group, Post, Comment
 
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -40,6 +56,7 @@ class TaskCreateFormTests(TestCase):
             post=cls.post
         )
         cls.form = PostForm()
+        cache.clear()
 
     @classmethod
     def tearDownClass(cls):
@@ -89,12 +106,97 @@ class TaskCreateFormTests(TestCase):
                 text='Тестовый пост',
                 author=self.post_author,
                 group=self.group.id,
-                image='posts/small.gif'
+                # Файл называется по хэшу содержимого (core.storage)
+                image='posts/{0:.2}/{0}.gif'.format(
+                    hashlib.sha256(small_gif).hexdigest())
             ).exists()
         )
         self.assertEqual(Post.objects.latest('id').text,
                          form_data['text'])
 
+    def test_image_variants_created_on_save(self):
+        # Уменьшенные копии картинки создаются при её обработке, до
+        # которой в ленте выводится заглушка
+        uploaded = SimpleUploadedFile(
+            name='variants.gif',
+            content=SMALL_GIF,
+            content_type='image/gif'
+        )
+        self.authorized_client.post(
+            reverse('posts:create_post'),
+            data={'text': 'Пост с картинкой', 'image': uploaded},
+        )
+        self.assertContains(
+            self.client.get(reverse('posts:index')),
+            'Картинка обрабатывается')
+        # Картинку обрабатывает задание из очереди core.tasks.
+        self.assertEqual(run_batch('test'), 1)
+        post = Post.objects.latest('id')
+        self.assertTrue(post.image_ready)
+        with patch('sorl.thumbnail.base.ThumbnailBackend._create_thumbnail'
+                   ) as create_thumbnail:
+            for image_format in FORMATS:
+                for variant in get_variants(post.image, image_format):
+                    self.assertTrue(default_storage.exists(variant.name))
+            response = self.client.get(reverse('posts:index'))
+        create_thumbnail.assert_not_called()
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, 'loading="lazy"')
+
+    def large_jpeg(self):
+        # Фото 2000×1000 с EXIF: ориентация «повернуть на 90°»
+        image = Image.new('RGB', (2000, 1000), 'red')
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Камера'
+        output = BytesIO()
+        image.save(output, 'JPEG', exif=exif)
+        return SimpleUploadedFile(
+            name='photo.jpeg', content=output.getvalue(),
+            content_type='image/jpeg')
+
+    @override_settings(POST_IMAGE_MAX_SIZE=500)
+    def test_uploaded_image_is_downscaled_and_stripped(self):
+        self.authorized_client.post(
+            reverse('posts:create_post'),
+            data={'text': 'Фото', 'image': self.large_jpeg()},
+        )
+        original = Post.objects.latest('id').image.name
+        process(Post.objects.latest('id').pk)
+        post = Post.objects.latest('id')
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        self.assertFalse(default_storage.exists(original))
+        with Image.open(post.image.path) as image:
+            # Повёрнута по EXIF и уменьшена по длинной стороне
+            self.assertEqual(image.size, (250, 500))
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_image_released_on_delete(self):
+        first, second = [
+            Post.objects.create(
+                author=self.post_author, text='Пост',
+                image=SimpleUploadedFile('same.gif', SMALL_GIF))
+            for _ in range(2)
+        ]
+        # Одинаковые картинки хранятся одним файлом
+        name = first.image.name
+        self.assertEqual(second.image.name, name)
+        first.delete()
+        self.assertTrue(default_storage.exists(name))
+        second.image = SimpleUploadedFile('other.gif', SMALL_GIF + b'\0')
+        second.save()
+        self.assertFalse(default_storage.exists(name))
+        name = second.image.name
+        second.delete()
+        self.assertFalse(default_storage.exists(name))
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000)
+    def test_too_large_image_is_rejected(self):
+        form = PostForm(
+            data={'text': 'Фото'}, files={'image': self.large_jpeg()})
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
     def test_edit_post(self):
         post_count = Post.objects.count()
         form_data = {
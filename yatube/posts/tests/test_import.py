@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, Profile, TimelineEntry
+
+User = get_user_model()
+
+ROWS = [
+    {'model': 'auth.user', 'id': 501, 'username': 'author'},
+    {'model': 'auth.user', 'id': 502, 'username': 'reader'},
+    {'model': 'posts.group', 'id': 7, 'title': 'Группа', 'slug': 'old',
+     'description': 'Описание'},
+    {'model': 'posts.post', 'id': 900, 'text': 'Старый пост',
+     'pub_date': '2015-03-01T10:00:00+00:00', 'author_id': 501,
+     'group_id': 7, 'image': ''},
+    {'model': 'posts.post', 'id': 901, 'text': 'Без автора',
+     'pub_date': '2015-03-02T10:00:00+00:00', 'author_id': 999,
+     'group_id': ''},
+    {'model': 'posts.comment', 'id': 1, 'post_id': 900, 'author_id': 502,
+     'text': 'Комментарий', 'created': '2015-03-03T10:00:00+00:00'},
+    {'model': 'posts.follow', 'id': 3, 'user_id': 502, 'author_id': 501},
+]
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write(content)
+        return path
+
+    def run_import(self, *args, **options):
+        stdout = StringIO()
+        call_command('import_data', *args, stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def test_ndjson_import_resolves_keys_and_is_idempotent(self):
+        # Пользователь с таким именем уже есть: он не дублируется
+        existing = User.objects.create_user(username='reader')
+        path = self.write('dump.ndjson', '\n'.join(
+            json.dumps(row, ensure_ascii=False) for row in ROWS))
+        output = self.run_import(path, chunk_size=2)
+        self.assertIn('строк/с', output)
+        post = Post.objects.get(text='Старый пост')
+        self.assertEqual(post.author.username, 'author')
+        self.assertEqual(post.group.slug, 'old')
+        self.assertEqual(post.pub_date.year, 2015)
+        self.assertEqual(post.comments_count, 1)
+        comment = Comment.objects.get()
+        self.assertEqual(comment.author, existing)
+        self.assertEqual(comment.created.year, 2015)
+        self.assertFalse(Post.objects.filter(text='Без автора').exists())
+        self.assertEqual(
+            Profile.objects.get(user=post.author).followers_count, 1)
+        self.assertEqual(
+            Profile.objects.get(user=existing).following_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=existing, post=post).exists())
+
+        self.run_import(path)
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Group.objects.count(), 1)
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_csv_import(self):
+        users = self.write(
+            'users.csv', 'id,username,first_name\n1,lev,Лев\n2,ann,Анна\n')
+        follows = self.write(
+            'follows.csv', 'id,user,author\n1,1,2\n2,1,1\n')
+        self.run_import(users, model='users')
+        self.run_import(follows, model='follows')
+        self.assertEqual(
+            User.objects.get(username='lev').first_name, 'Лев')
+        self.assertEqual(
+            list(Follow.objects.values_list(
+                'user__username', 'author__username')),
+            [('lev', 'ann')])
@@ -0,0 +1,139 @@
+import os
+import tempfile
+from http import HTTPStatus
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import metrics
+from core.cache import stats
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Попадания считаются в метриках: у каждого теста свой файл.
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            METRICS_PATH=os.path.join(directory.name, 'metrics.sqlite3'))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        metrics._pending.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание'
+        )
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Тестовый пост')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.profile_url = reverse(
+            'posts:profile', kwargs={'username': 'author'})
+        self.post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk})
+
+    def test_anonymous_hit_does_not_query_database(self):
+        url = reverse('posts:index')
+        first = self.client.get(url)
+        # Попадание ничего не пишет и в общий кэш.
+        with CaptureQueriesContext(connection) as context, \
+                patch.object(cache, 'incr') as incr, \
+                patch.object(cache, 'set') as cache_set:
+            second = self.client.get(url)
+        self.assertEqual(len(context), 0)
+        incr.assert_not_called()
+        cache_set.assert_not_called()
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(stats('page')['hits'], 1)
+
+    def test_holes_are_filled_per_user(self):
+        self.client.get(self.profile_url)
+        reader_page = self.reader_client.get(self.profile_url)
+        author_page = self.author_client.get(self.profile_url)
+        self.assertEqual(stats('page')['hits'], 2)
+        self.assertContains(reader_page, 'Пользователь: reader')
+        self.assertContains(reader_page, 'Отписаться')
+        self.assertContains(author_page, 'Пользователь: author')
+        self.assertContains(author_page, 'Подписаться')
+        self.assertNotContains(reader_page, '<!--hole')
+
+    def test_post_detail_form_and_edit_button(self):
+        edit_url = reverse(
+            'posts:post_edit', kwargs={'post_id': self.post.pk})
+        anonymous_page = self.client.get(self.post_url)
+        reader_page = self.reader_client.get(self.post_url)
+        author_page = self.author_client.get(self.post_url)
+        self.assertNotContains(anonymous_page, 'csrfmiddlewaretoken')
+        self.assertContains(reader_page, 'csrfmiddlewaretoken')
+        self.assertNotContains(reader_page, edit_url)
+        self.assertContains(author_page, edit_url)
+
+    def test_no_edit_button_on_authorless_post(self):
+        # У анонима и у поста удалённого автора нет pk, но кнопка
+        # правки не для них.
+        Post.objects.filter(pk=self.post.pk).update(author=None)
+        edit_url = reverse(
+            'posts:post_edit', kwargs={'post_id': self.post.pk})
+        for url in (self.post_url, reverse('posts:index')):
+            with self.subTest(url=url):
+                self.assertNotContains(self.client.get(url), edit_url)
+
+    def test_name_change_invalidates_pages(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'}),
+            self.profile_url,
+        )
+        for url in urls:
+            self.client.get(url)
+        self.author.first_name = 'Лев'
+        self.author.last_name = 'Толстой'
+        self.author.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Лев Толстой')
+
+    def test_follow_changes_cached_profile(self):
+        self.reader_client.get(self.profile_url)
+        Follow.objects.filter(user=self.reader).delete()
+        response = self.reader_client.get(self.profile_url)
+        self.assertContains(response, 'Подписчиков: 0')
+        self.assertContains(response, 'Подписаться')
+
+    def test_new_post_invalidates_page(self):
+        url = reverse('posts:group_list', kwargs={'slug': 'test_slug'})
+        self.client.get(url)
+        Post.objects.create(
+            author=self.author, group=self.group, text='Свежий пост')
+        self.assertContains(self.client.get(url), 'Свежий пост')
+
+    def test_user_specific_etag(self):
+        response = self.reader_client.get(self.profile_url)
+        self.assertEqual(self.reader_client.get(
+            self.profile_url, HTTP_IF_NONE_MATCH=response['ETag']
+        ).status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(self.author_client.get(
+            self.profile_url, HTTP_IF_NONE_MATCH=response['ETag']
+        ).status_code, HTTPStatus.OK)
+
+    def test_error_page_has_no_markers(self):
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertNotContains(
+            response, '<!--hole', status_code=HTTPStatus.NOT_FOUND)
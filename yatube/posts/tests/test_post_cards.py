@@ -0,0 +1,82 @@
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from core.cache import stats
+from ..models import Follow, Group, Post
+from ..templatetags.post_cards import card_key, render_card
+
+User = get_user_model()
+
+
+class PostCardsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Попадания считаются в метриках: у каждого теста свой файл.
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            METRICS_PATH=os.path.join(directory.name, 'metrics.sqlite3'))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        metrics._pending.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание'
+        )
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Тестовый пост')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.edit_url = reverse(
+            'posts:post_edit', kwargs={'post_id': self.post.pk})
+
+    def test_card_is_shared_between_feeds(self):
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'}))
+        self.assertContains(response, 'Тестовый пост')
+        self.assertEqual(stats('post_card')['misses'], 1)
+        self.assertEqual(stats('post_card')['hits'], 1)
+
+    def test_edit_button_only_for_author(self):
+        url = reverse('posts:follow_index')
+        # Карточка запоминается на странице автора, а читается у всех.
+        self.author_client.get(reverse('posts:index'))
+        reader_page = self.reader_client.get(url)
+        author_page = self.author_client.get(
+            reverse('posts:profile', kwargs={'username': 'author'}))
+        self.assertNotContains(reader_page, self.edit_url)
+        self.assertNotContains(reader_page, '<!--hole')
+        self.assertContains(author_page, self.edit_url)
+
+    def test_edit_changes_card(self):
+        key = card_key(self.post)
+        self.client.get(reverse('posts:index'))
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        post.refresh_from_db()
+        self.assertNotEqual(card_key(post), key)
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'}))
+        self.assertContains(response, 'Исправленный пост')
+
+    def test_group_rename_changes_card(self):
+        key = card_key(self.post)
+        self.group.title = 'Новое название'
+        self.group.save()
+        post = Post.objects.select_related('group').get(pk=self.post.pk)
+        self.assertNotEqual(card_key(post), key)
+        self.assertIn('Новое название', render_card(post))
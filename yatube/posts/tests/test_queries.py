@@ -0,0 +1,150 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, Profile
+from ..urls import app_name, urlpatterns
+
+User = get_user_model()
+
+# Сколько SQL-запросов может сделать каждая страница для
+# авторизованного пользователя. В бюджет входят запросы сессии,
+# пользователя и SAVEPOINT транзакций. Валидатор ETag лент и поста
+# (core.conditional) строится по поколениям кэша и к базе не
+# обращается. Кэш очищается перед каждым запросом, поэтому поиск
+# группы и автора (core.lookups) — промах: профилю это стоит запроса
+# счётчиков отдельно от автора. Новый адрес в posts/urls.py без
+# бюджета роняет тест.
+QUERY_BUDGETS = {
+    'index': 3,
+    'trending': 3,
+    'group_list': 4,
+    'profile': 6,
+    'post_detail': 4,
+    'post_comments': 4,
+    'create_post': 3,
+    'post_edit': 5,
+    'add_comment': 5,
+    'follow_index': 4,
+    'profile_follow': 13,
+    'profile_unfollow': 11,
+    'search': 4,
+    'export': 2,
+}
+# Страницы, которые выводят посты или комментарии списком.
+LIST_PAGES = (
+    'index',
+    'trending',
+    'group_list',
+    'profile',
+    'post_detail',
+    'post_comments',
+    'follow_index',
+    'search',
+)
+# Параметры запроса для страниц, которым они нужны.
+QUERY_STRINGS = {
+    'search': '?q=Тестовый',
+}
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def create_posts(self, count):
+        posts = [
+            Post.objects.create(
+                author=self.author,
+                group=self.group,
+                text='Тестовый пост %d' % number
+            )
+            for number in range(count)
+        ]
+        for post in posts:
+            Comment.objects.create(
+                post=post, author=self.reader, text='Комментарий')
+        return posts[0]
+
+    def url_kwargs(self, post):
+        return {
+            'slug': self.group.slug,
+            'username': self.author.username,
+            'post_id': post.pk,
+        }
+
+    def count_queries(self, name, post):
+        pattern = next(p for p in urlpatterns if p.name == name)
+        kwargs = {
+            key: value for key, value in self.url_kwargs(post).items()
+            if key in pattern.pattern.converters
+        }
+        url = reverse('%s:%s' % (app_name, name), kwargs=kwargs)
+        url += QUERY_STRINGS.get(name, '')
+        client = self.reader_client
+        if name == 'post_edit':
+            client = Client()
+            client.force_login(self.author)
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            client.get(url)
+        return len(context)
+
+    def test_every_url_has_budget(self):
+        names = {pattern.name for pattern in urlpatterns}
+        self.assertEqual(names, set(QUERY_BUDGETS))
+
+    def test_urls_fit_query_budget(self):
+        post = self.create_posts(settings.NUMBER_OF_POSTS_ON_PAGE + 1)
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(name=name):
+                self.assertLessEqual(self.count_queries(name, post), budget)
+
+    def test_queries_do_not_depend_on_page_size(self):
+        # Число запросов не растёт вместе с числом постов на странице
+        post = self.create_posts(1)
+        single = {
+            name: self.count_queries(name, post) for name in LIST_PAGES
+        }
+        self.create_posts(settings.NUMBER_OF_POSTS_ON_PAGE * 2)
+        for _ in range(settings.NUMBER_OF_POSTS_ON_PAGE * 2):
+            Comment.objects.create(
+                post=post, author=self.author, text='Комментарий')
+        for name, expected in single.items():
+            with self.subTest(name=name):
+                self.assertEqual(self.count_queries(name, post), expected)
+
+    def follow_popular_authors(self, count):
+        for number in range(count):
+            author = User.objects.create_user(
+                username='popular%d_%d' % (count, number))
+            Profile.objects.filter(user=author).update(fan_in=True)
+            Follow.objects.create(user=self.reader, author=author)
+            for _ in range(2):
+                Post.objects.create(author=author, text='Популярный пост')
+
+    def test_follow_feed_does_not_depend_on_popular_authors(self):
+        # Посты всех популярных авторов читаются одним запросом.
+        post = self.create_posts(settings.NUMBER_OF_POSTS_ON_PAGE + 1)
+        self.follow_popular_authors(1)
+        single = self.count_queries('follow_index', post)
+        self.follow_popular_authors(5)
+        self.assertEqual(self.count_queries('follow_index', post), single)
+        self.assertLessEqual(single, QUERY_BUDGETS['follow_index'])
@@ -0,0 +1,144 @@
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import connection, migrations, models
+from django.db.migrations.state import ProjectState
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..search import TRIGGERS, missing_triggers, restore_index
+
+User = get_user_model()
+
+SEARCH_URL = reverse('posts:search')
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Путешествия',
+            slug='travel',
+            description='Тестовое описание'
+        )
+        self.client = Client()
+
+    def found(self, query, **params):
+        response = self.client.get(SEARCH_URL, {'q': query, **params})
+        return response.context['page_obj']
+
+    def texts(self, query):
+        return [post.text for post in self.found(query)]
+
+    def test_index_follows_writes(self):
+        post = Post.objects.create(author=self.author, text='Горный поход')
+        self.assertEqual(self.texts('поход'), ['Горный поход'])
+        post.text = 'Морская прогулка'
+        post.save()
+        self.assertEqual(self.texts('поход'), [])
+        self.assertEqual(self.texts('прогулка'), ['Морская прогулка'])
+        post.delete()
+        self.assertEqual(self.texts('прогулка'), [])
+
+    def test_triggers_exist_after_migrate(self):
+        self.assertEqual(missing_triggers(), [])
+
+    def test_lost_triggers_are_restored(self):
+        # Так их теряет пересоздание таблицы в SQLite.
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_post_fts_insert')
+        Post.objects.create(author=self.author, text='Горный поход')
+        self.assertEqual(self.texts('поход'), [])
+        self.assertEqual(restore_index(), ['posts_post_fts_insert'])
+        self.assertEqual(self.texts('поход'), ['Горный поход'])
+        Post.objects.create(author=self.author, text='Новый поход')
+        self.assertEqual(len(self.texts('поход')), 2)
+
+    def test_group_title_is_indexed(self):
+        Post.objects.create(
+            author=self.author, group=self.group, text='Горный поход')
+        self.assertEqual(self.texts('путешествия'), ['Горный поход'])
+        self.group.title = 'Отдых'
+        self.group.save()
+        self.assertEqual(self.texts('путешествия'), [])
+        self.assertEqual(self.texts('отдых'), ['Горный поход'])
+
+    def test_results_are_ranked(self):
+        Post.objects.create(author=self.author, text='поход и ещё много '
+                            'других слов в длинном тексте поста')
+        Post.objects.create(author=self.author, text='поход поход')
+        self.assertEqual(self.texts('поход')[0], 'поход поход')
+
+    def test_operators_in_query_are_plain_words(self):
+        Post.objects.create(author=self.author, text='Горный поход')
+        self.assertEqual(self.texts('"поход OR ('), [])
+        self.assertEqual(self.texts('горн*'), ['Горный поход'])
+
+    @override_settings(NUMBER_OF_POSTS_ON_PAGE=2)
+    def test_pages_follow_rank(self):
+        for number in range(5):
+            Post.objects.create(
+                author=self.author, text='поход ' * (number + 1))
+        expected = self.texts('поход')
+        seen = []
+        page = self.found('поход')
+        while True:
+            seen.extend(post.text for post in page)
+            if not page.has_next():
+                break
+            page = self.found('поход', after=page.next_cursor)
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(seen[:2], expected)
+        previous = self.found('поход', before=page.previous_cursor)
+        self.assertEqual(
+            [post.text for post in previous], seen[2:4])
+
+    def test_empty_query_shows_form(self):
+        response = self.client.get(SEARCH_URL)
+        self.assertIsNone(response.context['page_obj'])
+
+    def test_admin_search_uses_index(self):
+        Post.objects.create(
+            author=self.author, group=self.group, text='Горный поход')
+        Post.objects.create(author=self.author, text='Морская прогулка')
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'путешествия'})
+        self.assertEqual(
+            [post.text for post in response.context['cl'].result_list],
+            ['Горный поход'])
+
+
+class TableRebuildTests(TransactionTestCase):
+    def alter_text(self, field, state):
+        new_state = state.clone()
+        operation = migrations.AlterField('post', 'text', field)
+        operation.state_forwards('posts', new_state)
+        with connection.schema_editor() as editor:
+            operation.database_forwards('posts', editor, state, new_state)
+        return new_state
+
+    def test_index_is_restored_after_rebuild(self):
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Горный поход')
+        # Так поступает миграция, пересоздающая posts_post: без
+        # триггеров AlterField в SQLite проходит.
+        with connection.cursor() as cursor:
+            for name in TRIGGERS:
+                cursor.execute('DROP TRIGGER %s' % name)
+        field = Post._meta.get_field('text')
+        state = self.alter_text(models.TextField(
+            'Текст поста', help_text=field.help_text, null=True),
+            ProjectState.from_apps(apps))
+        self.alter_text(field.clone(), state)
+        # Пост, записанный без триггеров, попадает в индекс при
+        # восстановлении.
+        Post.objects.create(author=author, text='Морской поход')
+        self.assertEqual(sorted(restore_index()), sorted(TRIGGERS))
+        self.assertEqual(missing_triggers(), [])
+        response = self.client.get(SEARCH_URL, {'q': 'поход'})
+        self.assertEqual(len(response.context['page_obj']), 2)
@@ -0,0 +1,102 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from core.models import MediaFile
+from ..models import (
+    Comment, Follow, Group, Post, Profile, TimelineEntry, User
+)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SIZES = {
+    'users': 40, 'groups': 3, 'posts': 300, 'comments': 600,
+    'follows': 6, 'images': 0,
+}
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, TIMELINE_BACKFILL=5,
+    TIMELINE_FANOUT_LIMIT=10)
+class SeedTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def seed(self, **options):
+        call_command('seed', stdout=StringIO(), **dict(SIZES, **options))
+
+    def snapshot(self):
+        return (
+            list(Post.objects.order_by('pk').values_list(
+                'text', 'author__username', 'group__slug', 'pub_date')),
+            list(Follow.objects.order_by('pk').values_list(
+                'user__username', 'author__username')),
+        )
+
+    def test_dataset_is_reproducible(self):
+        self.seed(seed=7)
+        first = self.snapshot()
+        with self.assertRaises(CommandError):
+            self.seed(seed=7)
+        Post.objects.all().delete()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.seed(seed=7)
+        second = self.snapshot()
+        self.assertEqual(first[1], second[1])
+        # Даты отсчитываются от времени запуска.
+        self.assertEqual(
+            [row[:3] for row in first[0]], [row[:3] for row in second[0]])
+
+    def test_counts_and_counters(self):
+        self.seed()
+        self.assertEqual(Post.objects.count(), SIZES['posts'])
+        self.assertEqual(Comment.objects.count(), SIZES['comments'])
+        for profile in Profile.objects.select_related('user'):
+            self.assertEqual(
+                profile.followers_count,
+                Follow.objects.filter(author=profile.user).count())
+            self.assertEqual(
+                profile.posts_count,
+                Post.objects.filter(author=profile.user).count())
+        post = Post.objects.order_by('-comments_count').first()
+        self.assertEqual(
+            post.comments_count, Comment.objects.filter(post=post).count())
+        # Степенное распределение: у «горячего» поста комментариев
+        # намного больше среднего.
+        self.assertGreater(
+            post.comments_count, 10 * SIZES['comments'] / SIZES['posts'])
+        self.assertFalse(Comment.objects.filter(
+            post=post, created__lt=post.pub_date).exists())
+
+    def test_timeline_matches_backfill(self):
+        self.seed()
+        for follow in Follow.objects.select_related('author__profile'):
+            entries = set(TimelineEntry.objects.filter(
+                user=follow.user_id, post__author=follow.author_id
+            ).values_list('post', flat=True))
+            expected = set()
+            if follow.author.profile.followers_count < 10:
+                expected = set(Post.objects.filter(
+                    author=follow.author_id).order_by(
+                    '-pub_date').values_list('pk', flat=True)[:5])
+            self.assertEqual(entries, expected)
+
+    @patch('posts.seeding.generate_variants')
+    def test_images_are_shared_and_counted(self, generate_variants):
+        self.seed(images=2, image_share=0.5)
+        self.assertEqual(generate_variants.call_count, 2)
+        for media in MediaFile.objects.all():
+            self.assertEqual(
+                media.references,
+                Post.objects.filter(image=media.name).count())
+        self.assertLessEqual(
+            Post.objects.exclude(image='').values('image').distinct()
+            .count(), 2)
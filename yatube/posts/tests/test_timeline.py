@@ -0,0 +1,128 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Task
+from core.tasks import run_batch
+from ..models import Follow, Post, Profile, TimelineEntry
+
+User = get_user_model()
+
+FOLLOW_URL = reverse('posts:follow_index')
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.follower = User.objects.create_user(username='follower')
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def feed_texts(self):
+        response = self.follower_client.get(FOLLOW_URL)
+        return [post.text for post in response.context['page_obj']]
+
+    def test_new_post_is_pushed_to_followers(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=post, pub_date=post.pub_date).exists())
+        self.assertEqual(self.feed_texts(), ['Новый пост'])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        Post.objects.create(author=self.author, text='Старый пост')
+        self.follower_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'author'}))
+        self.assertEqual(self.feed_texts(), ['Старый пост'])
+        self.follower_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'author'}))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists())
+        self.assertEqual(self.feed_texts(), [])
+
+    def fan_in(self):
+        return Profile.objects.get(user=self.author).fan_in
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_author_is_read_on_fan_in(self):
+        # Посты популярного автора не копируются в ленты, но
+        # всё равно видны подписчикам
+        Follow.objects.create(user=self.follower, author=self.author)
+        Post.objects.create(author=self.author, text='Популярный пост')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed_texts(), ['Популярный пост'])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=3, TIMELINE_FANOUT_RESUME=2)
+    def test_author_crossing_threshold_keeps_posts(self):
+        others = [
+            User.objects.create_user(username='other%d' % number)
+            for number in range(2)
+        ]
+        Follow.objects.create(user=self.follower, author=self.author)
+        Post.objects.create(author=self.author, text='Старый пост')
+        for user in others:
+            Follow.objects.create(user=user, author=self.author)
+        self.assertTrue(self.fan_in())
+        # Пока задание не убрало записи, пост не повторяется.
+        self.assertEqual(self.feed_texts(), ['Старый пост'])
+        run_batch('test')
+        self.assertFalse(TimelineEntry.objects.exists())
+        Post.objects.create(author=self.author, text='Популярный пост')
+        self.assertEqual(self.feed_texts(), ['Популярный пост', 'Старый пост'])
+        # Между порогами автор остаётся на подмешивании.
+        Follow.objects.filter(user=others[0]).delete()
+        run_batch('test')
+        self.assertTrue(self.fan_in())
+        Follow.objects.filter(user=others[1]).delete()
+        self.assertTrue(self.fan_in())
+        run_batch('test')
+        self.assertFalse(self.fan_in())
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=self.follower).count(), 2)
+        self.assertEqual(self.feed_texts(), ['Популярный пост', 'Старый пост'])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=4, TIMELINE_FANOUT_RESUME=4)
+    def test_unfollows_queue_one_resume(self):
+        others = [
+            User.objects.create_user(username='other%d' % number)
+            for number in range(3)
+        ]
+        for user in others:
+            Follow.objects.create(user=user, author=self.author)
+        Follow.objects.create(user=self.follower, author=self.author)
+        run_batch('test')
+        self.assertTrue(self.fan_in())
+        Follow.objects.filter(user__in=others).delete()
+        self.assertEqual(Task.objects.count(), 1)
+
+    @override_settings(NUMBER_OF_POSTS_ON_PAGE=2)
+    def test_pages_merge_timeline_and_popular_authors(self):
+        popular = User.objects.create_user(username='popular')
+        Profile.objects.filter(user=popular).update(fan_in=True)
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.follower, author=popular)
+        for number in range(3):
+            Post.objects.create(author=self.author, text='Пост %d' % number)
+            Post.objects.create(author=popular, text='Популярный %d' % number)
+        expected = list(Post.objects.order_by(
+            '-pub_date', '-pk').values_list('text', flat=True))
+        texts = []
+        params = {}
+        while params is not None:
+            response = self.follower_client.get(FOLLOW_URL, params)
+            page_obj = response.context['page_obj']
+            texts.extend(post.text for post in page_obj)
+            params = (
+                {'after': page_obj.next_cursor} if page_obj.has_next()
+                else None)
+        self.assertEqual(texts, expected)
+
+    @override_settings(TIMELINE_MAX_ENTRIES=3)
+    def test_long_timelines_are_trimmed(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        for number in range(5):
+            Post.objects.create(author=self.author, text='Пост %d' % number)
+        Task.objects.update(run_at=timezone.now())
+        run_batch('test')
+        self.assertEqual(self.feed_texts(), ['Пост 4', 'Пост 3', 'Пост 2'])
@@ -0,0 +1,71 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Post, TrendingPost
+
+User = get_user_model()
+
+TRENDING_URL = reverse('posts:trending')
+
+
+@override_settings(NUMBER_OF_POSTS_ON_PAGE=2)
+class TrendingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.old = Post.objects.create(author=self.author, text='Старый')
+        self.new = Post.objects.create(author=self.author, text='Новый')
+
+    def feed_texts(self, data=None):
+        response = self.client.get(TRENDING_URL, data)
+        page_obj = response.context['page_obj']
+        return [post.text for post in page_obj], page_obj.next_cursor
+
+    def comment(self, post):
+        self.reader_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'Комментарий'})
+
+    def scores(self):
+        return dict(TrendingPost.objects.values_list('post', 'score'))
+
+    def test_comments_raise_post(self):
+        self.assertEqual(self.feed_texts()[0], ['Новый', 'Старый'])
+        self.comment(self.old)
+        self.assertEqual(self.feed_texts()[0], ['Старый', 'Новый'])
+
+    def test_pages_follow_ranking(self):
+        Post.objects.create(author=self.author, text='Третий')
+        first, cursor = self.feed_texts()
+        second, _ = self.feed_texts({'after': cursor})
+        self.assertEqual(first + second, ['Третий', 'Новый', 'Старый'])
+
+    def test_rebuild_matches_incremental_scores(self):
+        self.comment(self.old)
+        self.comment(self.old)
+        incremental = self.scores()
+        call_command('rebuild_trending', stdout=StringIO())
+        rebuilt = self.scores()
+        self.assertEqual(incremental.keys(), rebuilt.keys())
+        for post_id, score in incremental.items():
+            self.assertAlmostEqual(score, rebuilt[post_id], places=6)
+
+    def test_rebuild_drops_quiet_posts(self):
+        self.comment(self.new)
+        Comment.objects.all().delete()
+        Post.objects.filter(pk=self.old.pk).update(
+            pub_date=timezone.now() - timedelta(days=30))
+        call_command('rebuild_trending', '--chunk-size', '1',
+                     stdout=StringIO())
+        self.assertEqual(list(self.scores()), [self.new.pk])
+        self.assertEqual(self.feed_texts()[0], ['Новый'])
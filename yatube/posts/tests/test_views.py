@@ -1,3 +1,5 @@
+import base64
+import json
 from http import HTTPStatus
 
 from django.conf import settings
@@ -7,6 +9,7 @@ from django.test import Client, TestCase
 from django.urls import reverse
 from django import forms
 
+from core.cache import stats as cache_stats
 from .. import models
 from ..forms import PostForm
 from ..models import Post, Group, User, Follow
@@ -52,6 +55,9 @@ class PagesTests(TestCase):
         cache.clear()
 
     def setUp(self):
+        # Страницы целиком кэшируются по адресу, и копия от прошлого
+        # теста не должна подменить рендеринг с контекстом.
+        cache.clear()
         self.guest_client = Client()
         self.user = User.objects.create_user(username='Anna')
         self.second_user = User.objects.create_user(username='Alex')
@@ -81,6 +87,8 @@ class PagesTests(TestCase):
                 response = self.authorized_client.get(reverse_name)
                 self.assertTemplateUsed(response, template)
 
+        # Страница поста уже в кэше страниц и без очистки не рендерится.
+        cache.clear()
         response = self.authorized_client.get(reverse(
             'posts:post_edit',
             kwargs={'post_id': f'{self.post.id}'}),
@@ -173,12 +181,19 @@ class PagesTests(TestCase):
                 self.assertIsInstance(form_field, expected)
 
     def test_cash(self):
-        # Проверка кэша на главной странице
+        # Проверка кэша на главной странице: изменение в обход
+        # сигналов не видно, удаление поста сбрасывает кэш
         response = self.authorized_client.get(reverse('posts:index'))
-        Post.objects.get(pk=self.post.pk).delete()
+        Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
         second_response = self.authorized_client.get(
             reverse('posts:index'))
         self.assertEqual(response.content, second_response.content)
+        Post.objects.get(pk=self.post.pk).delete()
+        third_response = self.authorized_client.get(
+            reverse('posts:index'))
+        self.assertNotContains(third_response, 'Тестовый пост')
+        # Повторный запрос отдаётся из кэша целых страниц.
+        self.assertGreaterEqual(cache_stats('page')['hits'], 1)
 
 
 class TestFollow(TestCase):
@@ -258,6 +273,7 @@ class PaginatorViewsTest(TestCase):
             )
 
     def setUp(self):
+        cache.clear()
         self.client = Client()
         self.user = User.objects.create_user(username='HasNoName')
         self.authorized_client = Client()
@@ -278,3 +294,71 @@ class PaginatorViewsTest(TestCase):
                 response = self.authorized_client.get(reverse_name)
                 self.assertEqual(len(response.context['page_obj']),
                                  settings.NUMBER_OF_POSTS_ON_PAGE)
+
+    def test_next_page_by_cursor(self):
+        # Вторая страница открывается по курсору и содержит
+        # оставшиеся записи без повторов
+        for reverse_name in (INDEX_URL, GROUP_LIST_URL):
+            with self.subTest(reverse_name=reverse_name):
+                response = self.authorized_client.get(reverse_name)
+                first_page = response.context['page_obj']
+                self.assertTrue(first_page.has_next())
+                response = self.authorized_client.get(
+                    reverse_name, {'after': first_page.next_cursor})
+                second_page = response.context['page_obj']
+                self.assertEqual(len(second_page), 3)
+                self.assertFalse(second_page.has_next())
+                self.assertTrue(
+                    {post.pk for post in first_page}.isdisjoint(
+                        post.pk for post in second_page))
+                response = self.authorized_client.get(
+                    reverse_name, {'before': second_page.previous_cursor})
+                self.assertEqual(
+                    [post.pk for post in response.context['page_obj']],
+                    [post.pk for post in first_page])
+
+    def test_broken_cursor_returns_first_page(self):
+        response = self.authorized_client.get(
+            INDEX_URL, {'after': 'не-курсор'})
+        self.assertEqual(len(response.context['page_obj']),
+                         settings.NUMBER_OF_POSTS_ON_PAGE)
+
+    def test_out_of_range_cursor_returns_first_page(self):
+        # Курсоры с null и с числом больше 64 бит раньше давали 500
+        cursors = (
+            [None, None],
+            ['2020-01-01T00:00:00', 10 ** 30],
+        )
+        for values in cursors:
+            cursor = base64.urlsafe_b64encode(
+                json.dumps(values).encode()).decode()
+            for params in ({'after': cursor}, {'before': cursor}):
+                with self.subTest(values=values, params=params):
+                    response = self.authorized_client.get(INDEX_URL, params)
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+                    self.assertEqual(
+                        len(response.context['page_obj']),
+                        settings.NUMBER_OF_POSTS_ON_PAGE)
+
+    def test_comments_are_paginated(self):
+        # На странице поста первая порция комментариев, остальные
+        # подгружаются фрагментом по курсору
+        comments = [
+            models.Comment.objects.create(
+                post=self.post, author=self.user, text='Комментарий %d' % i)
+            for i in range(settings.COMMENTS_PER_PAGE + 3)
+        ]
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        first_page = response.context['comments']
+        self.assertEqual(
+            [comment.pk for comment in first_page],
+            [comment.pk for comment in comments[:-3]])
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'after': first_page.next_cursor})
+        self.assertTemplateUsed(response, 'includes/comments.html')
+        self.assertEqual(
+            [comment.pk for comment in response.context['comments']],
+            [comment.pk for comment in comments[-3:]])
+        self.assertNotContains(response, 'data-comments-more')
@@ -0,0 +1,216 @@
+"""Лента подписок с материализацией при записи.
+
+Новый пост сразу раскладывается по лентам подписчиков автора
+(TimelineEntry), поэтому follow_index читает готовую ленту.
+Для популярных авторов раскладка дороже чтения: у них
+Profile.fan_in, их посты в ленты не копируются, а подмешиваются
+при чтении.
+
+Автор переходит на подмешивание, когда подписчиков становится не
+меньше TIMELINE_FANOUT_LIMIT, и возвращается к раскладке, когда их
+меньше TIMELINE_FANOUT_RESUME: разрыв между порогами не даёт
+автору на границе переключаться с каждой подпиской. Переход
+доделывает задание core.tasks: убирает посты автора из лент или
+раскладывает в них его последние посты.
+
+Лента читается по индексу (user, pub_date, post), посты всех
+авторов с подмешиванием — одним запросом по индексу (author,
+pub_date), а страница собирается слиянием (MergedCursorPaginator).
+Второй запрос ограничен датами страницы готовой ленты, поэтому
+запросов два при любом числе популярных авторов в подписках. Ленты
+длиннее TIMELINE_MAX_ENTRIES обрезает задание trim_timelines.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from core.paginators import MergedCursorPaginator
+from core.tasks import enqueue, pending, task
+from . import utils
+from .models import Follow, Post, Profile, TimelineEntry
+
+ORDERING = ('-feed_date', '-feed_post')
+
+
+def is_popular(author):
+    return Profile.objects.filter(user=author, fan_in=True).exists()
+
+
+def popular_authors(user):
+    """Подзапрос с id популярных авторов, на которых подписан user."""
+    return Follow.objects.filter(
+        user=user, author__profile__fan_in=True).values('author')
+
+
+def entries(user_ids, posts):
+    """Записи лент user_ids для пар (id поста, дата публикации)."""
+    return [
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for user_id in user_ids
+        for post_id, pub_date in posts
+    ]
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    if post.author_id is None or is_popular(post.author_id):
+        return
+    followers = list(Follow.objects.filter(
+        author=post.author_id).values_list('user', flat=True))
+    if followers:
+        TimelineEntry.objects.bulk_create(
+            entries(followers, [(post.pk, post.pub_date)]),
+            ignore_conflicts=True
+        )
+        schedule_trim()
+
+
+def recent_posts(author_id):
+    return Post.objects.filter(author=author_id).order_by(
+        '-pub_date').values_list('pk', 'pub_date')[
+        :settings.TIMELINE_BACKFILL]
+
+
+def backfill(user_id, author_id):
+    """Переносит последние посты автора в ленту нового подписчика."""
+    if is_popular(author_id):
+        return
+    posts = list(recent_posts(author_id))
+    if posts:
+        TimelineEntry.objects.bulk_create(
+            entries([user_id], posts), ignore_conflicts=True)
+        schedule_trim()
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося пользователя."""
+    TimelineEntry.objects.filter(
+        user=user_id, post__author=author_id).delete()
+
+
+def promote(author_id):
+    """Переводит автора на подмешивание, если подписчиков много."""
+    if Profile.objects.filter(
+            user=author_id, fan_in=False,
+            followers_count__gte=settings.TIMELINE_FANOUT_LIMIT
+    ).update(fan_in=True):
+        # Пока задание не убрало записи, слияние страниц пропускает
+        # повторы.
+        stop_fan_out.delay(author_id)
+
+
+def demote(author_id):
+    """Возвращает автора к раскладке, если подписчиков мало."""
+    # Признак снимает задание вместе с раскладкой: до тех пор посты
+    # автора подмешиваются при чтении и не пропадают из лент, а
+    # следующие отписки не ставят задание повторно.
+    if Profile.objects.filter(
+            user=author_id, fan_in=True,
+            followers_count__lt=settings.TIMELINE_FANOUT_RESUME
+    ).exists() and not pending(resume_fan_out.task_name, [author_id]):
+        resume_fan_out.delay(author_id)
+
+
+def rebalance(author_ids):
+    """promote и demote для авторов после пакетного пересчёта."""
+    for author_id in author_ids:
+        promote(author_id)
+        demote(author_id)
+
+
+@task()
+def stop_fan_out(author_id):
+    if is_popular(author_id):
+        TimelineEntry.objects.filter(post__author=author_id).delete()
+
+
+@task()
+def resume_fan_out(author_id):
+    # В одной транзакции с раскладкой: пост, опубликованный после
+    # неё, уже раскладывает fan_out.
+    with transaction.atomic():
+        if not Profile.objects.filter(
+                user=author_id, fan_in=True,
+                followers_count__lt=settings.TIMELINE_FANOUT_RESUME
+        ).update(fan_in=False):
+            return
+        posts = list(recent_posts(author_id))
+        followers = list(Follow.objects.filter(
+            author=author_id).values_list('user', flat=True))
+        TimelineEntry.objects.bulk_create(
+            entries(followers, posts), ignore_conflicts=True)
+    schedule_trim()
+
+
+def trim(user_id):
+    """Оставляет в ленте user_id последние TIMELINE_MAX_ENTRIES."""
+    rows = TimelineEntry.objects.filter(user=user_id)
+    last = rows.order_by('-pub_date', '-post').values_list(
+        'pub_date', 'post')[settings.TIMELINE_MAX_ENTRIES:][:1]
+    for pub_date, post_id in last:
+        rows.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, post__lte=post_id)
+        ).delete()
+
+
+@task()
+def trim_timelines():
+    users = TimelineEntry.objects.order_by().values('user').annotate(
+        total=Count('pk')
+    ).filter(total__gt=settings.TIMELINE_MAX_ENTRIES).values_list(
+        'user', flat=True)
+    for user_id in list(users):
+        with transaction.atomic():
+            trim(user_id)
+
+
+def schedule_trim():
+    """Ставит обрезку лент в очередь, если она ещё не стоит."""
+    if not pending(trim_timelines.task_name):
+        enqueue(
+            trim_timelines.task_name,
+            countdown=settings.TIMELINE_TRIM_INTERVAL)
+
+
+def feed(user):
+    """Посты ленты подписок одним queryset для постраничного режима."""
+    posts = TimelineEntry.objects.filter(user=user).values('post')
+    return Post.objects.filter(
+        Q(pk__in=posts) | Q(author__in=popular_authors(user)))
+
+
+def sources(user):
+    """Две части ленты подписок: готовая лента и посты авторов с
+    подмешиванием. Обе отдают аннотации feed_date и feed_post для
+    курсора."""
+    timeline = Post.objects.filter(timeline_entries__user=user).annotate(
+        feed_date=F('timeline_entries__pub_date'),
+        feed_post=F('timeline_entries__post'))
+    popular = Post.objects.filter(
+        author__in=popular_authors(user)).annotate(
+        feed_date=F('pub_date'), feed_post=F('pk'))
+    return [timeline, popular]
+
+
+def get_page(request, user):
+    """Страница ленты подписок user.
+
+    В режиме FEED_PAGINATION = 'offset' лента листается номерами
+    страниц по feed().
+    """
+    if settings.FEED_PAGINATION != 'cursor':
+        return utils.get_page(
+            request, feed(user).select_related('author', 'group'))
+    paginator = MergedCursorPaginator(
+        [
+            queryset.select_related('author', 'group')
+            for queryset in sources(user)
+        ],
+        settings.NUMBER_OF_POSTS_ON_PAGE,
+        ORDERING
+    )
+    return paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before')
+    )
@@ -0,0 +1,108 @@
+"""Лента «Популярное сейчас».
+
+Вес поста — сумма вкладов его событий (публикации и комментариев),
+каждый из которых убывает вдвое за TRENDING_HALF_LIFE. Чтобы порядок
+постов не зависел от момента чтения, хранится не сам вес, а log2
+веса, приведённого к общей точке отсчёта EPOCH: событие с весом w в
+момент t даёт log2(w) + (t - EPOCH) / TRENDING_HALF_LIFE. Затухание
+одинаково сдвигает оценки всех постов и порядка не меняет, поэтому
+лента читается одним запросом по индексу (score, post), без
+пересчёта при чтении.
+
+Оценка растёт при записи: новое событие прибавляется к ней одним
+UPDATE (record). Удалённые комментарии и затихшие посты учитывает
+команда rebuild_trending: она заново считает оценки по событиям окна
+TRENDING_WINDOW диапазонами id постов (rebuild).
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Greatest, Least, Log, Power
+from django.utils import timezone
+
+from core.cache import bump
+from .models import Comment, Post, TrendingPost
+
+EPOCH = datetime(2022, 1, 1, tzinfo=timezone.utc)
+
+
+def points(weight, when):
+    """Оценка одного события: log2 веса, приведённого к EPOCH."""
+    return math.log2(weight) + (
+        (when - EPOCH).total_seconds() / settings.TRENDING_HALF_LIFE)
+
+
+def log_sum(scores):
+    """log2(2^a + 2^b + ...) без переполнения."""
+    high = max(scores)
+    return high + math.log2(sum(2 ** (score - high) for score in scores))
+
+
+def _add(value):
+    # Тот же log_sum для F('score') и value, но на стороне СУБД.
+    value = Value(value, output_field=FloatField())
+    high = Greatest(F('score'), value)
+    low = Least(F('score'), value)
+    return high + Log(
+        Value(2.0), Value(1.0) + Power(Value(2.0), low - high),
+        output_field=FloatField())
+
+
+def record(post_id, weight, when):
+    """Добавляет к оценке поста событие с весом weight."""
+    value = points(weight, when)
+    rows = TrendingPost.objects.filter(post=post_id)
+    if not rows.update(score=_add(value), updated=when):
+        try:
+            with transaction.atomic():
+                TrendingPost.objects.create(
+                    post_id=post_id, score=value, updated=when)
+        except IntegrityError:
+            # Строку успел создать параллельный запрос.
+            rows.update(score=_add(value), updated=when)
+    bump('trending')
+
+
+def rebuild(start, stop, now=None):
+    """Пересчитывает оценки постов с start <= id < stop.
+
+    Учитываются публикации и комментарии последних TRENDING_WINDOW
+    секунд; посты без таких событий из ленты убираются.
+    """
+    since = (now or timezone.now()) - timedelta(
+        seconds=settings.TRENDING_WINDOW)
+    events = defaultdict(list)
+    with transaction.atomic():
+        # Удаление идёт первым и берёт блокировку записи, поэтому
+        # комментарий, добавленный во время пересчёта, не потеряется.
+        TrendingPost.objects.filter(post__gte=start, post__lt=stop).delete()
+        posts = Post.objects.filter(
+            pk__gte=start, pk__lt=stop, pub_date__gte=since
+        ).values_list('pk', 'pub_date')
+        for post_id, when in posts:
+            events[post_id].append((settings.TRENDING_POST_WEIGHT, when))
+        comments = Comment.objects.filter(
+            post__gte=start, post__lt=stop, created__gte=since
+        ).values_list('post', 'created')
+        for post_id, when in comments:
+            events[post_id].append((settings.TRENDING_COMMENT_WEIGHT, when))
+        TrendingPost.objects.bulk_create([
+            TrendingPost(
+                post_id=post_id,
+                score=log_sum([points(*event) for event in post_events]),
+                updated=max(when for _, when in post_events))
+            for post_id, post_events in sorted(events.items())
+        ])
+    bump('trending')
+    return len(events)
+
+
+def feed():
+    """Посты ленты «Популярное» с полями для курсора."""
+    return Post.objects.filter(trending__isnull=False).annotate(
+        trending_score=F('trending__score'),
+        trending_post=F('trending__pk'))
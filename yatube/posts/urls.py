@@ -10,6 +10,11 @@ urlpatterns = [
         views.index,
         name='index'
     ),
+    path(
+        'trending/',
+        views.trending_index,
+        name='trending'
+    ),
     path(
         'group/<slug>/',
         views.group_posts,
@@ -35,6 +40,11 @@ urlpatterns = [
         views.post_edit,
         name='post_edit'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
@@ -55,4 +65,14 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path(
+        'search/',
+        views.search,
+        name='search'
+    ),
+    path(
+        'export/',
+        views.export,
+        name='export'
+    ),
 ]
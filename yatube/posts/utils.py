@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+
+from core.paginators import CursorPaginator
+from .models import Comment
+
+
+def get_page(request, post_list, ordering=('-pub_date', '-pk')):
+    """Страница ленты постов для запроса.
+
+    В режиме FEED_PAGINATION = 'cursor' лента листается курсорами
+    ?after= и ?before= по полям ordering, в режиме 'offset' —
+    номерами страниц ?page= через стандартный Paginator.
+    """
+    if settings.FEED_PAGINATION == 'cursor':
+        paginator = CursorPaginator(
+            post_list, settings.NUMBER_OF_POSTS_ON_PAGE, ordering)
+        return paginator.get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before')
+        )
+    paginator = Paginator(
+        post_list.order_by(*ordering), settings.NUMBER_OF_POSTS_ON_PAGE)
+    return paginator.get_page(request.GET.get('page'))
+
+
+def get_comments_page(request, post_id):
+    """Страница комментариев поста от старых к новым.
+
+    Листается курсором ?after= по (created, id); авторы загружаются
+    тем же запросом, что и комментарии.
+    """
+    paginator = CursorPaginator(
+        Comment.objects.filter(post=post_id).select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        ordering=('created', 'pk')
+    )
+    return paginator.get_page(after=request.GET.get('after'))
+
+
+def feed_scopes(post, group_id=None):
+    """Области кэша core.cache, в лентах которых выводится пост."""
+    scopes = ['index', 'profile:%s' % post.author_id]
+    for group in {post.group_id, group_id}:
+        if group is not None:
+            scopes.append('group:%s' % group)
+    return scopes
@@ -1,93 +1,148 @@
 from http import HTTPStatus
+from urllib.parse import urlencode
 
-from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 # from django.core.mail import send_mail
 from django.urls import reverse_lazy
 
+from core.conditional import Validator
+from core.page_cache import cache_page
+from . import search as post_search
+from .export import MODELS, Export, gzip_stream
+from . import timeline, trending
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Follow
+from .lookups import groups, users
+from .models import Group, Post, Follow
+from .utils import get_comments_page, get_page
 
 
+@cache_page
 def index(request):
     template = 'posts/index.html'
     title = 'Последние обновления на сайте'
     text = 'Последние обновления на сайте'
     image = Post.image
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, settings.NUMBER_OF_POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.select_related('author', 'group')
+    cache_scopes = ('index', 'groups')
+    validator = Validator(request, cache_scopes)
+    not_modified = validator.not_modified()
+    if not_modified is not None:
+        return not_modified
+    page_obj = get_page(request, post_list)
     context = {
         'page_obj': page_obj,
         'title': title,
         'text': text,
         'image': image,
+        'cache_scopes': cache_scopes,
     }
-    return render(
+    return validator.apply(render(
         request,
         template,
         context
-    )
+    ))
 
 
+@cache_page
+def trending_index(request):
+    template = 'posts/trending.html'
+    title = 'Популярное сейчас'
+    text = 'Популярное сейчас'
+    post_list = trending.feed().select_related('author', 'group')
+    cache_scopes = ('trending', 'groups')
+    validator = Validator(request, cache_scopes)
+    not_modified = validator.not_modified()
+    if not_modified is not None:
+        return not_modified
+    page_obj = get_page(
+        request, post_list, ('-trending_score', '-trending_post'))
+    context = {
+        'page_obj': page_obj,
+        'title': title,
+        'text': text,
+        'cache_scopes': cache_scopes,
+    }
+    return validator.apply(render(
+        request,
+        template,
+        context
+    ))
+
+
+@cache_page
 def group_posts(request, slug):
     template = 'posts/group_list.html'
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.order_group_posts.all()
-    paginator = Paginator(post_list, settings.NUMBER_OF_POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    group = groups.get_or_404(slug)
+    post_list = group.order_group_posts.select_related('author', 'group')
+    cache_scopes = ('group:%s' % group.pk, 'groups')
+    validator = Validator(request, cache_scopes)
+    not_modified = validator.not_modified()
+    if not_modified is not None:
+        return not_modified
+    page_obj = get_page(request, post_list)
     image = Post.image
     context = {
         'group': group,
         'page_obj': page_obj,
         'image': image,
+        'cache_scopes': cache_scopes,
     }
-    return render(
+    return validator.apply(render(
         request,
         template,
         context
-    )
+    ))
 
 
+@cache_page
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
+    # Счётчики профиля меняются часто и в кэш поиска не входят:
+    # шаблон читает их отдельным запросом.
+    author = users.get_or_404(username)
     title = 'Профайл пользователя ' + author.get_full_name()
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, settings.NUMBER_OF_POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = author.posts.select_related('author', 'group')
     image = Post.image
-    current_user = request.user
-    if current_user.is_authenticated and current_user != author:
-        following = Follow.objects.filter(
-            user=current_user, author=author).exists()
-    else:
-        following = False
+    cache_scopes = ('profile:%s' % author.pk, 'groups')
+    # Кнопку подписки выводит фрагмент posts.holes.follow_button.
+    validator = Validator(request, cache_scopes, extra=(title,))
+    not_modified = validator.not_modified()
+    if not_modified is not None:
+        return not_modified
+    page_obj = get_page(request, post_list)
     context = {
         'page_obj': page_obj,
         'title': title,
         'author': author,
         'post_list': post_list,
         'image': image,
-        'following': following,
+        'cache_scopes': cache_scopes,
     }
-    return render(request,
-                  template,
-                  context
-                  )
+    return validator.apply(render(request,
+                                  template,
+                                  context
+                                  ))
 
 
+@cache_page
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = Post.objects.filter(pk=post_id).first()
+    post = Post.objects.select_related(
+        'author__profile', 'group').filter(pk=post_id).first()
     title = 'Пост ' + post.text[:15]
+    # Правка поста и новые комментарии меняют поколение ленты автора.
+    validator = Validator(
+        request, ('profile:%s' % post.author_id, 'groups'),
+        modified=post.updated)
+    not_modified = validator.not_modified()
+    if not_modified is not None:
+        return not_modified
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    comments = get_comments_page(request, post.pk)
     image = Post.image
     context = {
         'post': post,
@@ -96,10 +151,20 @@ def post_detail(request, post_id):
         'title': title,
         'image': image,
     }
-    return render(request,
-                  template,
-                  context
-                  )
+    return validator.apply(render(request,
+                                  template,
+                                  context
+                                  ))
+
+
+def post_comments(request, post_id):
+    # Следующая порция комментариев для подгрузки на странице поста.
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post': post,
+        'comments': get_comments_page(request, post.pk),
+    }
+    return render(request, 'includes/comments.html', context)
 
 
 @login_required
@@ -113,9 +178,11 @@ def create_post(request):
     if request.method == 'POST':
 
         if form.is_valid():
-            new_post = form.save(commit=False)
-            new_post.author = request.user
-            new_post.save()
+            # Пост и счётчики автора пишутся в одной транзакции, а
+            # страница с формой рендерится без неё.
+            with transaction.atomic():
+                form.instance.author = request.user
+                form.save()
             return redirect(
                 reverse_lazy(
                     'posts:profile',
@@ -191,6 +258,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -209,11 +277,7 @@ def follow_index(request):
     current_user = request.user
     title = 'Подписки'
     text = 'Посты по подпискам'
-    post_list = Post.objects.filter(
-        author__following__user=current_user)
-    paginator = Paginator(post_list, settings.NUMBER_OF_POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = timeline.get_page(request, current_user)
     context = {
         'page_obj': page_obj,
         'title': title,
@@ -222,10 +286,28 @@ def follow_index(request):
     return render(request, template, context)
 
 
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    title = 'Поиск'
+    page_obj = None
+    if query:
+        page_obj = post_search.get_search_page(request, query)
+    context = {
+        'page_obj': page_obj,
+        'title': title,
+        'query': query,
+        # Ссылки пагинатора сохраняют поисковый запрос.
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, template, context)
+
+
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     # Подписаться на автора
-    author = get_object_or_404(User, username=username)
+    author = users.get_or_404(username)
     if request.user != author:
         Follow.objects.get_or_create(
             user=request.user, author=author
@@ -234,11 +316,32 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     # Дизлайк, отписка
-    author = get_object_or_404(User, username=username)
+    author = users.get_or_404(username)
     if request.user != author:
         Follow.objects.filter(
             user=request.user, author=author
         ).delete()
     return redirect('posts:profile', username=author.username)
+
+
+@staff_member_required
+def export(request):
+    # Выгрузка NDJSON для аналитики: ?models=posts,comments,follows
+    # выбирает таблицы, ?gzip=1 сжимает ответ.
+    names = request.GET.get('models', ','.join(MODELS)).split(',')
+    if not set(names) <= set(MODELS):
+        return HttpResponseBadRequest('Неизвестная таблица')
+    stream = Export(names)
+    filename = 'yatube.ndjson'
+    content_type = 'application/x-ndjson'
+    if request.GET.get('gzip'):
+        stream = gzip_stream(stream)
+        filename += '.gz'
+        content_type = 'application/gzip'
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    response['Content-Disposition'] = (
+        'attachment; filename="%s"' % filename)
+    return response
@@ -28,6 +28,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -39,6 +40,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.routers.PrimaryPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,13 +55,25 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# В профиле 'production' шаблоны разбираются один раз на процесс
+# (cached.Loader), в разработке — перечитываются при каждом рендеринге
+TEMPLATE_PROFILE = os.environ.get('YATUBE_TEMPLATE_PROFILE', 'development')
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if TEMPLATE_PROFILE == 'production':
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        # Искать на уровне проекта
+        # DjangoTemplates, который замеряет время рендеринга
+        'BACKEND': 'core.template_backends.TimedDjangoTemplates',
+        # Искать на уровне проекта, затем в приложениях
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -75,13 +90,66 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Для нагрузочных замеров можно указать отдельный файл базы
+DATABASE_PATH = os.environ.get(
+    'YATUBE_DATABASE_PATH', os.path.join(BASE_DIR, 'db.sqlite3'))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # SQLite с прагмами и BEGIN IMMEDIATE, см. core/sqlite_backend
+        'ENGINE': 'core.sqlite_backend',
+        'NAME': DATABASE_PATH,
+        'OPTIONS': {
+            # Сколько секунд ждать, пока другой процесс держит запись
+            'timeout': 20,
+        },
     }
 }
 
+# Профиль 'production' включает WAL, настроенные прагмы, постоянные
+# соединения и отдельное соединение только для чтения
+DATABASE_PROFILE = os.environ.get('YATUBE_DATABASE_PROFILE', 'development')
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    # В WAL при NORMAL транзакции не теряются при сбое процесса,
+    # fsync только при контрольной точке
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер кэша страниц в КиБ
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
+}
+# Псевдоним базы для чтения и сколько секунд после записи читать
+# из основной базы, чтобы пользователь сразу видел свои изменения
+REPLICA_DATABASE = 'replica'
+REPLICA_STICKY_SECONDS = 5
+REPLICA_STICKY_COOKIE = 'use_primary'
+
+if DATABASE_PROFILE == 'production':
+    DATABASES['default']['CONN_MAX_AGE'] = 600
+    DATABASES['default']['OPTIONS']['pragmas'] = SQLITE_PRAGMAS
+    # В WAL транзакция, начатая чтением, не дождётся чужой записи
+    DATABASES['default']['OPTIONS']['transaction_mode'] = 'IMMEDIATE'
+    DATABASES[REPLICA_DATABASE] = {
+        'ENGINE': 'core.sqlite_backend',
+        'NAME': 'file:%s?mode=ro' % DATABASE_PATH,
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'uri': True,
+            'timeout': 20,
+            'pragmas': {
+                'mmap_size': SQLITE_PRAGMAS['mmap_size'],
+                'cache_size': SQLITE_PRAGMAS['cache_size'],
+                'query_only': 1,
+            },
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    }
+
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -118,6 +186,18 @@ LOGIN_REDIRECT_URL = 'posts:index'
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+DEFAULT_FROM_EMAIL = 'noreply@yatube.local'
+# Адрес сайта для ссылок в письмах
+SITE_URL = 'http://127.0.0.1:8000'
+# Письма о новых постах (posts.digests): подписчик получает одно письмо
+# со всеми новыми постами своих авторов не чаще раза в
+# NOTIFICATION_DIGEST_INTERVAL секунд, в письме не больше
+# NOTIFICATION_DIGEST_MAX_POSTS постов. Подписчики обходятся порциями
+# по NOTIFICATION_DIGEST_CHUNK_SIZE, письма порции уходят через одно
+# соединение с почтовым сервером
+NOTIFICATION_DIGEST_INTERVAL = 3600
+NOTIFICATION_DIGEST_MAX_POSTS = 10
+NOTIFICATION_DIGEST_CHUNK_SIZE = 500
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
@@ -127,19 +207,110 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
 NUMBER_OF_POSTS_ON_PAGE = 10
+# Сколько комментариев выводить на странице поста и подгружать за раз
+COMMENTS_PER_PAGE = 20
+# 'cursor' — листать ленты курсорами по (pub_date, id) без COUNT и
+# OFFSET, 'offset' — номерами страниц через стандартный Paginator
+FEED_PAGINATION = 'cursor'
 EMPTY_VALUE_DISPLAY = '-пусто-'
+# Размер страницы JSON API по умолчанию и наибольший для ?limit=
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
+# Посты авторов, у которых подписчиков не меньше этого числа, не
+# раскладываются по лентам подписчиков, а подмешиваются при чтении;
+# обратно к раскладке автор возвращается, когда подписчиков меньше
+# TIMELINE_FANOUT_RESUME
+TIMELINE_FANOUT_LIMIT = 1000
+TIMELINE_FANOUT_RESUME = 800
+# Сколько последних постов автора попадает в ленту при подписке
+TIMELINE_BACKFILL = 200
+# Сколько записей хранить в ленте пользователя; лишние удаляет
+# задание, которое запускается раз в TIMELINE_TRIM_INTERVAL секунд
+TIMELINE_MAX_ENTRIES = 1000
+TIMELINE_TRIM_INTERVAL = 3600
+
+# Лента «Популярное» (posts.trending): вклад публикации и комментария
+# в оценку поста убывает вдвое каждые TRENDING_HALF_LIFE секунд;
+# rebuild_trending учитывает события последних TRENDING_WINDOW секунд
+TRENDING_HALF_LIFE = 6 * 3600
+TRENDING_WINDOW = 3 * 86400
+TRENDING_POST_WEIGHT = 1
+TRENDING_COMMENT_WEIGHT = 2
+
+# Очередь отложенных заданий (core.tasks, команда run_tasks): сколько
+# заданий обработчик берёт за раз и на сколько секунд; через сколько
+# секунд повторить задание с ошибкой (дальше вдвое дольше, но не
+# дольше TASK_RETRY_MAX_DELAY) и сколько всего попыток; сколько секунд
+# ждать новых заданий, когда очередь пуста
+TASK_BATCH_SIZE = 10
+TASK_LEASE = 300
+TASK_RETRY_DELAY = 10
+TASK_RETRY_MAX_DELAY = 3600
+TASK_MAX_ATTEMPTS = 5
+TASK_POLL_INTERVAL = 1
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-
+# Медиафайлы называются по хэшу содержимого и не дублируются
+# (core.storage), поэтому их можно кэшировать навсегда
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+MEDIA_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Ширины уменьшенных копий картинок постов для srcset
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_IMAGE_QUALITY = 80
+# Загруженная картинка уменьшается до этого размера по длинной
+# стороне; больше POST_IMAGE_MAX_PIXELS пикселей не принимается
+POST_IMAGE_MAX_SIZE = 1920
+POST_IMAGE_MAX_PIXELS = 50 * 10 ** 6
+# Приоритет заданий обработки картинок в очереди core.tasks
+POST_IMAGE_TASK_PRIORITY = 10
+# Загрузки крупнее пишутся во временный файл, а не держатся в памяти
+FILE_UPLOAD_MAX_MEMORY_SIZE = 512 * 1024
+# Маленькие картинки не растягиваются до ширины копии
+THUMBNAIL_UPSCALE = False
+# Имена копий и так зависят от имени исходного файла, а значит, и от
+# его содержимого; ссылки на них считать не нужно
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
+
+# Кэш в файле SQLite общий для всех рабочих процессов сервера,
+# поэтому поколения кэша и счётчики видны каждому из них
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
         'KEY_PREFIX': 'index_page',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
     }
 }
+# Сколько секунд хранить целые страницы лент и постов
+# (core.page_cache); устаревают они раньше, со сменой поколения
+PAGE_CACHE_TIMEOUT = 86400
+# Сколько секунд хранить HTML карточки поста; с правкой поста у
+# карточки меняется ключ
+POST_CARD_TIMEOUT = 86400
+
+# Кэш поиска групп по slug и авторов по username в памяти каждого
+# процесса (core.lookups): сколько строк и сколько секунд хранить
+LOOKUP_CACHE_SIZE = 1000
+LOOKUP_CACHE_TIMEOUT = 300
+
+# Метрики запросов копятся в памяти каждого процесса и раз в
+# METRICS_FLUSH_INTERVAL секунд суммируются в общем файле SQLite
+METRICS_PATH = os.path.join(BASE_DIR, 'metrics.sqlite3')
+METRICS_FLUSH_INTERVAL = 10
+# Тесты пишут кэш и метрики во временный каталог, а не в эти файлы
+TEST_RUNNER = 'core.test_runner.TemporaryFilesRunner'
+# Адреса, с которых /metrics доступен без входа
+METRICS_ALLOWED_IPS = [
+    '127.0.0.1',
+]
 
 # адреса, при обращении с которых будет доступен DjDT
 
@@ -1,7 +1,10 @@
+import re
+
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+
+from core import views as core_views
 
 urlpatterns = [
     path(
@@ -18,6 +21,18 @@ urlpatterns = [
             namespace='about'
         )
     ),
+    path(
+        'api/v1/',
+        include(
+            'api.urls',
+            namespace='api'
+        )
+    ),
+    path(
+        'metrics',
+        core_views.metrics,
+        name='metrics'
+    ),
     path(
         'admin/',
         admin.site.urls
@@ -43,6 +58,7 @@ if settings.DEBUG:
     import debug_toolbar
 
     urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )
+    urlpatterns += (re_path(
+        r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')),
+        core_views.media
+    ),)